@@ -0,0 +1,276 @@
+import asyncio
+import contextvars
+import functools
+import os
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+import archive
+import auth
+import bookings
+import checkin
+import database
+import dates
+import db
+import instrumentation
+import kitchen
+import reference_data
+
+# JSON API for the canteen kiosks and card readers, which poll far too often for a Streamlit
+# rerun per request. It shares the data-access modules (and so the connection pool, write
+# queue and query instrumentation) with the Streamlit app. Run with: python api.py [port]
+
+API_HOST = os.environ.get('ORDERING_API_HOST', '127.0.0.1')
+API_PORT = int(os.environ.get('ORDERING_API_PORT', '8502'))
+
+# Signs login tokens. Without ORDERING_API_SECRET a random key is used, so tokens end with the process.
+API_SECRET = os.environ.get('ORDERING_API_SECRET') or os.urandom(32).hex()
+
+# How long a login token stays valid
+API_TOKEN_SECONDS = 12 * 60 * 60
+
+# Upper bound on rows per page of GET /api/bookings
+API_MAX_PAGE_SIZE = 500
+
+GROUP_OWNER_QUERY = "SELECT 1 FROM tbl_Groups WHERE Group_ID = ? AND Teacher_ID_FK = ? AND RetiredAt IS NULL"
+
+_tokens = URLSafeTimedSerializer(API_SECRET, salt='ordering-api')
+
+# Database calls block, so they run on threads sized to the connection pool: the event loop
+# keeps accepting requests and no thread sits waiting for a pooled connection
+_db_pool = ThreadPoolExecutor(max_workers=db.POOL_SIZE, thread_name_prefix="api-db")
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+# Run a blocking data-access call on the database threads, keeping the request's page tag
+async def run_db(fn, *args):
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(_db_pool, functools.partial(context.run, fn, *args))
+
+
+# The (user_type, account_id) in the request's bearer token
+def _account(request, *allowed_types):
+    header = request.headers.get('authorization', '')
+    scheme, _, token = header.partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        raise ApiError(401, "Missing bearer token.")
+    try:
+        user_type, account_id = _tokens.loads(token, max_age=API_TOKEN_SECONDS)
+    except SignatureExpired:
+        raise ApiError(401, "Token expired; log in again.")
+    except BadSignature:
+        raise ApiError(401, "Invalid token.")
+    if allowed_types and user_type not in allowed_types:
+        raise ApiError(403, f"Not available to {user_type} accounts.")
+    return user_type, account_id
+
+
+async def _json_body(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        raise ApiError(400, "Request body must be JSON.")
+    if not isinstance(body, dict):
+        raise ApiError(400, "Request body must be a JSON object.")
+    return body
+
+
+def _field(source, name, convert=str, required=True):
+    value = source.get(name)
+    if value is None or value == '':
+        if required:
+            raise ApiError(400, f"Missing field: {name}.")
+        return None
+    try:
+        return convert(value)
+    except (TypeError, ValueError):
+        raise ApiError(400, f"Invalid value for {name}: {value!r}.")
+
+
+def _flag(value):
+    text = str(value).lower()
+    if text not in ('1', '0', 'true', 'false', 'yes', 'no'):
+        raise ValueError(value)
+    return text in ('1', 'true', 'yes')
+
+
+# Tag queries with the route, turn ApiError and bad input into JSON errors
+def endpoint(handler):
+    @functools.wraps(handler)
+    async def wrapper(request):
+        instrumentation.set_page(f"API: {request.method} {request.url.path}")
+        try:
+            status, payload = await handler(request)
+        except ApiError as exc:
+            return JSONResponse({'error': exc.message}, status_code=exc.status)
+        except sqlite3.IntegrityError as exc:
+            return JSONResponse({'error': str(exc)}, status_code=400)
+        return JSONResponse(payload, status_code=status)
+    return wrapper
+
+
+# POST /api/login {"email", "password"} -> bearer token and account details
+@endpoint
+async def login(request):
+    body = await _json_body(request)
+    account = await run_db(auth.authenticate, _field(body, 'email'), _field(body, 'password'))
+    if account is None:
+        raise ApiError(401, "Invalid email or password.")
+    user_type, name, surname, account_id = account
+    return 200, {
+        'token': _tokens.dumps([user_type, account_id]),
+        'user_type': user_type,
+        'name': name,
+        'surname': surname,
+        'account_id': account_id,
+    }
+
+
+# GET /api/bookings
+# User: the admin bookings list, filtered like the Bookings page (date_from, date_to, meal_id,
+# grade, border, group_id) and paged with the opaque `after` cursor returned as `next`.
+# Teacher: their group bookings from `from` (default today). Student: their own, likewise.
+@endpoint
+async def list_bookings(request):
+    user_type, account_id = _account(request)
+    params = request.query_params
+    if user_type == 'User':
+        filters = {
+            'date_from': _field(params, 'date_from', dates.to_db_date, required=False),
+            'date_to': _field(params, 'date_to', dates.to_db_date, required=False),
+            'meal_id': _field(params, 'meal_id', int, required=False),
+            'grade': _field(params, 'grade', int, required=False),
+            'border': _field(params, 'border', _flag, required=False),
+            'group_id': _field(params, 'group_id', int, required=False),
+        }
+        after = _field(params, 'after', _decode_cursor, required=False)
+        page_size = _field(params, 'page_size', int, required=False)
+        if page_size is not None and page_size < 1:
+            raise ApiError(400, "page_size must be at least 1.")
+        page_size = min(page_size or 50, API_MAX_PAGE_SIZE)
+        rows, cursor = await run_db(bookings.bookings_page_view, filters, after, page_size)
+        return 200, {
+            'bookings': [
+                {'order_id': order_id, 'student_id': student_id, 'meal_date': meal_date, 'meal': meal,
+                 'student': student_name, 'grade': grade, 'border': None if border is None else bool(border),
+                 'group': group_name}
+                for order_id, student_id, meal_date, meal, student_name, grade, border, group_name in rows
+            ],
+            'next': None if cursor is None else _encode_cursor(cursor),
+        }
+
+    from_date = _field(params, 'from', dates.to_db_date, required=False) or dates.today_db()
+    if user_type == 'Teacher':
+        rows = await run_db(bookings.teacher_upcoming_view, account_id, from_date)
+        return 200, {'bookings': [{'meal': meal, 'meal_date': meal_date, 'group': group_name}
+                                  for meal, meal_date, group_name in rows]}
+    rows = await run_db(bookings.student_upcoming_view, account_id, from_date)
+    return 200, {'bookings': [{'meal': meal, 'meal_date': meal_date, 'booked_by': booked_by}
+                              for meal, meal_date, booked_by in rows]}
+
+
+def _encode_cursor(cursor):
+    meal_date, order_id, student_id = cursor
+    return f"{meal_date},{order_id},{student_id}"
+
+
+def _decode_cursor(text):
+    meal_date, order_id, student_id = text.split(',')
+    return dates.to_db_date(meal_date), int(order_id), int(student_id)
+
+
+# POST /api/bookings {"meal_id", "meal_date", ...}
+# Student: books themselves. Teacher: books one of their groups ("group_id").
+# User: books a student ("student_id"). 201 with the Order_ID, or 409 with the conflicts.
+@endpoint
+async def create_booking(request):
+    user_type, account_id = _account(request)
+    body = await _json_body(request)
+    meal_id = _field(body, 'meal_id', int)
+    meal_date = _field(body, 'meal_date', dates.to_db_date)
+
+    if user_type == 'Teacher':
+        group_id = _field(body, 'group_id', int)
+        if not await run_db(db.fetch_one, GROUP_OWNER_QUERY, (group_id, account_id)):
+            raise ApiError(404, f"Group {group_id} not found.")
+        order_id, conflicts = await run_db(bookings.create_group_booking, account_id, group_id, meal_id, meal_date)
+        if order_id is None:
+            return 409, {'error': "Some students in the group already have this meal.",
+                         'conflicts': [{'student_id': student_id, 'student': name} for student_id, name in conflicts]}
+        return 201, {'order_id': order_id}
+
+    student_id = account_id if user_type == 'Student' else _field(body, 'student_id', int)
+    order_id = await run_db(bookings.create_student_booking, student_id, meal_id, meal_date)
+    if order_id is None:
+        return 409, {'error': "The student already has this meal on that date."}
+    return 201, {'order_id': order_id}
+
+
+# GET /api/counts?date=YYYY-MM-DD (default today): the kitchen's meal counts by dietary requirement
+@endpoint
+async def daily_counts(request):
+    _account(request, 'User')
+    meal_date = _field(request.query_params, 'date', dates.to_db_date, required=False) or dates.today_db()
+    rows = await run_db(kitchen.fetch_daily_counts, meal_date)
+    return 200, {
+        'date': meal_date,
+        'counts': [{'meal': meal, 'dietary': dietary, 'quantity': quantity} for meal, dietary, quantity in rows],
+    }
+
+
+# POST /api/checkin {"meal_id", "student_id"}: a card swipe at the serving counter for today's
+# meal. Opening the service loads its index once; swipes after that are answered from memory
+# unless the student is missing from it.
+@endpoint
+async def check_in(request):
+    _account(request, 'User')
+    body = await _json_body(request)
+    meal_id = _field(body, 'meal_id', int)
+    student_id = _field(body, 'student_id', int)
+    # Every opened service keeps a thread and an index until the day ends, so only real meals open one
+    if meal_id not in dict(await run_db(reference_data.get_meals)):
+        raise ApiError(404, f"Meal {meal_id} not found.")
+    service = checkin.get_service(meal_id) or await run_db(checkin.open_service, meal_id)
+    result = service.check_in(student_id, recheck=False)
+    if result.status == checkin.NOT_BOOKED:
+        # Not in the index: look them up on the database threads in case they booked just now
+        result = await run_db(service.check_in, student_id)
+    return 200, {'status': result.status, 'student_id': result.student_id, 'student': result.name}
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await run_db(database.ensure_schema)
+    archive.start_scheduler()
+    yield
+    await run_db(checkin.close_all)
+    _db_pool.shutdown(wait=True)
+
+
+routes = [
+    Route('/api/login', login, methods=['POST']),
+    Route('/api/bookings', list_bookings, methods=['GET']),
+    Route('/api/bookings', create_booking, methods=['POST']),
+    Route('/api/counts', daily_counts, methods=['GET']),
+    Route('/api/checkin', check_in, methods=['POST']),
+]
+
+app = Starlette(routes=routes, lifespan=lifespan)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else API_PORT
+    uvicorn.run(app, host=API_HOST, port=port)
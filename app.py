@@ -1,8 +1,17 @@
-import sqlite3
 import streamlit as st
+import archive
+import auth
+import instrumentation
 import user  # Import the user interface
 import teacher  # Import the teacher interface
 import student  # Import the student interface
+import database  # Schema setup and migrations
+
+# Make sure the schema and its indexes are up to date before serving any page
+database.ensure_schema()
+
+# Move old orders to the archive in the background once a day (see archive.ARCHIVE_INTERVAL_HOURS)
+archive.start_scheduler()
 
 # Initialize session state variables for login status, user type, and user ID
 if 'logged_in' not in st.session_state:
@@ -16,38 +25,13 @@ if 'last_name' not in st.session_state:
 if 'user_id' not in st.session_state:  # Explicitly initializing user_id
     st.session_state.user_id = None
 
-# Utility function to check user credentials from multiple tables
+# Utility function to check user credentials (see auth.authenticate)
 def check_login(email, password):
-    conn = sqlite3.connect('ordering.db', check_same_thread=False)
-    c = conn.cursor()
-
-    # Check tbl_User
-    c.execute("SELECT 'User' AS UserType, Name, Surname, User_ID FROM tbl_User WHERE Email = ? AND Password = ?", (email, password))
-    user = c.fetchone()
-    if user:
-        conn.close()
-        return user
-
-    # Check tbl_Teachers
-    c.execute("SELECT 'Teacher' AS UserType, Name, Surname, Teacher_ID FROM tbl_Teachers WHERE Email = ? AND Password = ?", (email, password))
-    teacher = c.fetchone()
-    if teacher:
-        conn.close()
-        return teacher
-
-    # Check tbl_Students
-    c.execute("SELECT 'Student' AS UserType, Name, Surname, Student_ID FROM tbl_Students WHERE Email = ? AND Password = ?", (email, password))
-    student = c.fetchone()
-    if student:
-        conn.close()
-        return student
-
-    # If no match, return None
-    conn.close()
-    return None
+    return auth.authenticate(email, password)
 
 # Streamlit UI for Login Page
 def login_page():
+    instrumentation.set_page("Login")
     st.title("Login Page")
 
     # Input fields for email and password
@@ -0,0 +1,321 @@
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+import dates
+import db
+import instrumentation
+
+# Orders whose meal date is more than this many days ago are moved to the archive
+ARCHIVE_HORIZON_DAYS = int(os.environ.get('ORDERING_ARCHIVE_DAYS', '180'))
+
+# The app and the API run the archive in the background when the last run started more than
+# this many hours ago; 0 turns that off (e.g. when `python archive.py` runs from cron instead)
+ARCHIVE_INTERVAL_HOURS = float(os.environ.get('ORDERING_ARCHIVE_HOURS', '24'))
+
+# How often the background scheduler checks whether a run is due
+ARCHIVE_CHECK_SECONDS = 60 * 60
+
+# Orders moved per transaction, so live pages only ever wait on a short write
+ARCHIVE_BATCH_ORDERS = 2000
+
+# Schema name the archive database is attached under
+ARCHIVE_SCHEMA = 'archive'
+
+# Frozen copies of archived orders. Group orders are stored with their per-student expansion
+# (tbl_Student_Bookings), so later membership changes do not rewrite history.
+ARCHIVE_TABLES = [
+    '''
+    CREATE TABLE IF NOT EXISTS archive.tbl_Orders (
+        Order_ID INTEGER PRIMARY KEY,
+        OrderDate DATE NOT NULL,
+        Meal_ID_FK INTEGER NOT NULL,
+        Teacher_ID_FK INTEGER,
+        Student_ID_FK INTEGER,
+        MealDate DATE NOT NULL,
+        Notes VARCHAR
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS archive.idx_Orders_MealDate_Order ON tbl_Orders (MealDate, Order_ID)",
+    '''
+    CREATE TABLE IF NOT EXISTS archive.tbl_Orders_Group (
+        Order_ID_FK INTEGER NOT NULL,
+        Group_ID_FK INTEGER,
+        Student_ID_FK INTEGER
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS archive.idx_Orders_Group_Order ON tbl_Orders_Group (Order_ID_FK)",
+    '''
+    CREATE TABLE IF NOT EXISTS archive.tbl_Student_Bookings (
+        Student_ID_FK INTEGER NOT NULL,
+        MealDate DATE NOT NULL,
+        Meal_ID_FK INTEGER NOT NULL,
+        Order_ID_FK INTEGER NOT NULL,
+        Booked_By INTEGER,
+        PRIMARY KEY (Student_ID_FK, MealDate, Meal_ID_FK, Order_ID_FK)
+    ) WITHOUT ROWID
+    ''',
+    "CREATE INDEX IF NOT EXISTS archive.idx_Student_Bookings_MealDate ON tbl_Student_Bookings (MealDate, Order_ID_FK)",
+    "CREATE INDEX IF NOT EXISTS archive.idx_Student_Bookings_Order ON tbl_Student_Bookings (Order_ID_FK)",
+    '''
+    CREATE TABLE IF NOT EXISTS archive.tbl_Meal_Counts (
+        MealDate DATE NOT NULL,
+        Meal_ID_FK INTEGER NOT NULL,
+        Dietary_ID_FK INTEGER NOT NULL,
+        Quantity INTEGER NOT NULL,
+        PRIMARY KEY (MealDate, Meal_ID_FK, Dietary_ID_FK)
+    ) WITHOUT ROWID
+    ''',
+]
+
+# Live and archived rows side by side, as one SELECT per schema ({schema} is main or archive)
+# joined with UNION ALL. Views in the main schema cannot name an attached database, so these
+# are TEMP views created on each connection that reads history.
+HISTORY_VIEWS = {
+    'v_Orders': "SELECT Order_ID, OrderDate, Meal_ID_FK, Teacher_ID_FK, Student_ID_FK, MealDate, Notes FROM {schema}.tbl_Orders",
+    # One row per booked student with the group the order was placed for (NULL for individual orders)
+    'v_Booking_History': '''
+        SELECT b.Order_ID_FK AS Order_ID, b.Student_ID_FK AS Student_ID, b.MealDate, b.Meal_ID_FK, og.Group_ID_FK
+        FROM {schema}.tbl_Student_Bookings b
+        JOIN {schema}.tbl_Orders_Group og ON og.Order_ID_FK = b.Order_ID_FK
+    ''',
+    'v_Meal_Counts': "SELECT MealDate, Meal_ID_FK, Dietary_ID_FK, Quantity FROM {schema}.tbl_Meal_Counts",
+}
+
+
+# Steps of one archive batch; the batch's Order_IDs are in temp.archive_batch.
+# Archive rows for the batch are replaced rather than appended, so a batch can be re-run
+# safely: commits across attached WAL databases are atomic per file, not as a set.
+ARCHIVE_BATCH_STEPS = [
+    "DELETE FROM archive.tbl_Orders WHERE Order_ID IN (SELECT Order_ID FROM temp.archive_batch)",
+    "DELETE FROM archive.tbl_Orders_Group WHERE Order_ID_FK IN (SELECT Order_ID FROM temp.archive_batch)",
+    "DELETE FROM archive.tbl_Student_Bookings WHERE Order_ID_FK IN (SELECT Order_ID FROM temp.archive_batch)",
+    '''
+    INSERT INTO archive.tbl_Orders (Order_ID, OrderDate, Meal_ID_FK, Teacher_ID_FK, Student_ID_FK, MealDate, Notes)
+    SELECT Order_ID, OrderDate, Meal_ID_FK, Teacher_ID_FK, Student_ID_FK, MealDate, Notes
+    FROM main.tbl_Orders WHERE Order_ID IN (SELECT Order_ID FROM temp.archive_batch)
+    ''',
+    '''
+    INSERT INTO archive.tbl_Orders_Group (Order_ID_FK, Group_ID_FK, Student_ID_FK)
+    SELECT Order_ID_FK, Group_ID_FK, Student_ID_FK
+    FROM main.tbl_Orders_Group WHERE Order_ID_FK IN (SELECT Order_ID FROM temp.archive_batch)
+    ''',
+    '''
+    INSERT INTO archive.tbl_Student_Bookings (Student_ID_FK, MealDate, Meal_ID_FK, Order_ID_FK, Booked_By)
+    SELECT Student_ID_FK, MealDate, Meal_ID_FK, Order_ID_FK, Booked_By
+    FROM main.tbl_Student_Bookings WHERE Order_ID_FK IN (SELECT Order_ID FROM temp.archive_batch)
+    ''',
+    # Kitchen totals for the batch's dates are recomputed from the archived bookings. A meal can be
+    # archived from two orders when the second took it over in a later batch, so students count once.
+    '''
+    DELETE FROM archive.tbl_Meal_Counts
+    WHERE MealDate IN (SELECT DISTINCT o.MealDate FROM main.tbl_Orders o WHERE o.Order_ID IN (SELECT Order_ID FROM temp.archive_batch))
+    ''',
+    '''
+    INSERT INTO archive.tbl_Meal_Counts (MealDate, Meal_ID_FK, Dietary_ID_FK, Quantity)
+    SELECT b.MealDate, b.Meal_ID_FK, s.Dietary_ID_FK, COUNT(DISTINCT b.Student_ID_FK)
+    FROM archive.tbl_Student_Bookings b
+    JOIN main.tbl_Students s ON s.Student_ID = b.Student_ID_FK
+    WHERE b.MealDate IN (SELECT DISTINCT o.MealDate FROM main.tbl_Orders o WHERE o.Order_ID IN (SELECT Order_ID FROM temp.archive_batch))
+    GROUP BY 1, 2, 3
+    ''',
+    # Links go first: their triggers take the students out of the live counts and booking index
+    "DELETE FROM main.tbl_Orders_Group WHERE Order_ID_FK IN (SELECT Order_ID FROM temp.archive_batch)",
+    "DELETE FROM main.tbl_Orders WHERE Order_ID IN (SELECT Order_ID FROM temp.archive_batch)",
+]
+
+
+# Memberships of retired groups (groups.delete_group) whose last live order has been archived.
+# The group row stays, so archived orders still show its name.
+RETIRED_MEMBERSHIPS_QUERY = '''
+    DELETE FROM main.tbl_Groups_Students
+    WHERE Group_ID_FK IN (
+        SELECT g.Group_ID FROM main.tbl_Groups g
+        WHERE g.RetiredAt IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM main.tbl_Orders_Group og WHERE og.Group_ID_FK = g.Group_ID)
+    )
+'''
+
+
+# Path of the archive database: ORDERING_ARCHIVE_DB, or "<live name>_archive.db" beside the live file
+def archive_path():
+    configured = os.environ.get('ORDERING_ARCHIVE_DB')
+    if configured:
+        return configured
+    root, extension = os.path.splitext(db.DB_PATH)
+    return f"{root}_archive{extension or '.db'}"
+
+
+# (Re)create the history views over the given schemas
+def _create_history_views(conn, schemas):
+    for name, select in HISTORY_VIEWS.items():
+        conn.execute(f"DROP VIEW IF EXISTS temp.{name}")
+        conn.execute(f"CREATE TEMP VIEW {name} AS " + " UNION ALL ".join(select.format(schema=schema) for schema in schemas))
+
+
+# Attach the archive to a connection (once per pooled connection) and create the history views.
+# Returns False when there is no archive yet and create is not set; only run_archive creates it.
+def attach(conn, create=False):
+    attached = any(row[1] == ARCHIVE_SCHEMA for row in conn.execute("PRAGMA database_list"))
+    if not attached:
+        path = archive_path()
+        if not create and not os.path.exists(path):
+            return False
+        conn.execute(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (path,))
+        conn.execute(f"PRAGMA {ARCHIVE_SCHEMA}.journal_mode = WAL")
+        for statement in ARCHIVE_TABLES:
+            conn.execute(statement)
+        _create_history_views(conn, ('main', ARCHIVE_SCHEMA))
+        if conn.in_transaction:
+            conn.commit()
+    return True
+
+
+# Meal dates before this ISO date have been moved to the archive (None if nothing has)
+def archived_before():
+    row = db.fetch_one("SELECT MAX(ArchivedBefore) FROM tbl_Archive_Runs")
+    return row[0] if row else None
+
+
+# True when a report starting at date_from (None = from the beginning) needs archived rows
+def covers(date_from):
+    cutoff = archived_before()
+    if cutoff is None:
+        return False
+    return date_from is None or dates.to_db_date(date_from) < cutoff
+
+
+# Borrow a pooled connection for queries over the v_ history views. The archive is attached
+# when it exists; without one the views cover the live tables alone, as an empty archive would.
+@contextmanager
+def history_connection():
+    with db.connection() as conn:
+        if not attach(conn) and not conn.execute("SELECT 1 FROM temp.sqlite_master WHERE name = 'v_Orders'").fetchone():
+            _create_history_views(conn, ('main',))
+        yield conn
+
+
+# fetch_data over the history views
+def fetch_history(query, params=()):
+    with instrumentation.probe(query) as probe:
+        with history_connection() as conn:
+            rows = conn.execute(query, params).fetchall()
+        probe.rows = len(rows)
+    return rows
+
+
+# Move every order with a meal date before `before` (default: today minus horizon_days) to
+# the archive, batch by batch. Returns the number of orders moved.
+def run_archive(before=None, horizon_days=ARCHIVE_HORIZON_DAYS, batch_size=ARCHIVE_BATCH_ORDERS, on_progress=None):
+    cutoff = dates.to_db_date(before) if before is not None else dates.to_db_date(date.today() - timedelta(days=horizon_days))
+    moved = 0
+    with db.connection() as conn:
+        attach(conn, create=True)
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS archive_batch (Order_ID INTEGER PRIMARY KEY)")
+
+        # Record the run first, so history reports read the union views while orders are moving
+        conn.execute("BEGIN IMMEDIATE")
+        run_id = conn.execute(
+            "INSERT INTO tbl_Archive_Runs (ArchivedBefore, StartedAt, Orders) VALUES (?, ?, 0)",
+            (cutoff, dates.now_db())
+        ).lastrowid
+        conn.commit()
+
+        while True:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM temp.archive_batch")
+                batch_count = conn.execute('''
+                    INSERT INTO temp.archive_batch (Order_ID)
+                    SELECT Order_ID FROM main.tbl_Orders WHERE MealDate < ? ORDER BY MealDate, Order_ID LIMIT ?
+                ''', (cutoff, batch_size)).rowcount
+                if batch_count:
+                    for statement in ARCHIVE_BATCH_STEPS:
+                        conn.execute(statement)
+                    moved += batch_count
+                else:
+                    conn.execute("DELETE FROM main.tbl_Meal_Counts WHERE MealDate < ? AND Quantity = 0", (cutoff,))
+                    conn.execute(RETIRED_MEMBERSHIPS_QUERY)
+                conn.execute("UPDATE tbl_Archive_Runs SET Orders = ?, FinishedAt = ? WHERE Run_ID = ?",
+                             (moved, None if batch_count else dates.now_db(), run_id))
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            if not batch_count:
+                break
+            if on_progress:
+                on_progress(moved)
+    return moved
+
+
+# Run the archive if the last run started more than interval_hours ago, or there has been none.
+# Returns the number of orders moved, or None when no run was due.
+def run_if_due(interval_hours=ARCHIVE_INTERVAL_HOURS):
+    due_before = dates.to_db_datetime(datetime.now() - timedelta(hours=interval_hours))
+    last_started = db.fetch_one("SELECT MAX(StartedAt) FROM tbl_Archive_Runs")[0]
+    if last_started is not None and last_started > due_before:
+        return None
+    return run_archive()
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def _run_scheduled():
+    while True:
+        try:
+            run_if_due()
+        except Exception:
+            logging.getLogger(__name__).exception("Scheduled archive run failed")
+        time.sleep(ARCHIVE_CHECK_SECONDS)
+
+
+# Start the background archive scheduler once per process. Besides keeping the live tables
+# small, each run clears the memberships of retired groups (RETIRED_MEMBERSHIPS_QUERY), so
+# they cannot build up. Processes sharing a database may both run; batches are re-runnable.
+def start_scheduler():
+    global _scheduler
+    if ARCHIVE_INTERVAL_HOURS <= 0:
+        return
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = threading.Thread(target=_run_scheduled, name="archive-scheduler", daemon=True)
+            _scheduler.start()
+
+
+# Live and archived order counts for the admin page
+def archive_summary():
+    with db.connection() as conn:
+        live = conn.execute("SELECT COUNT(*), MIN(MealDate) FROM main.tbl_Orders").fetchone()
+        archived = (conn.execute("SELECT COUNT(*), MIN(MealDate), MAX(MealDate) FROM archive.tbl_Orders").fetchone()
+                    if attach(conn) else (0, None, None))
+    return {
+        'live_orders': live[0],
+        'oldest_live_date': live[1],
+        'archived_orders': archived[0],
+        'oldest_archived_date': archived[1],
+        'newest_archived_date': archived[2],
+    }
+
+
+def recent_runs(limit=10):
+    return db.fetch_data(
+        "SELECT ArchivedBefore, StartedAt, FinishedAt, Orders FROM tbl_Archive_Runs ORDER BY Run_ID DESC LIMIT ?",
+        (limit,)
+    )
+
+
+if __name__ == "__main__":
+    # Scheduled use: python archive.py [days]   (e.g. nightly from cron, with ORDERING_ARCHIVE_HOURS=0
+    # so the app and the API do not also run it)
+    import database
+
+    database.ensure_schema()
+    horizon = int(sys.argv[1]) if len(sys.argv) > 1 else ARCHIVE_HORIZON_DAYS
+    count = run_archive(horizon_days=horizon, on_progress=lambda moved: print(f"Archived {moved} orders..."))
+    print(f"Archived {count} orders with meal dates more than {horizon} days ago into {archive_path()}.")
@@ -0,0 +1,86 @@
+import os
+import hmac
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from db import fetch_data, execute_query
+
+# scrypt work factor: about 50-100 ms per hash on a typical server core
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_BYTES = 16
+
+# Stands in for the stored hash when no account has the email, so an unknown email costs the
+# same scrypt run as a wrong password and response times do not reveal which emails exist.
+# Same work factor as real hashes; an all-zero digest never matches.
+DUMMY_PASSWORD_HASH = f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${'00' * SALT_BYTES}${'00' * 64}"
+
+# hashlib.scrypt releases the GIL, so bulk imports hash on a small pool in parallel
+_hash_pool = ThreadPoolExecutor(max_workers=max(2, os.cpu_count() or 1), thread_name_prefix="password-hash")
+
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=r, p=p, maxmem=128 * n * r * 2)
+
+
+# Hash a password into a self-describing "scrypt$n$r$p$salt$hash" string
+def hash_password(password):
+    salt = os.urandom(SALT_BYTES)
+    digest = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${salt.hex()}${digest.hex()}"
+
+
+# Check a password against a stored value.
+# Rows created before hashing was introduced still hold the plain password; those are
+# compared in constant time and should be re-hashed by the caller (see needs_rehash).
+def verify_password(password, stored):
+    if stored is None:
+        return False
+    if not stored.startswith("scrypt$"):
+        return hmac.compare_digest(str(password).encode('utf-8'), str(stored).encode('utf-8'))
+    try:
+        _, n, r, p, salt, digest = stored.split("$")
+        candidate = _scrypt(password, bytes.fromhex(salt), int(n), int(r), int(p))
+    except ValueError:
+        return False
+    return hmac.compare_digest(candidate.hex(), digest)
+
+
+# True when a stored password is plain text or was hashed with an older work factor
+def needs_rehash(stored):
+    return stored is None or not stored.startswith(f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}$")
+
+
+# Hash many passwords concurrently, preserving order (used by bulk imports)
+def hash_passwords(passwords):
+    return list(_hash_pool.map(hash_password, passwords))
+
+
+# Every account sharing an email, in precedence order (User, Teacher, Student)
+ACCOUNT_LOOKUP_QUERY = "SELECT UserType, Name, Surname, Account_ID, Password FROM tbl_Accounts WHERE Email = ? ORDER BY Priority"
+
+# Where each account type's password lives, for re-hashing legacy plain-text passwords
+PASSWORD_COLUMNS = {
+    'User': ("tbl_User", "User_ID"),
+    'Teacher': ("tbl_Teachers", "Teacher_ID"),
+    'Student': ("tbl_Students", "Student_ID"),
+}
+
+
+# Check credentials with a single indexed probe of tbl_Accounts.
+# Returns (user_type, name, surname, account_id) for the first account whose password matches, or None.
+# This is synchronous: the calling thread waits for the scrypt run (see SCRYPT_N). That is one
+# Streamlit session's own script thread, and scrypt releases the GIL, so other sessions keep
+# running; the API calls it through run_db so its event loop is never held up.
+def authenticate(email, password):
+    accounts = fetch_data(ACCOUNT_LOOKUP_QUERY, (email,))
+    if not accounts:
+        verify_password(password, DUMMY_PASSWORD_HASH)
+        return None
+    for user_type, name, surname, account_id, stored_password in accounts:
+        if verify_password(password, stored_password):
+            if needs_rehash(stored_password):
+                table, id_column = PASSWORD_COLUMNS[user_type]
+                execute_query(f"UPDATE {table} SET Password = ? WHERE {id_column} = ?", (hash_password(password), account_id))
+            return (user_type, name, surname, account_id)
+    return None
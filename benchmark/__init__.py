@@ -0,0 +1,4 @@
+# Synthetic dataset generator and page query benchmarks.
+#
+#   python -m benchmark generate --db bench.db --students 5000 --groups 300 --orders 1000000
+#   python -m benchmark run --db bench.db --output results.json --baseline previous.json
@@ -0,0 +1,73 @@
+import argparse
+import sys
+from benchmark import generate, harness
+
+
+def _generate(args):
+    version = generate.generate(
+        args.db, students=args.students, teachers=args.teachers, groups=args.groups, group_size=args.group_size,
+        orders=args.orders, group_order_share=args.group_order_share, seed=args.seed,
+    )
+    print(f"Generated {args.db} (schema version {version})")
+
+
+def _report_regressions(regressions, threshold):
+    for key, before, after, ratio in regressions:
+        print(f"REGRESSION {key}: {before:.3f} ms -> {after:.3f} ms ({ratio:.2f}x, threshold {threshold:.2f}x)")
+    return 1 if regressions else 0
+
+
+def _run(args):
+    def show(key, result):
+        print(f"{key:<55} p50 {result['p50_ms']:>9.3f}  p95 {result['p95_ms']:>9.3f}  p99 {result['p99_ms']:>9.3f} ms")
+
+    report = harness.run(args.db, iterations=args.iterations, only=args.only, seed=args.seed, on_result=show)
+    if args.output:
+        harness.save(report, args.output)
+    if args.baseline:
+        return _report_regressions(harness.compare(harness.load(args.baseline), report, args.threshold), args.threshold)
+    return 0
+
+
+def _compare(args):
+    regressions = harness.compare(harness.load(args.baseline), harness.load(args.current), args.threshold)
+    return _report_regressions(regressions, args.threshold)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmark", description="Synthetic data and page query benchmarks.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    gen = commands.add_parser("generate", help="build a synthetic database")
+    gen.add_argument("--db", required=True)
+    gen.add_argument("--students", type=int, default=5000)
+    gen.add_argument("--teachers", type=int, default=100)
+    gen.add_argument("--groups", type=int, default=300)
+    gen.add_argument("--group-size", type=int, default=25)
+    gen.add_argument("--orders", type=int, default=1000000)
+    gen.add_argument("--group-order-share", type=float, default=0.05)
+    gen.add_argument("--seed", type=int, default=0)
+    gen.set_defaults(func=_generate)
+
+    run = commands.add_parser("run", help="time every page query and optionally compare with a baseline")
+    run.add_argument("--db", required=True)
+    run.add_argument("--output", help="write results as JSON")
+    run.add_argument("--iterations", type=int, default=harness.ITERATIONS)
+    run.add_argument("--only", help="only run cases whose name contains this text")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--baseline", help="results JSON to compare against; exits 1 on regression")
+    run.add_argument("--threshold", type=float, default=harness.DEFAULT_THRESHOLD)
+    run.set_defaults(func=_run)
+
+    cmp = commands.add_parser("compare", help="compare two results files; exits 1 on regression")
+    cmp.add_argument("baseline")
+    cmp.add_argument("current")
+    cmp.add_argument("--threshold", type=float, default=harness.DEFAULT_THRESHOLD)
+    cmp.set_defaults(func=_compare)
+
+    args = parser.parse_args(argv)
+    return args.func(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+import os
+import random
+import sqlite3
+from datetime import date, datetime, time, timedelta
+import auth
+import database
+import dates
+
+# Every generated account uses this password, so the login benchmark can sign in as anyone
+BENCHMARK_PASSWORD = "benchmark"
+
+GENDERS = ["Male", "Female"]
+DIETARY_OPTIONS = ["None", "Vegetarian", "Vegan", "Halal", "Gluten Free"]
+MEALS = ["Breakfast", "Lunch", "Supper"]
+GRADES = range(8, 13)
+
+# Rows per executemany call while loading
+INSERT_BATCH = 10000
+
+
+def _batches(rows, size=INSERT_BATCH):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# Draw k distinct slot numbers from range(slot_count); falls back to every slot when k is larger
+def _sample_slots(rng, slot_count, k):
+    if k >= slot_count:
+        return list(range(slot_count))
+    return rng.sample(range(slot_count), k)
+
+
+# Build a database at the given scale. Base tables are bulk-loaded into the original schema
+# first and database.migrate() then adds the indexes and derived tables in one set-based pass,
+# which is much faster than firing the maintenance triggers a million times.
+# group_order_share is the fraction of orders placed by teachers for a whole group.
+# Meal dates spread from history_days ago to future_days ahead of today.
+def generate(path, students=5000, teachers=100, groups=300, group_size=25, orders=1000000,
+             group_order_share=0.05, history_days=300, future_days=60, seed=0, users=3):
+    if os.path.exists(path):
+        raise FileExistsError(f"{path} already exists; remove it or choose another path.")
+    rng = random.Random(seed)
+    password_hash = auth.hash_password(BENCHMARK_PASSWORD)
+
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = OFF")
+    database.create_tables(conn)
+
+    c = conn.cursor()
+    c.execute("BEGIN")
+    c.executemany("INSERT INTO tbl_Gender (Gender) VALUES (?)", [(gender,) for gender in GENDERS])
+    c.executemany("INSERT INTO tbl_DietaryOption (Dietary) VALUES (?)", [(dietary,) for dietary in DIETARY_OPTIONS])
+    c.executemany("INSERT INTO tbl_Meal (Meal) VALUES (?)", [(meal,) for meal in MEALS])
+
+    c.executemany(
+        "INSERT INTO tbl_User (Name, Surname, Email, Password) VALUES (?, ?, ?, ?)",
+        [("Admin", str(n), f"admin{n}@bench.example", password_hash) for n in range(1, users + 1)]
+    )
+    c.executemany(
+        "INSERT INTO tbl_Teachers (Name, Surname, Email, Password) VALUES (?, ?, ?, ?)",
+        [("Teacher", str(n), f"teacher{n}@bench.example", password_hash) for n in range(1, teachers + 1)]
+    )
+    for batch in _batches(
+        (f"Student{n}", f"Surname{rng.randrange(students)}", rng.randint(1, len(GENDERS)), rng.choice(GRADES),
+         int(rng.random() < 0.3), rng.choices(range(1, len(DIETARY_OPTIONS) + 1), weights=[70, 15, 5, 7, 3])[0],
+         f"student{n}@bench.example", password_hash)
+        for n in range(1, students + 1)
+    ):
+        c.executemany('''
+            INSERT INTO tbl_Students (Name, Surname, Gender_ID_FK, Grade, Border, Dietary_ID_FK, Email, Password)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', batch)
+
+    group_teachers = [rng.randint(1, teachers) for _ in range(groups)]
+    c.executemany(
+        "INSERT INTO tbl_Groups (Teacher_ID_FK, GroupName) VALUES (?, ?)",
+        [(teacher_id, f"Group {n}") for n, teacher_id in enumerate(group_teachers, start=1)]
+    )
+    memberships = (
+        (group_id, student_id)
+        for group_id in range(1, groups + 1)
+        for student_id in rng.sample(range(1, students + 1), min(group_size, students))
+    )
+    for batch in _batches(memberships):
+        c.executemany("INSERT INTO tbl_Groups_Students (Group_ID_FK, Student_ID_FK) VALUES (?, ?)", batch)
+
+    # Each order takes a distinct (booker, day, meal) slot, so nobody is booked twice by the same route.
+    # Group and individual orders can still overlap; migration 11 keeps the earliest booking.
+    first_day = date.today() - timedelta(days=history_days)
+    day_count = history_days + future_days + 1
+    meal_count = len(MEALS)
+    group_orders = int(orders * group_order_share) if groups else 0
+    student_orders = orders - group_orders
+
+    def order_rows():
+        for slot in _sample_slots(rng, groups * day_count * meal_count, group_orders):
+            group_index, rest = divmod(slot, day_count * meal_count)
+            day, meal_index = divmod(rest, meal_count)
+            meal_date = first_day + timedelta(days=day)
+            yield (meal_date, meal_index + 1, group_teachers[group_index], None, group_index + 1)
+        for slot in _sample_slots(rng, students * day_count * meal_count, student_orders):
+            student_index, rest = divmod(slot, day_count * meal_count)
+            day, meal_index = divmod(rest, meal_count)
+            meal_date = first_day + timedelta(days=day)
+            yield (meal_date, meal_index + 1, None, student_index + 1, None)
+
+    order_id = 0
+    for batch in _batches(order_rows()):
+        order_batch = []
+        link_batch = []
+        for meal_date, meal_id, teacher_id, student_id, group_id in batch:
+            order_id += 1
+            ordered_at = datetime.combine(meal_date - timedelta(days=rng.randint(1, 14)), time(rng.randint(7, 18), rng.randint(0, 59)))
+            order_batch.append((order_id, dates.to_db_datetime(ordered_at), meal_id, teacher_id, student_id, dates.to_db_date(meal_date)))
+            link_batch.append((order_id, group_id, student_id))
+        c.executemany('''
+            INSERT INTO tbl_Orders (Order_ID, OrderDate, Meal_ID_FK, Teacher_ID_FK, Student_ID_FK, MealDate)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', order_batch)
+        c.executemany("INSERT INTO tbl_Orders_Group (Order_ID_FK, Group_ID_FK, Student_ID_FK) VALUES (?, ?, ?)", link_batch)
+    conn.commit()
+
+    version = database.migrate(conn)
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    return version
+
+
+# Row counts of the tables the pages read, recorded alongside benchmark results
+def dataset_summary(conn):
+    tables = ["tbl_Students", "tbl_Teachers", "tbl_Groups", "tbl_Groups_Students", "tbl_Orders", "tbl_Student_Bookings"]
+    return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in tables}
@@ -0,0 +1,252 @@
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+import auth
+import bookings
+import db
+import database
+import frames
+import kitchen
+import reference_data
+import student_editor
+import student_import
+import student_search
+import student
+import teacher
+import user
+from instrumentation import percentile
+from benchmark.generate import BENCHMARK_PASSWORD, dataset_summary
+
+# Timed calls per case, after WARMUP_ITERATIONS untimed ones
+ITERATIONS = 200
+WARMUP_ITERATIONS = 5
+
+# Write cases book dates up to this many days after the last generated order, so they rarely
+# collide with each other or the generated bookings
+FREE_DAYS = 3650
+
+# Days booked at once by the batch booking case
+BATCH_DAYS = 5
+
+# Typed into the student picker: short prefixes match many students, full words few
+SEARCH_TERMS = ["st", "stu", "student12", "surname4", "student3 surname1", "bench"]
+
+# Login is dominated by the scrypt work factor, so it gets fewer iterations
+LOGIN_ITERATIONS = 30
+
+# A case regresses when its p95 grows by more than the threshold ratio and by at least MIN_DELTA_MS,
+# so sub-millisecond noise on fast queries does not fail a run
+DEFAULT_THRESHOLD = 1.25
+MIN_DELTA_MS = 0.5
+COMPARE_METRIC = "p95_ms"
+
+
+# Random but reproducible parameters drawn from the benchmark database
+class Sample:
+    def __init__(self, conn, seed=0):
+        self.rng = random.Random(seed)
+        self.student_ids = [row[0] for row in conn.execute("SELECT Student_ID FROM tbl_Students")]
+        self.student_emails = [row[0] for row in conn.execute("SELECT Email FROM tbl_Students")]
+        self.teacher_ids = [row[0] for row in conn.execute("SELECT DISTINCT Teacher_ID_FK FROM tbl_Groups")]
+        self.group_ids = [row[0] for row in conn.execute("SELECT Group_ID FROM tbl_Groups")]
+        self.group_teachers = dict(conn.execute("SELECT Group_ID, Teacher_ID_FK FROM tbl_Groups"))
+        self.booked_slots = conn.execute("SELECT Student_ID_FK, Meal_ID_FK, MealDate FROM tbl_Student_Bookings LIMIT 1000").fetchall()
+        self.meal_ids = [row[0] for row in conn.execute("SELECT Meal_ID FROM tbl_Meal")]
+        first, last = conn.execute("SELECT MIN(MealDate), MAX(MealDate) FROM tbl_Orders").fetchone()
+        self.first_day = date.fromisoformat(first) if first else date.today()
+        self.day_count = (date.fromisoformat(last) - self.first_day).days + 1 if last else 1
+
+    def student_id(self):
+        return self.rng.choice(self.student_ids)
+
+    def student_email(self):
+        return self.rng.choice(self.student_emails)
+
+    def teacher_id(self):
+        return self.rng.choice(self.teacher_ids)
+
+    def group_id(self):
+        return self.rng.choice(self.group_ids)
+
+    def meal_id(self):
+        return self.rng.choice(self.meal_ids)
+
+    def meal_date(self):
+        return self.first_day + timedelta(days=self.rng.randrange(self.day_count))
+
+    # A date past every generated order, for bookings that should not conflict
+    def free_date(self):
+        return self.first_day + timedelta(days=self.day_count + self.rng.randrange(FREE_DAYS))
+
+    def booked_slot(self):
+        return self.rng.choice(self.booked_slots)
+
+    def emails(self, count):
+        return self.rng.sample(self.student_emails, min(count, len(self.student_emails)))
+
+
+def _uncached_meals(sample):
+    reference_data.invalidate('meals')
+    return reference_data.get_meals()
+
+
+def _second_bookings_page(sample):
+    _, cursor = bookings.fetch_bookings_page({'date_from': sample.meal_date()})
+    return bookings.fetch_bookings_page({}, after=cursor)
+
+
+def _batch_group_booking(sample):
+    group_id = sample.group_id()
+    first = sample.free_date()
+    slots = [(sample.meal_id(), first + timedelta(days=day)) for day in range(BATCH_DAYS)]
+    return bookings.create_group_bookings(sample.group_teachers[group_id], group_id, slots)
+
+
+def _duplicate_booking(sample):
+    student_id, meal_id, meal_date = sample.booked_slot()
+    return bookings.create_student_booking(student_id, meal_id, meal_date)
+
+
+# (page, case name, callable taking a Sample, iterations or None for the default).
+# Every case calls the same function or SQL constant the page itself uses.
+CASES = [
+    ("login", "check_login", lambda s: auth.authenticate(s.student_email(), BENCHMARK_PASSWORD), LOGIN_ITERATIONS),
+
+    ("user: Bookings", "grade filter choices", lambda s: db.fetch_data(user.GRADES_QUERY), None),
+    ("user: Bookings", "group filter choices", lambda s: db.fetch_data(user.ALL_GROUPS_QUERY), None),
+    ("user: Bookings", "first page", lambda s: bookings.fetch_bookings_page({}), None),
+    ("user: Bookings", "first page (cached view)", lambda s: bookings.bookings_page_view({}), None),
+    ("user: Bookings", "first page as a table", lambda s: frames.rows_to_table(bookings.bookings_page_view({})[0], user.BOOKINGS_FRAME), None),
+    ("user: Bookings", "page from a date", _second_bookings_page, None),
+    ("user: Bookings", "one week, one meal", lambda s: bookings.fetch_bookings_page({
+        'date_from': s.meal_date(), 'date_to': s.meal_date() + timedelta(days=7), 'meal_id': s.meal_id()}), None),
+    ("user: Bookings", "one group", lambda s: bookings.fetch_bookings_page({'group_id': s.group_id()}), None),
+    ("user: Kitchen", "production sheet", lambda s: kitchen.daily_production_sheet(s.meal_date()), None),
+    ("user: Import Students", "student editor page", lambda s: student_editor.fetch_student_page(), None),
+    ("user: Import Students", "existing email check", lambda s: student_import.existing_student_emails(s.emails(student_import.EMAIL_LOOKUP_CHUNK)), None),
+    ("user: Meals", "meal list (uncached)", _uncached_meals, None),
+
+    ("teacher: Manage Groups", "groups", lambda s: db.fetch_data(teacher.TEACHER_GROUPS_QUERY, (s.teacher_id(),)), None),
+    ("teacher: Manage Groups", "group members", lambda s: frames.fetch_table(teacher.GROUP_MEMBERS_QUERY, (s.group_id(),), teacher.STUDENT_LIST_FRAME), None),
+    ("teacher: Manage Groups", "student picker page", lambda s: student_search.search_students(exclude_group_id=s.group_id()), None),
+    ("teacher: Manage Groups", "student picker search", lambda s: student_search.search_students(s.rng.choice(SEARCH_TERMS), exclude_group_id=s.group_id()), None),
+    ("teacher: Add Bookings", "group members", lambda s: frames.fetch_table(teacher.GROUP_MEMBERS_QUERY, (s.group_id(),), teacher.STUDENT_LIST_FRAME), None),
+    ("teacher: Add Bookings", "upcoming bookings", lambda s: bookings.fetch_teacher_upcoming(s.teacher_id(), date.today()), None),
+
+    ("student: Groups", "groups", lambda s: frames.fetch_table(student.STUDENT_GROUPS_QUERY, (s.student_id(),), student.STUDENT_GROUPS_FRAME), None),
+    ("student: Bookings", "upcoming bookings", lambda s: bookings.fetch_student_upcoming(s.student_id(), date.today()), None),
+    ("student: Bookings", "upcoming bookings (cached view, warm)", lambda s: bookings.student_upcoming_view(s.student_ids[0], date.today()), None),
+]
+
+# Cases that write, timed against a copy of the database so the benchmark data stays as generated
+WRITE_CASES = [
+    ("student: Bookings", "add booking", lambda s: bookings.create_student_booking(s.student_id(), s.meal_id(), s.free_date()), None),
+    ("student: Bookings", "duplicate booking (refused)", _duplicate_booking, None),
+    ("teacher: Add Bookings", f"group booking over {BATCH_DAYS} days", _batch_group_booking, None),
+]
+
+
+def time_case(func, sample, iterations, warmup=WARMUP_ITERATIONS):
+    for _ in range(warmup):
+        func(sample)
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func(sample)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "iterations": iterations,
+        "p50_ms": round(percentile(timings, 50), 4),
+        "p95_ms": round(percentile(timings, 95), 4),
+        "p99_ms": round(percentile(timings, 99), 4),
+        "mean_ms": round(statistics.fmean(timings), 4),
+        "max_ms": round(timings[-1], 4),
+    }
+
+
+def _selected(page, name, only):
+    return not only or only in f"{page} / {name}"
+
+
+def _time_cases(cases, sample, iterations, only, results, on_result):
+    for page, name, func, case_iterations in cases:
+        if not _selected(page, name, only):
+            continue
+        key = f"{page} / {name}"
+        results[key] = time_case(func, sample, case_iterations or iterations)
+        if on_result:
+            on_result(key, results[key])
+
+
+# Online copy through SQLite's backup API, so a WAL database is copied with its committed pages
+def _copy_database(source, target):
+    source_conn, target_conn = sqlite3.connect(source), sqlite3.connect(target)
+    try:
+        source_conn.backup(target_conn)
+    finally:
+        source_conn.close()
+        target_conn.close()
+
+
+# Time every case (or those whose "page / name" contains `only`) against the database at path.
+# Write cases run last, against a temporary copy of it.
+def run(path, iterations=ITERATIONS, only=None, seed=0, on_result=None):
+    db.configure(path)
+    database.ensure_schema()
+    reference_data.invalidate()
+
+    with db.connection() as conn:
+        sample = Sample(conn, seed)
+        summary = dataset_summary(conn)
+
+    results = {}
+    _time_cases(CASES, sample, iterations, only, results, on_result)
+    if any(_selected(page, name, only) for page, name, _, _ in WRITE_CASES):
+        with tempfile.TemporaryDirectory() as scratch:
+            copy = os.path.join(scratch, "writes.db")
+            _copy_database(path, copy)
+            db.configure(copy)
+            try:
+                _time_cases(WRITE_CASES, sample, iterations, only, results, on_result)
+            finally:
+                db.configure(path)
+
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "database": path,
+        "dataset": summary,
+        "results": results,
+    }
+
+
+def save(report, path):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+# Return (case, baseline ms, current ms, ratio) for every case present in both runs that got slower
+# than the threshold allows
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD, metric=COMPARE_METRIC, min_delta_ms=MIN_DELTA_MS):
+    regressions = []
+    for key, result in current["results"].items():
+        previous = baseline["results"].get(key)
+        if previous is None:
+            continue
+        before, after = previous[metric], result[metric]
+        if after > before * threshold and after - before >= min_delta_ms:
+            regressions.append((key, before, after, after / before if before else float("inf")))
+    return regressions
@@ -0,0 +1,427 @@
+import json
+import archive
+import changes
+import dates
+import reference_data
+from db import fetch_data, queued_write
+
+
+# A student's upcoming bookings, read from the per-student booking index
+STUDENT_UPCOMING_QUERY = '''
+    SELECT DISTINCT Meal_ID_FK, MealDate, Booked_By
+    FROM tbl_Student_Bookings
+    WHERE Student_ID_FK = ? AND MealDate >= ?
+    ORDER BY MealDate ASC
+'''
+
+# A teacher's group bookings from a date onwards
+TEACHER_UPCOMING_QUERY = '''
+    SELECT tbl_Meal.Meal, tbl_Orders.MealDate, tbl_Groups.GroupName
+    FROM tbl_Orders
+    JOIN tbl_Meal ON tbl_Orders.Meal_ID_FK = tbl_Meal.Meal_ID
+    JOIN tbl_Orders_Group ON tbl_Orders.Order_ID = tbl_Orders_Group.Order_ID_FK
+    JOIN tbl_Groups ON tbl_Orders_Group.Group_ID_FK = tbl_Groups.Group_ID
+    WHERE tbl_Orders.Teacher_ID_FK = ? AND tbl_Orders.MealDate >= ?
+    ORDER BY tbl_Orders.MealDate ASC
+'''
+
+
+# Return (Meal, MealDate, BookedBy) for the student's bookings from from_date onwards
+def fetch_student_upcoming(student_id, from_date):
+    meals = dict(reference_data.get_meals())
+    rows = fetch_data(STUDENT_UPCOMING_QUERY, (student_id, dates.to_db_date(from_date)))
+    return [(meals.get(meal_id, meal_id), meal_date, booked_by) for meal_id, meal_date, booked_by in rows]
+
+
+# Return (Meal, MealDate, GroupName) for the teacher's group bookings from from_date onwards
+def fetch_teacher_upcoming(teacher_id, from_date):
+    return fetch_data(TEACHER_UPCOMING_QUERY, (teacher_id, dates.to_db_date(from_date)))
+
+
+# The booking pages are read far more often than bookings change, so the pages use these
+# cached views: each keeps its last result with the change log Seq it saw (see changes.py)
+# and re-reads only the bookings that changed since.
+
+STUDENT_GROUP_IDS_QUERY = "SELECT Group_ID_FK FROM tbl_Groups_Students WHERE Student_ID_FK = ?"
+
+# A student's bookings in the given (MealDate, Meal_ID) slots, a JSON list of pairs
+STUDENT_SLOTS_QUERY = '''
+    SELECT Meal_ID_FK, MealDate, Booked_By
+    FROM tbl_Student_Bookings
+    WHERE Student_ID_FK = ? AND (MealDate, Meal_ID_FK) IN (
+        SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]') FROM json_each(?)
+    )
+'''
+
+# TEACHER_UPCOMING_QUERY keyed by Order_ID; {orders} narrows it to a JSON list of Order_IDs
+TEACHER_UPCOMING_ORDERS_QUERY = '''
+    SELECT tbl_Orders.Order_ID, tbl_Orders.Meal_ID_FK, tbl_Orders.MealDate, tbl_Groups.GroupName
+    FROM tbl_Orders
+    JOIN tbl_Orders_Group ON tbl_Orders.Order_ID = tbl_Orders_Group.Order_ID_FK
+    JOIN tbl_Groups ON tbl_Orders_Group.Group_ID_FK = tbl_Groups.Group_ID
+    WHERE tbl_Orders.Teacher_ID_FK = ? AND tbl_Orders.MealDate >= ? {orders}
+'''
+
+BOOKING_TABLES = ('tbl_Orders', 'tbl_Orders_Group')
+
+
+# State: (the student's groups, {(MealDate, Meal_ID): row}, rows in date order)
+def _student_upcoming_state(groups, booked):
+    return groups, booked, sorted(booked.values(), key=lambda row: (row[1], row[0]))
+
+
+def _load_student_upcoming(student_id, from_date):
+    groups = frozenset(group_id for (group_id,) in fetch_data(STUDENT_GROUP_IDS_QUERY, (student_id,)))
+    rows = fetch_data(STUDENT_UPCOMING_QUERY, (student_id, from_date))
+    return _student_upcoming_state(groups, {(row[1], row[0]): tuple(row) for row in rows})
+
+
+# Re-read the slots touched by the student's own orders or their groups' orders. Only a
+# membership change needs a reload, since it changes which group orders apply.
+def _update_student_upcoming(student_id, from_date, state, changes):
+    groups, booked, _ = state
+    slots = set()
+    for change in changes:
+        if change.table == 'tbl_Groups_Students' and change.student_id == student_id:
+            return None
+        if change.table not in BOOKING_TABLES:
+            continue
+        if change.student_id != student_id and change.group_id not in groups:
+            continue
+        if change.meal_date is None:
+            return None
+        if change.meal_date >= from_date:
+            slots.add((change.meal_date, change.meal_id))
+    if not slots:
+        return state
+    booked = {slot: row for slot, row in booked.items() if slot not in slots}
+    for row in fetch_data(STUDENT_SLOTS_QUERY, (student_id, json.dumps(sorted(slots)))):
+        booked[(row[1], row[0])] = tuple(row)
+    return _student_upcoming_state(groups, booked)
+
+
+# fetch_student_upcoming through the change log cache
+def student_upcoming_view(student_id, from_date):
+    from_date = dates.to_db_date(from_date)
+    _, _, rows = changes.cached_view(
+        ('student_upcoming', student_id, from_date),
+        lambda: _load_student_upcoming(student_id, from_date),
+        lambda state, new: _update_student_upcoming(student_id, from_date, state, new),
+    )
+    meals = dict(reference_data.get_meals())
+    return [(meals.get(meal_id, meal_id), meal_date, booked_by) for meal_id, meal_date, booked_by in rows]
+
+
+# State: ({Order_ID: rows}, rows in date order)
+def _teacher_upcoming_state(orders):
+    rows = sorted((row for order_rows in orders.values() for row in order_rows), key=lambda row: (row[2], row[0]))
+    return orders, rows
+
+
+def _read_teacher_orders(teacher_id, from_date, order_ids=None):
+    query = TEACHER_UPCOMING_ORDERS_QUERY.format(orders="" if order_ids is None else
+                                                 "AND tbl_Orders.Order_ID IN (SELECT value FROM json_each(?))")
+    params = (teacher_id, from_date) if order_ids is None else (teacher_id, from_date, json.dumps(sorted(order_ids)))
+    orders = {}
+    for row in fetch_data(query, params):
+        orders.setdefault(row[0], []).append(tuple(row))
+    return orders
+
+
+# Re-read the teacher's orders that changed; renaming one of their groups reloads
+def _update_teacher_upcoming(teacher_id, from_date, state, changes):
+    orders, _ = state
+    changed = set()
+    for change in changes:
+        if change.teacher_id != teacher_id:
+            continue
+        if change.table == 'tbl_Groups' or change.meal_date is None:
+            return None
+        if change.table in BOOKING_TABLES and change.meal_date >= from_date:
+            changed.add(change.order_id)
+    if not changed:
+        return state
+    orders = {order_id: rows for order_id, rows in orders.items() if order_id not in changed}
+    orders.update(_read_teacher_orders(teacher_id, from_date, changed))
+    return _teacher_upcoming_state(orders)
+
+
+# fetch_teacher_upcoming through the change log cache
+def teacher_upcoming_view(teacher_id, from_date):
+    from_date = dates.to_db_date(from_date)
+    _, rows = changes.cached_view(
+        ('teacher_upcoming', teacher_id, from_date),
+        lambda: _teacher_upcoming_state(_read_teacher_orders(teacher_id, from_date)),
+        lambda state, new: _update_teacher_upcoming(teacher_id, from_date, state, new),
+    )
+    meals = dict(reference_data.get_meals())
+    return [(meals.get(meal_id, meal_id), meal_date, group_name) for _, meal_id, meal_date, group_name in rows]
+
+
+# Upper bound on (date, meal) slots in one batch booking, so a mistyped date range cannot
+# book a group for years in a single click
+MAX_BATCH_SLOTS = 400
+
+# Students the given orders (a JSON list of Order_IDs) cover but who got no booking row from
+# them: the unique (student, date, meal) index made the expansion trigger skip them (ON
+# CONFLICT DO NOTHING) because they already had the meal
+SKIPPED_BOOKINGS_QUERY = '''
+    SELECT o.MealDate, o.Meal_ID_FK, s.Student_ID, s.Name || ' ' || s.Surname AS StudentName
+    FROM tbl_Orders o
+    JOIN tbl_Orders_Group og ON og.Order_ID_FK = o.Order_ID
+    LEFT JOIN tbl_Groups_Students gs ON gs.Group_ID_FK = og.Group_ID_FK
+    JOIN tbl_Students s ON s.Student_ID = COALESCE(gs.Student_ID_FK, og.Student_ID_FK)
+    WHERE o.Order_ID IN (SELECT value FROM json_each(?))
+      AND NOT EXISTS (
+          SELECT 1 FROM tbl_Student_Bookings b
+          WHERE b.Student_ID_FK = s.Student_ID AND b.MealDate = o.MealDate
+            AND b.Meal_ID_FK = o.Meal_ID_FK AND b.Order_ID_FK = o.Order_ID
+      )
+    ORDER BY o.MealDate, o.Meal_ID_FK, s.Surname, s.Name
+'''
+
+
+# Normalise (meal_id, meal_date) pairs into sorted, distinct (MealDate, Meal_ID) slots
+def _batch_slots(slots):
+    slots = sorted({(dates.to_db_date(meal_date), int(meal_id)) for meal_id, meal_date in slots})
+    if len(slots) > MAX_BATCH_SLOTS:
+        raise ValueError(f"A batch booking can cover at most {MAX_BATCH_SLOTS} meals; {len(slots)} were requested.")
+    return slots
+
+
+INSERT_ORDER_QUERY = '''
+    INSERT INTO tbl_Orders (OrderDate, Meal_ID_FK, Teacher_ID_FK, Student_ID_FK, MealDate)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+# Link every order in a JSON list of Order_IDs to the same group or student
+LINK_ORDERS_QUERY = '''
+    INSERT INTO tbl_Orders_Group (Order_ID_FK, Group_ID_FK, Student_ID_FK)
+    SELECT value, ?, ? FROM json_each(?)
+'''
+
+
+# Insert one order per (MealDate, Meal_ID) slot, collecting each new Order_ID from lastrowid,
+# and link them all with a single INSERT ... SELECT. Returns the new Order_IDs.
+def _insert_batch_orders(conn, slots, teacher_id, student_id, group_id):
+    order_date = dates.now_db()
+    order_ids = [
+        conn.execute(INSERT_ORDER_QUERY, (order_date, meal_id, teacher_id, student_id, meal_date)).lastrowid
+        for meal_date, meal_id in slots
+    ]
+    conn.execute(LINK_ORDERS_QUERY, (group_id, student_id, json.dumps(order_ids)))
+    return order_ids
+
+
+# Book every slot, then read back who the database refused as already booked. Slots where
+# anyone was refused are not booked at all (a group books all its members or none): the
+# insert is rolled back to the savepoint and redone for the free slots only, which cannot
+# conflict because the write lock is still held.
+# Returns (new Order_IDs, list of (MealDate, Meal_ID, Student_ID, StudentName) conflicts).
+def _book_slots(conn, slots, teacher_id, student_id, group_id):
+    conn.execute("SAVEPOINT book_slots")
+    try:
+        order_ids = _insert_batch_orders(conn, slots, teacher_id, student_id, group_id)
+        conflicts = conn.execute(SKIPPED_BOOKINGS_QUERY, (json.dumps(order_ids),)).fetchall()
+        if conflicts:
+            conn.execute("ROLLBACK TO book_slots")
+            taken = {(meal_date, meal_id) for meal_date, meal_id, _, _ in conflicts}
+            free_slots = [slot for slot in slots if slot not in taken]
+            order_ids = _insert_batch_orders(conn, free_slots, teacher_id, student_id, group_id) if free_slots else []
+    except Exception:
+        conn.execute("ROLLBACK TO book_slots")
+        conn.execute("RELEASE book_slots")
+        raise
+    conn.execute("RELEASE book_slots")
+    return order_ids, conflicts
+
+
+# Book a meal for one student in one queued transaction. The unique booking index decides
+# whether the student already has it. Returns the new Order_ID, or None if they do.
+def create_student_booking(student_id, meal_id, meal_date):
+    slots = _batch_slots([(meal_id, meal_date)])
+
+    def job(conn):
+        order_ids, _ = _book_slots(conn, slots, None, student_id, None)
+        return order_ids[0] if order_ids else None
+
+    return queued_write(job)
+
+
+# Book a meal for a whole group in one queued transaction. If any member already has the
+# meal, nothing is booked.
+# Returns (new Order_ID or None, list of (Student_ID, StudentName) already booked).
+def create_group_booking(teacher_id, group_id, meal_id, meal_date):
+    slots = _batch_slots([(meal_id, meal_date)])
+
+    def job(conn):
+        order_ids, conflicts = _book_slots(conn, slots, teacher_id, None, group_id)
+        return (order_ids[0] if order_ids else None), [(student, name) for _, _, student, name in conflicts]
+
+    return queued_write(job)
+
+
+# Book several (meal_id, meal_date) slots for one student in one queued transaction.
+# Slots the student already has are skipped and reported.
+# Returns (new Order_IDs, list of (MealDate, Meal_ID) already booked).
+def create_student_bookings(student_id, slots):
+    slots = _batch_slots(slots)
+
+    def job(conn):
+        order_ids, conflicts = _book_slots(conn, slots, None, student_id, None)
+        return order_ids, [(meal_date, meal_id) for meal_date, meal_id, _, _ in conflicts]
+
+    return queued_write(job)
+
+
+# Book a group for several (meal_id, meal_date) slots in one queued transaction. A slot where
+# any member already has the meal is skipped, like a single group booking, and reported.
+# Returns (new Order_IDs, list of (MealDate, Meal_ID, Student_ID, StudentName) conflicts).
+def create_group_bookings(teacher_id, group_id, slots):
+    slots = _batch_slots(slots)
+
+    def job(conn):
+        return _book_slots(conn, slots, teacher_id, None, group_id)
+
+    return queued_write(job)
+
+
+# One row per booked student, so individual orders (linked through tbl_Orders_Group.Student_ID_FK)
+# and group orders (expanded through tbl_Groups_Students) show up side by side. A member who
+# already had the meal through another order is listed under that order only.
+BOOKINGS_PAGE_QUERY = '''
+    SELECT
+        o.Order_ID,
+        s.Student_ID,
+        o.MealDate,
+        m.Meal,
+        s.Name || ' ' || s.Surname AS StudentName,
+        s.Grade,
+        s.Border,
+        g.GroupName
+    FROM tbl_Orders o
+    JOIN tbl_Orders_Group og ON og.Order_ID_FK = o.Order_ID
+    LEFT JOIN tbl_Groups_Students gs ON gs.Group_ID_FK = og.Group_ID_FK AND EXISTS (
+        SELECT 1 FROM tbl_Student_Bookings b
+        WHERE b.Student_ID_FK = gs.Student_ID_FK AND b.MealDate = o.MealDate
+          AND b.Meal_ID_FK = o.Meal_ID_FK AND b.Order_ID_FK = o.Order_ID
+    )
+    LEFT JOIN tbl_Students s ON s.Student_ID = COALESCE(gs.Student_ID_FK, og.Student_ID_FK)
+    LEFT JOIN tbl_Meal m ON m.Meal_ID = o.Meal_ID_FK
+    LEFT JOIN tbl_Groups g ON g.Group_ID = og.Group_ID_FK
+    {where}
+    ORDER BY o.MealDate, o.Order_ID, COALESCE(s.Student_ID, 0)
+    LIMIT ?
+'''
+
+# The same rows over live and archived orders (v_Booking_History, see archive.py), used once
+# the date range reaches back past the archive horizon. Archived group orders keep the members
+# they had when they were archived.
+HISTORY_PAGE_QUERY = '''
+    SELECT
+        o.Order_ID,
+        o.Student_ID,
+        o.MealDate,
+        m.Meal,
+        s.Name || ' ' || s.Surname AS StudentName,
+        s.Grade,
+        s.Border,
+        g.GroupName
+    FROM v_Booking_History o
+    LEFT JOIN tbl_Students s ON s.Student_ID = o.Student_ID
+    LEFT JOIN tbl_Meal m ON m.Meal_ID = o.Meal_ID_FK
+    LEFT JOIN tbl_Groups g ON g.Group_ID = o.Group_ID_FK
+    {where}
+    ORDER BY o.MealDate, o.Order_ID, o.Student_ID
+    LIMIT ?
+'''
+
+
+# Translate the admin filters (date_from, date_to, meal_id, grade, border, group_id) into SQL.
+# Filters left as None are not applied. history selects the column names of HISTORY_PAGE_QUERY.
+def booking_filter_clauses(filters, history=False):
+    clauses = []
+    params = []
+    if filters.get('date_from') is not None:
+        clauses.append("o.MealDate >= ?")
+        params.append(dates.to_db_date(filters['date_from']))
+    if filters.get('date_to') is not None:
+        clauses.append("o.MealDate <= ?")
+        params.append(dates.to_db_date(filters['date_to']))
+    if filters.get('meal_id') is not None:
+        clauses.append("o.Meal_ID_FK = ?")
+        params.append(filters['meal_id'])
+    if filters.get('grade') is not None:
+        clauses.append("s.Grade = ?")
+        params.append(filters['grade'])
+    if filters.get('border') is not None:
+        clauses.append("s.Border = ?")
+        params.append(int(filters['border']))
+    if filters.get('group_id') is not None:
+        clauses.append("o.Group_ID_FK = ?" if history else "og.Group_ID_FK = ?")
+        params.append(filters['group_id'])
+    return clauses, params
+
+
+# Fetch one page of bookings using keyset pagination on (MealDate, Order_ID, Student_ID).
+# `after` is the cursor returned with the previous page; returns (rows, cursor for the next page or None).
+# Ranges reaching back past the archive horizon are read through the history views.
+def fetch_bookings_page(filters, after=None, page_size=50):
+    history = archive.covers(filters.get('date_from'))
+    clauses, params = booking_filter_clauses(filters, history)
+    if after is not None:
+        meal_date, order_id, student_id = after
+        student_key = "o.Student_ID" if history else "COALESCE(s.Student_ID, 0)"
+        # The first comparison can use idx_Orders_MealDate_Order, the second breaks ties within an order
+        clauses.append("(o.MealDate, o.Order_ID) >= (?, ?)")
+        clauses.append(f"(o.MealDate, o.Order_ID, {student_key}) > (?, ?, ?)")
+        params += [meal_date, order_id, meal_date, order_id, student_id]
+    where = "WHERE " + " AND ".join(clauses) if clauses else ""
+
+    if history:
+        rows = archive.fetch_history(HISTORY_PAGE_QUERY.format(where=where), params + [page_size + 1])
+    else:
+        rows = fetch_data(BOOKINGS_PAGE_QUERY.format(where=where), params + [page_size + 1])
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    last = rows[-1]
+    return rows, (last[2], last[0], last[1] or 0)
+
+
+# A cached page stays valid while every change falls outside the dates it covers: from its
+# cursor (or date_from) to its last row (or date_to on the final page). Changes without a
+# meal date (memberships, student details, meal names) reload it, except new students,
+# groups and meals, which have no bookings yet, and dietary options, genders and served
+# meals, not shown.
+def _update_bookings_page(state, changes):
+    _, _, low, high = state
+    for change in changes:
+        if change.table not in BOOKING_TABLES + ('tbl_Groups_Students',) and change.operation == 'I':
+            continue
+        if change.table in ('tbl_DietaryOption', 'tbl_Gender', 'tbl_Meals_Served'):
+            continue
+        if change.meal_date is None:
+            return None
+        if (low is None or change.meal_date >= low) and (high is None or change.meal_date <= high):
+            return None
+    return state
+
+
+def _load_bookings_page(filters, after, page_size):
+    rows, cursor = fetch_bookings_page(filters, after, page_size)
+    low = after[0] if after is not None else dates.to_db_date(filters.get('date_from'))
+    high = rows[-1][2] if cursor is not None else dates.to_db_date(filters.get('date_to'))
+    return rows, cursor, low, high
+
+
+# fetch_bookings_page through the change log cache
+def bookings_page_view(filters, after=None, page_size=50):
+    key = tuple(sorted((name, dates.to_db_date(value) if name in ('date_from', 'date_to') else value)
+                       for name, value in filters.items()))
+    rows, cursor, _, _ = changes.cached_view(
+        ('bookings_page', key, after, page_size),
+        lambda: _load_bookings_page(filters, after, page_size),
+        _update_bookings_page,
+    )
+    return rows, cursor
@@ -0,0 +1,128 @@
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+import db
+from db import fetch_data, fetch_one
+
+# Changes kept in memory for cached views to catch up from; a view further behind is reloaded
+FEED_SIZE = 20000
+
+# Cached view results kept per process, least recently used dropped first
+MAX_CACHED_VIEWS = 2000
+
+# File timestamps are coarse, so a commit in the same tick as the last one can leave the stamp
+# unchanged. Stamps this recent are not trusted and the log is read again on the next poll.
+RACY_STAMP_NS = 1_000_000_000
+
+CHANGES_QUERY = '''
+    SELECT Seq, TableName, Operation, Order_ID, Group_ID, Student_ID, Teacher_ID, MealDate, Meal_ID
+    FROM tbl_Change_Log
+    WHERE Seq > ?
+    ORDER BY Seq
+    LIMIT ?
+'''
+
+LATEST_SEQ_QUERY = "SELECT COALESCE(MAX(Seq), 0) FROM tbl_Change_Log"
+
+Change = namedtuple('Change', ['seq', 'table', 'operation', 'order_id', 'group_id', 'student_id',
+                               'teacher_id', 'meal_date', 'meal_id'])
+
+
+# This process's copy of the tail of tbl_Change_Log (see database.change_log_statements),
+# shared by every cached view
+class ChangeFeed:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset(None)
+
+    def _reset(self, path):
+        self.path = path
+        self.stamp = None
+        self.seq = None
+        self.first_seq = None
+        self.changes = deque()
+
+    # Catch up with the log and return the latest Seq. When the database files are untouched
+    # since the last poll nothing has been committed, and the database is not queried at all.
+    def poll(self):
+        with self._lock:
+            if self.path != db.DB_PATH:
+                self._reset(db.DB_PATH)
+                invalidate()
+            stamp = db.data_stamp()
+            if stamp == self.stamp:
+                return self.seq
+            if self.seq is None:
+                self.seq = self.first_seq = fetch_one(LATEST_SEQ_QUERY)[0]
+            else:
+                rows = fetch_data(CHANGES_QUERY, (self.seq, FEED_SIZE + 1))
+                if len(rows) > FEED_SIZE:
+                    # Too far behind to replay: views older than the newest change reload
+                    self.changes.clear()
+                    self.seq = self.first_seq = fetch_one(LATEST_SEQ_QUERY)[0]
+                else:
+                    self.changes.extend(Change(*row) for row in rows)
+                    if rows:
+                        self.seq = rows[-1][0]
+                    while len(self.changes) > FEED_SIZE:
+                        self.first_seq = self.changes.popleft().seq
+            newest = max((part[2] for part in stamp if part), default=0)
+            self.stamp = stamp if time.time_ns() - newest > RACY_STAMP_NS else None
+            return self.seq
+
+    # The changes after seq, oldest first, or None when they are no longer all held
+    def since(self, seq):
+        with self._lock:
+            if self.first_seq is None or seq < self.first_seq:
+                return None
+            newer = []
+            for change in reversed(self.changes):
+                if change.seq <= seq:
+                    break
+                newer.append(change)
+            newer.reverse()
+            return newer
+
+
+feed = ChangeFeed()
+
+_views = OrderedDict()
+_views_lock = threading.Lock()
+
+
+# Return the cached state of a view, brought up to date with the changes since it was built.
+# load() builds the state from scratch; update(state, changes) returns the state with the
+# changes applied (the same object when none of them matter), or None to have it reloaded.
+# While nothing has been committed this is answered from memory.
+def cached_view(key, load, update):
+    seq = feed.poll()
+    with _views_lock:
+        entry = _views.get(key)
+        if entry is not None:
+            _views.move_to_end(key)
+    state = None
+    if entry is not None:
+        seen, state = entry
+        if seen == seq:
+            return state
+        changes = feed.since(seen)
+        state = None if changes is None else update(state, changes)
+    if state is None:
+        state = load()
+    with _views_lock:
+        current = _views.get(key)
+        if current is None or current[0] <= seq:
+            _views[key] = (seq, state)
+            _views.move_to_end(key)
+        while len(_views) > MAX_CACHED_VIEWS:
+            _views.popitem(last=False)
+    return state
+
+
+# Drop one cached view, or every one (e.g. after pointing the process at another database)
+def invalidate(key=None):
+    with _views_lock:
+        if key is None:
+            _views.clear()
+        else:
+            _views.pop(key, None)
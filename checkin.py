@@ -0,0 +1,215 @@
+import atexit
+import json
+import logging
+import threading
+import time
+from collections import namedtuple
+from datetime import date
+import changes
+import dates
+from db import execute_many, fetch_data
+
+# Bookings change during service (late bookings, group changes), so an open service catches
+# up from the change log this often. While nothing has been committed that costs no query.
+CHECKIN_REFRESH_SECONDS = 1
+
+# Served meals are written in one transaction per batch: every CHECKIN_FLUSH_SECONDS, or as
+# soon as CHECKIN_FLUSH_SIZE swipes are waiting
+CHECKIN_FLUSH_SECONDS = 1
+CHECKIN_FLUSH_SIZE = 200
+
+# Everyone booked for one meal, individually or through a group (idx_Student_Bookings_Meal range)
+BOOKED_STUDENTS_QUERY = '''
+    SELECT DISTINCT b.Student_ID_FK, s.Name || ' ' || s.Surname AS StudentName
+    FROM tbl_Student_Bookings b
+    JOIN tbl_Students s ON s.Student_ID = b.Student_ID_FK
+    WHERE b.MealDate = ? AND b.Meal_ID_FK = ? {students}
+'''
+
+# Limits BOOKED_STUDENTS_QUERY to a JSON list of Student_IDs (the table's primary key)
+CHANGED_STUDENTS_FILTER = "AND b.Student_ID_FK IN (SELECT value FROM json_each(?))"
+
+SERVED_STUDENTS_QUERY = "SELECT Student_ID_FK FROM tbl_Meals_Served WHERE MealDate = ? AND Meal_ID_FK = ?"
+
+RECORD_SERVED_QUERY = "INSERT OR IGNORE INTO tbl_Meals_Served (MealDate, Meal_ID_FK, Student_ID_FK, ServedAt) VALUES (?, ?, ?, ?)"
+
+BOOKING_TABLES = ('tbl_Orders', 'tbl_Orders_Group')
+
+# Outcomes of a swipe
+SERVED = 'served'
+ALREADY_SERVED = 'already served'
+NOT_BOOKED = 'not booked'
+
+CheckIn = namedtuple('CheckIn', ['status', 'student_id', 'name'])
+
+
+# One meal being served: an in-memory index of who is booked and who has been served.
+# A swipe is a dictionary lookup and a set insert. The database is touched by the background
+# thread, which applies the change log to the index and writes served meals in batches, and by
+# a swipe that misses the index, which asks it once more before answering NOT_BOOKED.
+class MealService:
+    def __init__(self, meal_date, meal_id):
+        self.meal_date = dates.to_db_date(meal_date)
+        self.meal_id = meal_id
+        self.booked = {}
+        self.served = set()
+        self.seq = None
+        self.refreshed_at = None
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self.reload()
+        self._thread = threading.Thread(target=self._run, name=f"checkin-{self.meal_date}-{meal_id}", daemon=True)
+        self._thread.start()
+
+    # Read the booked and served students from scratch. The change log position is taken first,
+    # so anything committed while reading is applied again by the next refresh.
+    # The booked index is replaced in one assignment, so a swipe never sees a half-built one.
+    def reload(self):
+        seq = changes.feed.poll()
+        booked = dict(fetch_data(BOOKED_STUDENTS_QUERY.format(students=""), (self.meal_date, self.meal_id)))
+        served = {student_id for (student_id,) in fetch_data(SERVED_STUDENTS_QUERY, (self.meal_date, self.meal_id))}
+        with self._lock:
+            self.booked = booked
+            self.served |= served
+        self.seq = seq
+        self.refreshed_at = time.time()
+
+    # Bring the index up to date with the changes committed since the last refresh: re-read the
+    # students whose bookings for this meal (or names) changed, and add meals served elsewhere.
+    # Reloads when the feed no longer holds the changes, or a group's booking for this meal
+    # changed, since the log does not say which students that covers.
+    def refresh(self):
+        seq = changes.feed.poll()
+        if seq == self.seq:
+            self.refreshed_at = time.time()
+            return
+        new = changes.feed.since(self.seq)
+        if new is None:
+            return self.reload()
+        students = set()
+        served = set()
+        for change in new:
+            this_meal = change.meal_date == self.meal_date and change.meal_id == self.meal_id
+            if change.table == 'tbl_Meals_Served':
+                if this_meal and change.operation == 'I':
+                    served.add(change.student_id)
+            elif change.table in ('tbl_Students', 'tbl_Groups_Students'):
+                students.add(change.student_id)
+            elif change.table in BOOKING_TABLES and (this_meal or change.meal_date is None):
+                if change.student_id is None:
+                    return self.reload()
+                students.add(change.student_id)
+        if students:
+            self._update_students(students)
+        with self._lock:
+            self.served |= served
+        self.seq = seq
+        self.refreshed_at = time.time()
+
+    # Re-read whether each of the students is booked, and under what name; returns the index
+    def _update_students(self, students):
+        rows = fetch_data(BOOKED_STUDENTS_QUERY.format(students=CHANGED_STUDENTS_FILTER),
+                          (self.meal_date, self.meal_id, json.dumps(sorted(students))))
+        with self._lock:
+            booked = {student_id: name for student_id, name in self.booked.items() if student_id not in students}
+            booked.update(rows)
+            self.booked = booked
+        return booked
+
+    # Record a card swipe. Returns a CheckIn with SERVED, ALREADY_SERVED or NOT_BOOKED.
+    # A student missing from the index may have booked since the last refresh, so unless
+    # recheck is False (the caller cannot block) they are looked up before being turned away.
+    def check_in(self, student_id, recheck=True):
+        name = self.booked.get(student_id)
+        if name is None and recheck:
+            name = self._update_students({student_id}).get(student_id)
+        if name is None:
+            return CheckIn(NOT_BOOKED, student_id, None)
+        with self._lock:
+            if student_id in self.served:
+                return CheckIn(ALREADY_SERVED, student_id, name)
+            self.served.add(student_id)
+            self._pending.append((self.meal_date, self.meal_id, student_id, dates.now_db()))
+            full = len(self._pending) >= CHECKIN_FLUSH_SIZE
+        if full:
+            self._wake.set()
+        return CheckIn(SERVED, student_id, name)
+
+    # Write waiting served meals with one executemany; they are kept for the next try on failure
+    def flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return 0
+        try:
+            execute_many(RECORD_SERVED_QUERY, batch)
+        except Exception:
+            with self._lock:
+                self._pending[:0] = batch
+            raise
+        return len(batch)
+
+    def _run(self):
+        next_refresh = time.monotonic() + CHECKIN_REFRESH_SECONDS
+        while not self._stop.is_set():
+            self._wake.wait(CHECKIN_FLUSH_SECONDS)
+            self._wake.clear()
+            try:
+                self.flush()
+                if time.monotonic() >= next_refresh:
+                    self.refresh()
+                    next_refresh = time.monotonic() + CHECKIN_REFRESH_SECONDS
+            except Exception:
+                logging.getLogger(__name__).exception("Meal service %s/%s could not update", self.meal_date, self.meal_id)
+
+    # Stop the background thread and write any served meals still waiting
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        self.flush()
+
+    # (booked, served, waiting to be written)
+    def summary(self):
+        with self._lock:
+            return len(self.booked), len(self.served), len(self._pending)
+
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+# The open service for a meal (default today), opening it on first use. Serving counters
+# in the same process share it; services left open from earlier days are closed.
+def open_service(meal_id, meal_date=None):
+    key = (dates.to_db_date(meal_date or date.today()), int(meal_id))
+    with _services_lock:
+        service = _services.get(key)
+        if service is None:
+            for stale_key in [other for other in _services if other[0] < key[0]]:
+                _services.pop(stale_key).close()
+            service = _services[key] = MealService(*key)
+    return service
+
+
+# The open service for a meal, or None
+def get_service(meal_id, meal_date=None):
+    return _services.get((dates.to_db_date(meal_date or date.today()), int(meal_id)))
+
+
+def close_service(meal_id, meal_date=None):
+    with _services_lock:
+        service = _services.pop((dates.to_db_date(meal_date or date.today()), int(meal_id)), None)
+    if service is not None:
+        service.close()
+
+
+@atexit.register
+def close_all():
+    with _services_lock:
+        services = list(_services.values())
+        _services.clear()
+    for service in services:
+        service.close()
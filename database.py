@@ -1,106 +1,838 @@
+import sys
 import sqlite3
+import threading
+import db
 
-# Create a connection to SQLite database
-conn = sqlite3.connect('ordering.db')
-c = conn.cursor()
 
 # Create tables based on your provided schema
+def create_tables(conn):
+    c = conn.cursor()
 
-# tbl_DietaryOption
-c.execute('''CREATE TABLE IF NOT EXISTS tbl_DietaryOption (
-    Dietary_ID INTEGER PRIMARY KEY AUTOINCREMENT,
-    Dietary VARCHAR NOT NULL
-);''')
-
-# tbl_Gender
-c.execute('''CREATE TABLE IF NOT EXISTS tbl_Gender (
-    Gender_ID INTEGER PRIMARY KEY AUTOINCREMENT,
-    Gender VARCHAR NOT NULL
-);''')
-
-# tbl_Meal
-c.execute('''CREATE TABLE IF NOT EXISTS tbl_Meal (
-    Meal_ID INTEGER PRIMARY KEY AUTOINCREMENT,
-    Meal VARCHAR NOT NULL
-);''')
-
-# tbl_Students
-c.execute('''CREATE TABLE IF NOT EXISTS tbl_Students (
-    Student_ID INTEGER PRIMARY KEY AUTOINCREMENT,
-    Name VARCHAR NOT NULL,
-    Surname VARCHAR NOT NULL,
-    Gender_ID_FK INTEGER NOT NULL,
-    Grade INTEGER NOT NULL,
-    Border BOOLEAN NOT NULL,
-    Dietary_ID_FK INTEGER NOT NULL,
-    Email VARCHAR NOT NULL,
-    Password VARCHAR NOT NULL,
-    FOREIGN KEY (Gender_ID_FK) REFERENCES tbl_Gender(Gender_ID),
-    FOREIGN KEY (Dietary_ID_FK) REFERENCES tbl_DietaryOption(Dietary_ID)
-);''')
-
-# tbl_Teachers
-c.execute('''CREATE TABLE IF NOT EXISTS tbl_Teachers (
-    Teacher_ID INTEGER PRIMARY KEY AUTOINCREMENT,
-    Name VARCHAR NOT NULL,
-    Surname VARCHAR NOT NULL,
-    Email VARCHAR NOT NULL,
-    Password VARCHAR NOT NULL
-);''')
-
-# tbl_User
-c.execute('''CREATE TABLE IF NOT EXISTS tbl_User (
-    User_ID INTEGER PRIMARY KEY AUTOINCREMENT,
-    Name VARCHAR NOT NULL,
-    Surname VARCHAR NOT NULL,
-    Email VARCHAR NOT NULL,
-    Password VARCHAR NOT NULL
-);''')
-
-# tbl_Groups
-c.execute('''CREATE TABLE IF NOT EXISTS tbl_Groups (
-    Group_ID INTEGER PRIMARY KEY AUTOINCREMENT,
-    Teacher_ID_FK INTEGER NOT NULL,
-    GroupName VARCHAR NOT NULL,
-    FOREIGN KEY (Teacher_ID_FK) REFERENCES tbl_Teachers(Teacher_ID)
-);''')
-
-# tbl_Groups_Students
-c.execute('''CREATE TABLE IF NOT EXISTS tbl_Groups_Students (
-    Group_ID_FK INTEGER NOT NULL,
-    Student_ID_FK INTEGER NOT NULL,
-    PRIMARY KEY (Group_ID_FK, Student_ID_FK),
-    FOREIGN KEY (Group_ID_FK) REFERENCES tbl_Groups(Group_ID),
-    FOREIGN KEY (Student_ID_FK) REFERENCES tbl_Students(Student_ID)
-);''')
-
-# tbl_Orders
-c.execute('''CREATE TABLE IF NOT EXISTS tbl_Orders (
-    Order_ID INTEGER PRIMARY KEY AUTOINCREMENT,
-    OrderDate DATE NOT NULL,
-    Meal_ID_FK INTEGER NOT NULL,
-    Teacher_ID_FK INTEGER,
-    Student_ID_FK INTEGER,
-    MealDate DATE NOT NULL,
-    Notes VARCHAR,
-    FOREIGN KEY (Meal_ID_FK) REFERENCES tbl_Meal(Meal_ID),
-    FOREIGN KEY (Teacher_ID_FK) REFERENCES tbl_Teachers(Teacher_ID),
-    FOREIGN KEY (Student_ID_FK) REFERENCES tbl_Students(Student_ID)
-);''')
-
-# tbl_Orders_Group
-c.execute('''CREATE TABLE IF NOT EXISTS tbl_Orders_Group (
-    Order_ID_FK INTEGER NOT NULL,
-    Group_ID_FK INTEGER,
-    Student_ID_FK INTEGER,
-    PRIMARY KEY (Order_ID_FK, Group_ID_FK),
-    FOREIGN KEY (Order_ID_FK) REFERENCES tbl_Orders(Order_ID),
-    FOREIGN KEY (Group_ID_FK) REFERENCES tbl_Groups(Group_ID),
-    FOREIGN KEY (Student_ID_FK) REFERENCES tbl_Students(Student_ID)
-);''')
-
-# Commit changes and close connection
-conn.commit()
-conn.close()
-
-print("Database setup complete!")
+    # tbl_DietaryOption
+    c.execute('''CREATE TABLE IF NOT EXISTS tbl_DietaryOption (
+        Dietary_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        Dietary VARCHAR NOT NULL
+    );''')
+
+    # tbl_Gender
+    c.execute('''CREATE TABLE IF NOT EXISTS tbl_Gender (
+        Gender_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        Gender VARCHAR NOT NULL
+    );''')
+
+    # tbl_Meal
+    c.execute('''CREATE TABLE IF NOT EXISTS tbl_Meal (
+        Meal_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        Meal VARCHAR NOT NULL
+    );''')
+
+    # tbl_Students
+    c.execute('''CREATE TABLE IF NOT EXISTS tbl_Students (
+        Student_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        Name VARCHAR NOT NULL,
+        Surname VARCHAR NOT NULL,
+        Gender_ID_FK INTEGER NOT NULL,
+        Grade INTEGER NOT NULL,
+        Border BOOLEAN NOT NULL,
+        Dietary_ID_FK INTEGER NOT NULL,
+        Email VARCHAR NOT NULL,
+        Password VARCHAR NOT NULL,
+        FOREIGN KEY (Gender_ID_FK) REFERENCES tbl_Gender(Gender_ID),
+        FOREIGN KEY (Dietary_ID_FK) REFERENCES tbl_DietaryOption(Dietary_ID)
+    );''')
+
+    # tbl_Teachers
+    c.execute('''CREATE TABLE IF NOT EXISTS tbl_Teachers (
+        Teacher_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        Name VARCHAR NOT NULL,
+        Surname VARCHAR NOT NULL,
+        Email VARCHAR NOT NULL,
+        Password VARCHAR NOT NULL
+    );''')
+
+    # tbl_User
+    c.execute('''CREATE TABLE IF NOT EXISTS tbl_User (
+        User_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        Name VARCHAR NOT NULL,
+        Surname VARCHAR NOT NULL,
+        Email VARCHAR NOT NULL,
+        Password VARCHAR NOT NULL
+    );''')
+
+    # tbl_Groups
+    c.execute('''CREATE TABLE IF NOT EXISTS tbl_Groups (
+        Group_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        Teacher_ID_FK INTEGER NOT NULL,
+        GroupName VARCHAR NOT NULL,
+        FOREIGN KEY (Teacher_ID_FK) REFERENCES tbl_Teachers(Teacher_ID)
+    );''')
+
+    # tbl_Groups_Students
+    c.execute('''CREATE TABLE IF NOT EXISTS tbl_Groups_Students (
+        Group_ID_FK INTEGER NOT NULL,
+        Student_ID_FK INTEGER NOT NULL,
+        PRIMARY KEY (Group_ID_FK, Student_ID_FK),
+        FOREIGN KEY (Group_ID_FK) REFERENCES tbl_Groups(Group_ID),
+        FOREIGN KEY (Student_ID_FK) REFERENCES tbl_Students(Student_ID)
+    );''')
+
+    # tbl_Orders
+    c.execute('''CREATE TABLE IF NOT EXISTS tbl_Orders (
+        Order_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        OrderDate DATE NOT NULL,
+        Meal_ID_FK INTEGER NOT NULL,
+        Teacher_ID_FK INTEGER,
+        Student_ID_FK INTEGER,
+        MealDate DATE NOT NULL,
+        Notes VARCHAR,
+        FOREIGN KEY (Meal_ID_FK) REFERENCES tbl_Meal(Meal_ID),
+        FOREIGN KEY (Teacher_ID_FK) REFERENCES tbl_Teachers(Teacher_ID),
+        FOREIGN KEY (Student_ID_FK) REFERENCES tbl_Students(Student_ID)
+    );''')
+
+    # tbl_Orders_Group
+    c.execute('''CREATE TABLE IF NOT EXISTS tbl_Orders_Group (
+        Order_ID_FK INTEGER NOT NULL,
+        Group_ID_FK INTEGER,
+        Student_ID_FK INTEGER,
+        PRIMARY KEY (Order_ID_FK, Group_ID_FK),
+        FOREIGN KEY (Order_ID_FK) REFERENCES tbl_Orders(Order_ID),
+        FOREIGN KEY (Group_ID_FK) REFERENCES tbl_Groups(Group_ID),
+        FOREIGN KEY (Student_ID_FK) REFERENCES tbl_Students(Student_ID)
+    );''')
+
+    conn.commit()
+
+
+# Re-imported rosters left the same student in tbl_Students more than once.
+# Keep the oldest row per email and point every reference at it, so the
+# unique email index can be created.
+def merge_duplicate_student_emails(conn):
+    duplicates = conn.execute('''
+        SELECT s.Student_ID, keep.Student_ID
+        FROM tbl_Students s
+        JOIN (SELECT Email, MIN(Student_ID) AS Student_ID FROM tbl_Students GROUP BY Email) keep
+            ON s.Email = keep.Email
+        WHERE s.Student_ID <> keep.Student_ID
+    ''').fetchall()
+    for duplicate_id, kept_id in duplicates:
+        conn.execute("UPDATE OR IGNORE tbl_Groups_Students SET Student_ID_FK = ? WHERE Student_ID_FK = ?", (kept_id, duplicate_id))
+        conn.execute("DELETE FROM tbl_Groups_Students WHERE Student_ID_FK = ?", (duplicate_id,))
+        conn.execute("UPDATE tbl_Orders SET Student_ID_FK = ? WHERE Student_ID_FK = ?", (kept_id, duplicate_id))
+        conn.execute("UPDATE tbl_Orders_Group SET Student_ID_FK = ? WHERE Student_ID_FK = ?", (kept_id, duplicate_id))
+        conn.execute("DELETE FROM tbl_Students WHERE Student_ID = ?", (duplicate_id,))
+
+
+# Admin and teacher accounts are not merged like students: two accounts sharing an email may
+# have different passwords and own different groups, so which one survives is for an admin to
+# decide. The migration stops before building the unique indexes and names every clash.
+def check_duplicate_account_emails(conn):
+    clashes = []
+    for table, id_column in (("tbl_User", "User_ID"), ("tbl_Teachers", "Teacher_ID")):
+        rows = conn.execute(f'''
+            SELECT Email, GROUP_CONCAT({id_column}, ', ') FROM {table}
+            GROUP BY Email HAVING COUNT(*) > 1 ORDER BY Email
+        ''')
+        clashes += [f"{table}: {email} ({id_column} {ids})" for email, ids in rows]
+    if clashes:
+        raise sqlite3.IntegrityError(
+            "Resolve these duplicate account emails before migrating; "
+            "the unique email indexes cannot be built while they exist:\n" + "\n".join(clashes)
+        )
+
+
+# Account tables merged into tbl_Accounts, in login precedence order
+ACCOUNT_SOURCES = [
+    ("tbl_User", "User_ID", 1, "User"),
+    ("tbl_Teachers", "Teacher_ID", 2, "Teacher"),
+    ("tbl_Students", "Student_ID", 3, "Student"),
+]
+
+
+# tbl_Accounts resolves an email to its role, ID and password hash with one
+# primary-key probe; triggers on the three account tables keep it in sync.
+def account_lookup_statements():
+    statements = ["""
+        CREATE TABLE IF NOT EXISTS tbl_Accounts (
+            Email VARCHAR NOT NULL,
+            Priority INTEGER NOT NULL,
+            UserType VARCHAR NOT NULL,
+            Account_ID INTEGER NOT NULL,
+            Name VARCHAR NOT NULL,
+            Surname VARCHAR NOT NULL,
+            Password VARCHAR NOT NULL,
+            PRIMARY KEY (Email, Priority)
+        ) WITHOUT ROWID
+    """]
+    for table, id_column, priority, user_type in ACCOUNT_SOURCES:
+        insert_new = f"""
+            INSERT OR REPLACE INTO tbl_Accounts (Email, Priority, UserType, Account_ID, Name, Surname, Password)
+            VALUES (NEW.Email, {priority}, '{user_type}', NEW.{id_column}, NEW.Name, NEW.Surname, NEW.Password);
+        """
+        delete_old = f"DELETE FROM tbl_Accounts WHERE Email = OLD.Email AND Priority = {priority};"
+        statements += [
+            f"""
+            INSERT OR REPLACE INTO tbl_Accounts (Email, Priority, UserType, Account_ID, Name, Surname, Password)
+            SELECT Email, {priority}, '{user_type}', {id_column}, Name, Surname, Password FROM {table}
+            """,
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_Accounts_Insert AFTER INSERT ON {table} BEGIN {insert_new} END",
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_Accounts_Update AFTER UPDATE ON {table} BEGIN {delete_old} {insert_new} END",
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_Accounts_Delete AFTER DELETE ON {table} BEGIN {delete_old} END",
+        ]
+    return statements
+
+
+UPSERT_MEAL_COUNT = '''
+    INSERT INTO tbl_Meal_Counts (MealDate, Meal_ID_FK, Dietary_ID_FK, Quantity)
+    {select}
+    GROUP BY 1, 2, 3
+    ON CONFLICT (MealDate, Meal_ID_FK, Dietary_ID_FK) DO UPDATE SET Quantity = Quantity + excluded.Quantity;
+'''
+
+# Every booked student: members of a group order, or the student of an individual order
+REBUILD_MEAL_COUNTS = UPSERT_MEAL_COUNT.format(select='''
+    SELECT o.MealDate, o.Meal_ID_FK, s.Dietary_ID_FK, COUNT(*)
+    FROM tbl_Orders o
+    JOIN tbl_Orders_Group og ON og.Order_ID_FK = o.Order_ID
+    LEFT JOIN tbl_Groups_Students gs ON gs.Group_ID_FK = og.Group_ID_FK
+    JOIN tbl_Students s ON s.Student_ID = COALESCE(gs.Student_ID_FK, og.Student_ID_FK)
+    WHERE 1
+''')
+
+# Every student booking, counted once per student, meal and day
+REBUILD_MEAL_COUNTS_FROM_BOOKINGS = UPSERT_MEAL_COUNT.format(select='''
+    SELECT b.MealDate, b.Meal_ID_FK, s.Dietary_ID_FK, COUNT(*)
+    FROM tbl_Student_Bookings b
+    JOIN tbl_Students s ON s.Student_ID = b.Student_ID_FK
+    WHERE 1
+''')
+
+# Students counted for one order link ({row} is NEW or OLD on tbl_Orders_Group)
+ORDER_LINK_COUNTS = '''
+    SELECT o.MealDate, o.Meal_ID_FK, s.Dietary_ID_FK, {sign}COUNT(*)
+    FROM tbl_Orders o
+    JOIN tbl_Students s ON s.Student_ID IN (
+        SELECT Student_ID_FK FROM tbl_Groups_Students WHERE Group_ID_FK = {row}.Group_ID_FK
+        UNION ALL
+        SELECT {row}.Student_ID_FK WHERE {row}.Group_ID_FK IS NULL
+    )
+    WHERE o.Order_ID = {row}.Order_ID_FK
+'''
+
+# Orders a student gains or loses by joining or leaving a group ({row} is NEW or OLD on tbl_Groups_Students)
+MEMBERSHIP_COUNTS = '''
+    SELECT o.MealDate, o.Meal_ID_FK, s.Dietary_ID_FK, {sign}COUNT(*)
+    FROM tbl_Orders_Group og
+    JOIN tbl_Orders o ON o.Order_ID = og.Order_ID_FK
+    JOIN tbl_Students s ON s.Student_ID = {row}.Student_ID_FK
+    WHERE og.Group_ID_FK = {row}.Group_ID_FK
+'''
+
+# All of one student's bookings, counted under their old or new dietary option
+STUDENT_DIETARY_COUNTS = '''
+    SELECT o.MealDate, o.Meal_ID_FK, {row}.Dietary_ID_FK, {sign}COUNT(*)
+    FROM tbl_Orders_Group og
+    JOIN tbl_Orders o ON o.Order_ID = og.Order_ID_FK
+    WHERE og.Group_ID_FK IN (SELECT Group_ID_FK FROM tbl_Groups_Students WHERE Student_ID_FK = NEW.Student_ID)
+       OR (og.Group_ID_FK IS NULL AND og.Student_ID_FK = NEW.Student_ID)
+'''
+
+
+# tbl_Meal_Counts holds how many of each meal the kitchen makes per day and dietary
+# requirement. It is rebuilt once from the bookings join, then kept up to date by
+# triggers on order links, group membership and students' dietary option.
+# Since migration 11 the counts follow tbl_Student_Bookings instead (unique_booking_statements).
+def meal_count_statements():
+    statements = ['''
+        CREATE TABLE IF NOT EXISTS tbl_Meal_Counts (
+            MealDate DATE NOT NULL,
+            Meal_ID_FK INTEGER NOT NULL,
+            Dietary_ID_FK INTEGER NOT NULL,
+            Quantity INTEGER NOT NULL,
+            PRIMARY KEY (MealDate, Meal_ID_FK, Dietary_ID_FK)
+        ) WITHOUT ROWID
+    ''', "DELETE FROM tbl_Meal_Counts", REBUILD_MEAL_COUNTS]
+
+    for event, row, sign in [("Insert", "NEW", ""), ("Delete", "OLD", "-")]:
+        order_link = UPSERT_MEAL_COUNT.format(select=ORDER_LINK_COUNTS.format(row=row, sign=sign))
+        membership = UPSERT_MEAL_COUNT.format(select=MEMBERSHIP_COUNTS.format(row=row, sign=sign))
+        statements += [
+            f"CREATE TRIGGER IF NOT EXISTS trg_Orders_Group_Counts_{event} AFTER {event.upper()} ON tbl_Orders_Group BEGIN {order_link} END",
+            f"CREATE TRIGGER IF NOT EXISTS trg_Groups_Students_Counts_{event} AFTER {event.upper()} ON tbl_Groups_Students BEGIN {membership} END",
+        ]
+
+    remove_old = UPSERT_MEAL_COUNT.format(select=STUDENT_DIETARY_COUNTS.format(row="OLD", sign="-"))
+    add_new = UPSERT_MEAL_COUNT.format(select=STUDENT_DIETARY_COUNTS.format(row="NEW", sign=""))
+    statements.append(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_Students_Counts_Dietary AFTER UPDATE OF Dietary_ID_FK ON tbl_Students
+        WHEN OLD.Dietary_ID_FK IS NOT NEW.Dietary_ID_FK BEGIN {remove_old} {add_new} END
+    ''')
+    return statements
+
+
+# Booking rows for the students of one order link ({row} is NEW or OLD on tbl_Orders_Group)
+ORDER_LINK_STUDENT_BOOKINGS = '''
+    SELECT m.Student_ID, o.MealDate, o.Meal_ID_FK, o.Order_ID, COALESCE(o.Teacher_ID_FK, o.Student_ID_FK)
+    FROM tbl_Orders o
+    JOIN (
+        SELECT Student_ID_FK AS Student_ID FROM tbl_Groups_Students WHERE Group_ID_FK = {row}.Group_ID_FK
+        UNION ALL
+        SELECT {row}.Student_ID_FK WHERE {row}.Group_ID_FK IS NULL
+    ) m
+    WHERE o.Order_ID = {row}.Order_ID_FK
+'''
+
+
+# tbl_Student_Bookings is a per-student index of bookings, one row per student and order,
+# so "my bookings" and duplicate checks are a single range scan instead of expanding
+# group orders through tbl_Groups_Students. Triggers keep it in sync.
+def student_booking_statements():
+    insert_columns = "INSERT OR IGNORE INTO tbl_Student_Bookings (Student_ID_FK, MealDate, Meal_ID_FK, Order_ID_FK, Booked_By)"
+    return [
+        '''
+        CREATE TABLE IF NOT EXISTS tbl_Student_Bookings (
+            Student_ID_FK INTEGER NOT NULL,
+            MealDate DATE NOT NULL,
+            Meal_ID_FK INTEGER NOT NULL,
+            Order_ID_FK INTEGER NOT NULL,
+            Booked_By INTEGER,
+            PRIMARY KEY (Student_ID_FK, MealDate, Meal_ID_FK, Order_ID_FK)
+        ) WITHOUT ROWID
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_Student_Bookings_Order ON tbl_Student_Bookings (Order_ID_FK)",
+        "DELETE FROM tbl_Student_Bookings",
+        insert_columns + '''
+        SELECT COALESCE(gs.Student_ID_FK, og.Student_ID_FK), o.MealDate, o.Meal_ID_FK, o.Order_ID, COALESCE(o.Teacher_ID_FK, o.Student_ID_FK)
+        FROM tbl_Orders o
+        JOIN tbl_Orders_Group og ON og.Order_ID_FK = o.Order_ID
+        LEFT JOIN tbl_Groups_Students gs ON gs.Group_ID_FK = og.Group_ID_FK
+        WHERE COALESCE(gs.Student_ID_FK, og.Student_ID_FK) IS NOT NULL
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_Orders_Group_Student_Bookings_Insert AFTER INSERT ON tbl_Orders_Group BEGIN
+            {insert_columns} {ORDER_LINK_STUDENT_BOOKINGS.format(row="NEW")};
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_Orders_Group_Student_Bookings_Delete AFTER DELETE ON tbl_Orders_Group BEGIN
+            DELETE FROM tbl_Student_Bookings
+            WHERE Order_ID_FK = OLD.Order_ID_FK
+              AND Student_ID_FK IN (
+                  SELECT Student_ID_FK FROM tbl_Groups_Students WHERE Group_ID_FK = OLD.Group_ID_FK
+                  UNION ALL
+                  SELECT OLD.Student_ID_FK WHERE OLD.Group_ID_FK IS NULL
+              );
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_Groups_Students_Student_Bookings_Insert AFTER INSERT ON tbl_Groups_Students BEGIN
+            {insert_columns}
+            SELECT NEW.Student_ID_FK, o.MealDate, o.Meal_ID_FK, o.Order_ID, COALESCE(o.Teacher_ID_FK, o.Student_ID_FK)
+            FROM tbl_Orders_Group og
+            JOIN tbl_Orders o ON o.Order_ID = og.Order_ID_FK
+            WHERE og.Group_ID_FK = NEW.Group_ID_FK;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_Groups_Students_Student_Bookings_Delete AFTER DELETE ON tbl_Groups_Students BEGIN
+            DELETE FROM tbl_Student_Bookings
+            WHERE Student_ID_FK = OLD.Student_ID_FK
+              AND Order_ID_FK IN (SELECT Order_ID_FK FROM tbl_Orders_Group WHERE Group_ID_FK = OLD.Group_ID_FK);
+        END
+        ''',
+    ]
+
+
+# Drop duplicate bookings so (student, date, meal) can be made unique. The earliest order keeps
+# the booking; individual orders left with no booking at all were pure duplicates and are deleted.
+def dedupe_student_bookings(conn):
+    conn.execute('''
+        DELETE FROM tbl_Student_Bookings
+        WHERE EXISTS (
+            SELECT 1 FROM tbl_Student_Bookings d
+            WHERE d.Student_ID_FK = tbl_Student_Bookings.Student_ID_FK
+              AND d.MealDate = tbl_Student_Bookings.MealDate
+              AND d.Meal_ID_FK = tbl_Student_Bookings.Meal_ID_FK
+              AND d.Order_ID_FK < tbl_Student_Bookings.Order_ID_FK
+        )
+    ''')
+    duplicate_orders = [order_id for (order_id,) in conn.execute('''
+        SELECT og.Order_ID_FK FROM tbl_Orders_Group og
+        WHERE og.Group_ID_FK IS NULL
+          AND NOT EXISTS (SELECT 1 FROM tbl_Student_Bookings b WHERE b.Order_ID_FK = og.Order_ID_FK)
+    ''')]
+    conn.executemany("DELETE FROM tbl_Orders_Group WHERE Order_ID_FK = ? AND Group_ID_FK IS NULL", [(order_id,) for order_id in duplicate_orders])
+    conn.executemany(
+        "DELETE FROM tbl_Orders WHERE Order_ID = ? AND NOT EXISTS (SELECT 1 FROM tbl_Orders_Group WHERE Order_ID_FK = ?)",
+        [(order_id, order_id) for order_id in duplicate_orders]
+    )
+
+
+# Another order still covering a student's meal ({row} is OLD on tbl_Student_Bookings): their
+# own order for the slot (one idx_Orders_Student_Meal_MealDate probe) or one of their groups'
+COVERING_ORDER_BOOKING = '''
+    SELECT {row}.Student_ID_FK, MealDate, Meal_ID_FK, Order_ID, Booked_By FROM (
+        SELECT o.MealDate, o.Meal_ID_FK, o.Order_ID, o.Student_ID_FK AS Booked_By
+        FROM tbl_Orders o
+        JOIN tbl_Orders_Group og ON og.Order_ID_FK = o.Order_ID AND og.Group_ID_FK IS NULL
+        WHERE o.Student_ID_FK = {row}.Student_ID_FK AND o.Meal_ID_FK = {row}.Meal_ID_FK
+          AND o.MealDate = {row}.MealDate AND o.Order_ID <> {row}.Order_ID_FK
+        UNION ALL
+        SELECT o.MealDate, o.Meal_ID_FK, o.Order_ID, o.Teacher_ID_FK
+        FROM tbl_Groups_Students gs
+        JOIN tbl_Orders_Group og ON og.Group_ID_FK = gs.Group_ID_FK
+        JOIN tbl_Orders o ON o.Order_ID = og.Order_ID_FK
+        WHERE gs.Student_ID_FK = {row}.Student_ID_FK AND o.Meal_ID_FK = {row}.Meal_ID_FK
+          AND o.MealDate = {row}.MealDate AND o.Order_ID <> {row}.Order_ID_FK
+    )
+    WHERE 1
+    ORDER BY Order_ID
+    LIMIT 1
+'''
+
+
+# A student has at most one booking per meal and day, whichever route (own order, one or more
+# group orders) it comes from. The unique index enforces it; the expansion triggers insert with
+# ON CONFLICT DO NOTHING, so the existing booking wins and the caller can read back what was
+# skipped. Meal counts are kept from tbl_Student_Bookings itself, so a skipped duplicate is
+# never counted, and when the booking holding a meal goes, another order covering the same
+# meal takes it over.
+def unique_booking_statements():
+    insert_columns = "INSERT INTO tbl_Student_Bookings (Student_ID_FK, MealDate, Meal_ID_FK, Order_ID_FK, Booked_By)"
+    statements = [
+        f"DROP TRIGGER IF EXISTS {trigger}" for trigger in (
+            "trg_Orders_Group_Counts_Insert", "trg_Orders_Group_Counts_Delete",
+            "trg_Groups_Students_Counts_Insert", "trg_Groups_Students_Counts_Delete",
+            "trg_Students_Counts_Dietary",
+            "trg_Orders_Group_Student_Bookings_Insert", "trg_Groups_Students_Student_Bookings_Insert",
+        )
+    ]
+    statements += [
+        dedupe_student_bookings,
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_Student_Bookings_Slot ON tbl_Student_Bookings (Student_ID_FK, MealDate, Meal_ID_FK)",
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_Orders_Group_Student_Bookings_Insert AFTER INSERT ON tbl_Orders_Group BEGIN
+            {insert_columns} {ORDER_LINK_STUDENT_BOOKINGS.format(row="NEW")}
+            ON CONFLICT DO NOTHING;
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_Groups_Students_Student_Bookings_Insert AFTER INSERT ON tbl_Groups_Students BEGIN
+            {insert_columns}
+            SELECT NEW.Student_ID_FK, o.MealDate, o.Meal_ID_FK, o.Order_ID, COALESCE(o.Teacher_ID_FK, o.Student_ID_FK)
+            FROM tbl_Orders_Group og
+            JOIN tbl_Orders o ON o.Order_ID = og.Order_ID_FK
+            WHERE og.Group_ID_FK = NEW.Group_ID_FK
+            ON CONFLICT DO NOTHING;
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_Student_Bookings_Refill AFTER DELETE ON tbl_Student_Bookings BEGIN
+            {insert_columns} {COVERING_ORDER_BOOKING.format(row="OLD")}
+            ON CONFLICT DO NOTHING;
+        END
+        ''',
+    ]
+
+    for event, row, sign in [("Insert", "NEW", ""), ("Delete", "OLD", "-")]:
+        booking = UPSERT_MEAL_COUNT.format(select=f'''
+            SELECT {row}.MealDate, {row}.Meal_ID_FK, s.Dietary_ID_FK, {sign}COUNT(*)
+            FROM tbl_Students s WHERE s.Student_ID = {row}.Student_ID_FK
+        ''')
+        statements.append(f"CREATE TRIGGER IF NOT EXISTS trg_Student_Bookings_Counts_{event} AFTER {event.upper()} ON tbl_Student_Bookings BEGIN {booking} END")
+
+    remove_old, add_new = [
+        UPSERT_MEAL_COUNT.format(select=f'''
+            SELECT MealDate, Meal_ID_FK, {row}.Dietary_ID_FK, {sign}COUNT(*)
+            FROM tbl_Student_Bookings WHERE Student_ID_FK = NEW.Student_ID
+        ''')
+        for row, sign in [("OLD", "-"), ("NEW", "")]
+    ]
+    statements += [
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_Students_Counts_Dietary AFTER UPDATE OF Dietary_ID_FK ON tbl_Students
+        WHEN OLD.Dietary_ID_FK IS NOT NEW.Dietary_ID_FK BEGIN {remove_old} {add_new} END
+        ''',
+        "DELETE FROM tbl_Meal_Counts",
+        REBUILD_MEAL_COUNTS_FROM_BOOKINGS,
+    ]
+    return statements
+
+
+# Change log rows kept; older ones are trimmed 1000 at a time by trg_Change_Log_Trim
+CHANGE_LOG_KEEP = 100000
+
+CHANGE_LOG_INSERT = "INSERT INTO tbl_Change_Log (TableName, Operation, Order_ID, Group_ID, Student_ID, Teacher_ID, MealDate, Meal_ID)"
+
+# What each logged table records ({row} is NEW or OLD, {op} 'I' or 'D'). Order links also
+# record their order's teacher and meal, so readers can tell which views a change touches.
+# Students, meals and groups are logged too because the booking views show their names.
+CHANGE_LOG_ROWS = {
+    'tbl_Orders': "SELECT 'tbl_Orders', '{op}', {row}.Order_ID, NULL, {row}.Student_ID_FK, {row}.Teacher_ID_FK, {row}.MealDate, {row}.Meal_ID_FK",
+    'tbl_Orders_Group': '''
+        SELECT 'tbl_Orders_Group', '{op}', {row}.Order_ID_FK, {row}.Group_ID_FK, {row}.Student_ID_FK, o.Teacher_ID_FK, o.MealDate, o.Meal_ID_FK
+        FROM (SELECT 1) LEFT JOIN tbl_Orders o ON o.Order_ID = {row}.Order_ID_FK
+    ''',
+    'tbl_Groups_Students': "SELECT 'tbl_Groups_Students', '{op}', NULL, {row}.Group_ID_FK, {row}.Student_ID_FK, NULL, NULL, NULL",
+    'tbl_Students': "SELECT 'tbl_Students', '{op}', NULL, NULL, {row}.Student_ID, NULL, NULL, NULL",
+    'tbl_Groups': "SELECT 'tbl_Groups', '{op}', NULL, {row}.Group_ID, NULL, {row}.Teacher_ID_FK, NULL, NULL",
+    'tbl_Meal': "SELECT 'tbl_Meal', '{op}', NULL, NULL, NULL, NULL, NULL, {row}.Meal_ID",
+}
+
+# Reference tables logged since migration 13, so every process drops its cached copy
+# (reference_data) when an admin edits them in another. Only the table name matters.
+REFERENCE_CHANGE_LOG_ROWS = {
+    'tbl_DietaryOption': "SELECT 'tbl_DietaryOption', '{op}', NULL, NULL, NULL, NULL, NULL, NULL",
+    'tbl_Gender': "SELECT 'tbl_Gender', '{op}', NULL, NULL, NULL, NULL, NULL, NULL",
+}
+
+# Served meals logged since migration 15, so an open meal service (checkin) learns of swipes
+# written by counters in other processes without re-reading who has been served
+SERVED_CHANGE_LOG_ROWS = {
+    'tbl_Meals_Served': "SELECT 'tbl_Meals_Served', '{op}', NULL, NULL, {row}.Student_ID_FK, NULL, {row}.MealDate, {row}.Meal_ID_FK",
+}
+
+
+# Insert, delete and update triggers writing each table's rows to tbl_Change_Log
+def change_log_triggers(log_rows):
+    statements = []
+    for table, select in log_rows.items():
+        log_new = f"{CHANGE_LOG_INSERT} {select.format(row='NEW', op='I')};"
+        log_old = f"{CHANGE_LOG_INSERT} {select.format(row='OLD', op='D')};"
+        statements += [
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_Change_Insert AFTER INSERT ON {table} BEGIN {log_new} END",
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_Change_Delete AFTER DELETE ON {table} BEGIN {log_old} END",
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_Change_Update AFTER UPDATE ON {table} BEGIN {log_old} {log_new} END",
+        ]
+    return statements
+
+
+# Change data capture for the booking tables: every insert and delete (an update is logged as
+# its old row deleted and new row inserted) gets a row in tbl_Change_Log with an increasing
+# Seq, so cached views can catch up by reading only the changes after the Seq they last saw.
+def change_log_statements():
+    statements = ['''
+        CREATE TABLE IF NOT EXISTS tbl_Change_Log (
+            Seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            TableName VARCHAR NOT NULL,
+            Operation VARCHAR NOT NULL CHECK (Operation IN ('I', 'D')),
+            Order_ID INTEGER,
+            Group_ID INTEGER,
+            Student_ID INTEGER,
+            Teacher_ID INTEGER,
+            MealDate DATE,
+            Meal_ID INTEGER
+        )
+    '''] + change_log_triggers(CHANGE_LOG_ROWS)
+    statements.append(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_Change_Log_Trim AFTER INSERT ON tbl_Change_Log WHEN NEW.Seq % 1000 = 0 BEGIN
+            DELETE FROM tbl_Change_Log WHERE Seq <= NEW.Seq - {CHANGE_LOG_KEEP};
+        END
+    ''')
+    return statements
+
+
+# Recreate a table from new DDL, keeping its rows, indexes and triggers.
+# SQLite cannot add constraints to an existing table, so this is the documented
+# create-copy-drop-rename procedure. create_sql takes the table name as {table}.
+def rebuild_table(conn, table, create_sql):
+    dependents = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type IN ('index', 'trigger') AND tbl_name = ? AND sql IS NOT NULL",
+        (table,)
+    ).fetchall()
+    columns = ", ".join(row[1] for row in conn.execute(f"PRAGMA table_info({table})"))
+    conn.execute(create_sql.format(table=f"{table}_new"))
+    conn.execute(f"INSERT INTO {table}_new ({columns}) SELECT {columns} FROM {table}")
+    conn.execute(f"DROP TABLE {table}")
+    # Triggers on other tables still name the dropped table; legacy mode renames without re-checking them
+    conn.execute("PRAGMA legacy_alter_table = ON")
+    try:
+        conn.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+    finally:
+        conn.execute("PRAGMA legacy_alter_table = OFF")
+    for (sql,) in dependents:
+        conn.execute(sql)
+
+
+# SQL expression turning a legacy 'dd/mm/YYYY[ HH:MM:SS]' value into ISO-8601
+def _legacy_to_iso(column):
+    return f"substr({column}, 7, 4) || '-' || substr({column}, 4, 2) || '-' || substr({column}, 1, 2) || substr({column}, 11)"
+
+
+# tbl_Orders with every date stored as sortable ISO-8601 text, enforced by CHECK constraints
+ORDERS_TABLE = '''
+    CREATE TABLE {table} (
+        Order_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        OrderDate DATE NOT NULL CHECK (OrderDate IS datetime(OrderDate)),
+        Meal_ID_FK INTEGER NOT NULL,
+        Teacher_ID_FK INTEGER,
+        Student_ID_FK INTEGER,
+        MealDate DATE NOT NULL CHECK (MealDate IS date(MealDate)),
+        Notes VARCHAR,
+        FOREIGN KEY (Meal_ID_FK) REFERENCES tbl_Meal(Meal_ID),
+        FOREIGN KEY (Teacher_ID_FK) REFERENCES tbl_Teachers(Teacher_ID),
+        FOREIGN KEY (Student_ID_FK) REFERENCES tbl_Students(Student_ID)
+    )
+'''
+
+
+# Rewrite OrderDate/MealDate as 'YYYY-MM-DD HH:MM:SS' / 'YYYY-MM-DD' and add CHECK constraints
+def normalize_order_dates(conn):
+    conn.execute(f"UPDATE tbl_Orders SET OrderDate = {_legacy_to_iso('OrderDate')} WHERE OrderDate LIKE '__/__/____%'")
+    conn.execute(f"UPDATE tbl_Orders SET MealDate = {_legacy_to_iso('MealDate')} WHERE MealDate LIKE '__/__/____%'")
+    conn.execute("UPDATE tbl_Orders SET OrderDate = datetime(OrderDate) WHERE OrderDate IS NOT datetime(OrderDate) AND datetime(OrderDate) IS NOT NULL")
+    conn.execute("UPDATE tbl_Orders SET MealDate = date(MealDate) WHERE MealDate IS NOT date(MealDate) AND date(MealDate) IS NOT NULL")
+    rebuild_table(conn, "tbl_Orders", ORDERS_TABLE)
+
+
+# Group memberships and order links are removed with their group. Order and student
+# references stay NO ACTION: the booking triggers read tbl_Orders and tbl_Students while
+# a link is deleted, so those rows must outlive their links.
+GROUPS_STUDENTS_TABLE = '''
+    CREATE TABLE {table} (
+        Group_ID_FK INTEGER NOT NULL,
+        Student_ID_FK INTEGER NOT NULL,
+        PRIMARY KEY (Group_ID_FK, Student_ID_FK),
+        FOREIGN KEY (Group_ID_FK) REFERENCES tbl_Groups(Group_ID) ON DELETE CASCADE,
+        FOREIGN KEY (Student_ID_FK) REFERENCES tbl_Students(Student_ID)
+    )
+'''
+
+ORDERS_GROUP_TABLE = '''
+    CREATE TABLE {table} (
+        Order_ID_FK INTEGER NOT NULL,
+        Group_ID_FK INTEGER,
+        Student_ID_FK INTEGER,
+        PRIMARY KEY (Order_ID_FK, Group_ID_FK),
+        FOREIGN KEY (Order_ID_FK) REFERENCES tbl_Orders(Order_ID),
+        FOREIGN KEY (Group_ID_FK) REFERENCES tbl_Groups(Group_ID) ON DELETE CASCADE,
+        FOREIGN KEY (Student_ID_FK) REFERENCES tbl_Students(Student_ID)
+    )
+'''
+
+
+# Remove rows left behind by group deletions before foreign keys were enforced, then add
+# the ON DELETE rules. Orders without any link are invisible on every page and are dropped too.
+def enforce_group_foreign_keys(conn):
+    conn.execute("DELETE FROM tbl_Groups_Students WHERE Group_ID_FK NOT IN (SELECT Group_ID FROM tbl_Groups)")
+    conn.execute("DELETE FROM tbl_Groups_Students WHERE Student_ID_FK NOT IN (SELECT Student_ID FROM tbl_Students)")
+    conn.execute("DELETE FROM tbl_Orders_Group WHERE Group_ID_FK IS NOT NULL AND Group_ID_FK NOT IN (SELECT Group_ID FROM tbl_Groups)")
+    conn.execute("DELETE FROM tbl_Orders_Group WHERE Order_ID_FK NOT IN (SELECT Order_ID FROM tbl_Orders)")
+    conn.execute("DELETE FROM tbl_Orders WHERE NOT EXISTS (SELECT 1 FROM tbl_Orders_Group og WHERE og.Order_ID_FK = tbl_Orders.Order_ID)")
+    rebuild_table(conn, "tbl_Groups_Students", GROUPS_STUDENTS_TABLE)
+    rebuild_table(conn, "tbl_Orders_Group", ORDERS_GROUP_TABLE)
+
+
+# tbl_Students_Search is an FTS5 index over student names and emails for the group
+# member picker. It is an external-content table, so the text lives only in tbl_Students
+# and the triggers below keep the index in step with it.
+def student_search_statements():
+    new_row = "NEW.Student_ID, NEW.Name, NEW.Surname, NEW.Email"
+    old_row = "OLD.Student_ID, OLD.Name, OLD.Surname, OLD.Email"
+    insert_new = f"INSERT INTO tbl_Students_Search (rowid, Name, Surname, Email) VALUES ({new_row});"
+    delete_old = f"INSERT INTO tbl_Students_Search (tbl_Students_Search, rowid, Name, Surname, Email) VALUES ('delete', {old_row});"
+    return [
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS tbl_Students_Search USING fts5(
+            Name, Surname, Email,
+            content = 'tbl_Students', content_rowid = 'Student_ID',
+            tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+        )
+        ''',
+        "INSERT INTO tbl_Students_Search (tbl_Students_Search) VALUES ('rebuild')",
+        f"CREATE TRIGGER IF NOT EXISTS trg_Students_Search_Insert AFTER INSERT ON tbl_Students BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_Students_Search_Delete AFTER DELETE ON tbl_Students BEGIN {delete_old} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_Students_Search_Update AFTER UPDATE OF Name, Surname, Email ON tbl_Students BEGIN {delete_old} {insert_new} END",
+    ]
+
+
+# Schema migrations, applied in order and tracked with PRAGMA user_version.
+# Each step is a list of SQL statements or callables taking the connection.
+MIGRATIONS = [
+    (1, "Indexes for the order/group join hot paths and login lookups", [
+        merge_duplicate_student_emails,
+        check_duplicate_account_emails,
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_User_Email ON tbl_User (Email)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_Teachers_Email ON tbl_Teachers (Email)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_Students_Email ON tbl_Students (Email)",
+        "CREATE INDEX IF NOT EXISTS idx_Students_Grade_Surname ON tbl_Students (Grade, Surname)",
+        "CREATE INDEX IF NOT EXISTS idx_Groups_Teacher ON tbl_Groups (Teacher_ID_FK, GroupName)",
+        "CREATE INDEX IF NOT EXISTS idx_Groups_Students_Student ON tbl_Groups_Students (Student_ID_FK, Group_ID_FK)",
+        "CREATE INDEX IF NOT EXISTS idx_Orders_Group_Group ON tbl_Orders_Group (Group_ID_FK, Order_ID_FK)",
+        "CREATE INDEX IF NOT EXISTS idx_Orders_Group_Student ON tbl_Orders_Group (Student_ID_FK, Order_ID_FK)",
+        "CREATE INDEX IF NOT EXISTS idx_Orders_MealDate ON tbl_Orders (MealDate, Meal_ID_FK)",
+        "CREATE INDEX IF NOT EXISTS idx_Orders_Teacher_MealDate ON tbl_Orders (Teacher_ID_FK, MealDate)",
+        "CREATE INDEX IF NOT EXISTS idx_Orders_Student_Meal_MealDate ON tbl_Orders (Student_ID_FK, Meal_ID_FK, MealDate)",
+    ]),
+    (2, "Unified account lookup for single-probe logins", account_lookup_statements()),
+    (3, "Keyset pagination index for the admin bookings view", [
+        "CREATE INDEX IF NOT EXISTS idx_Orders_MealDate_Order ON tbl_Orders (MealDate, Order_ID)",
+    ]),
+    (4, "Pre-aggregated daily meal counts for the kitchen", meal_count_statements()),
+    (5, "Per-student booking index", student_booking_statements()),
+    # The derived booking tables copy MealDate, so they are rebuilt from the normalized orders
+    (6, "ISO-8601 order dates with CHECK constraints", [normalize_order_dates] + meal_count_statements() + student_booking_statements()),
+    (7, "Cascade group deletion to memberships and order links", [enforce_group_foreign_keys]),
+    (8, "Full-text student search", student_search_statements()),
+    (9, "Archive run log", [
+        '''
+        CREATE TABLE IF NOT EXISTS tbl_Archive_Runs (
+            Run_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+            ArchivedBefore DATE NOT NULL CHECK (ArchivedBefore = date(ArchivedBefore)),
+            StartedAt DATETIME NOT NULL,
+            FinishedAt DATETIME,
+            Orders INTEGER NOT NULL DEFAULT 0
+        )
+        ''',
+    ]),
+    (10, "Meal service check-in", [
+        "CREATE INDEX IF NOT EXISTS idx_Student_Bookings_Meal ON tbl_Student_Bookings (MealDate, Meal_ID_FK, Student_ID_FK)",
+        '''
+        CREATE TABLE IF NOT EXISTS tbl_Meals_Served (
+            MealDate DATE NOT NULL CHECK (MealDate = date(MealDate)),
+            Meal_ID_FK INTEGER NOT NULL,
+            Student_ID_FK INTEGER NOT NULL,
+            ServedAt DATETIME NOT NULL,
+            PRIMARY KEY (MealDate, Meal_ID_FK, Student_ID_FK),
+            FOREIGN KEY (Meal_ID_FK) REFERENCES tbl_Meal(Meal_ID),
+            FOREIGN KEY (Student_ID_FK) REFERENCES tbl_Students(Student_ID)
+        ) WITHOUT ROWID
+        ''',
+    ]),
+    (11, "One booking per student, meal and day", unique_booking_statements()),
+    (12, "Change log for the booking tables", change_log_statements()),
+    (13, "Change log for the reference tables", change_log_triggers(REFERENCE_CHANGE_LOG_ROWS)),
+    # Deleted groups that still have past orders are retired instead (see groups.delete_group)
+    (14, "Retired groups", ["ALTER TABLE tbl_Groups ADD COLUMN RetiredAt DATETIME"]),
+    (15, "Change log for served meals", change_log_triggers(SERVED_CHANGE_LOG_ROWS)),
+]
+
+
+# Apply every migration newer than the database's user_version, one transaction per step
+def migrate(conn):
+    current_version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if current_version >= MIGRATIONS[-1][0]:
+        return current_version
+
+    # Table rebuilds drop and recreate tables, so foreign keys are switched off while migrating
+    # and every migration is checked with foreign_key_check before it commits.
+    # The pragma cannot change inside a transaction, hence outside the loop.
+    foreign_keys = conn.execute("PRAGMA foreign_keys").fetchone()[0]
+    conn.execute("PRAGMA foreign_keys = OFF")
+    try:
+        for version, description, steps in MIGRATIONS:
+            if version <= current_version:
+                continue
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for step in steps:
+                    if callable(step):
+                        step(conn)
+                    else:
+                        conn.execute(step)
+                violation = conn.execute("PRAGMA foreign_key_check").fetchone()
+                if violation:
+                    raise sqlite3.IntegrityError(f"Migration {version} left a foreign key violation in {violation[0]} (rowid {violation[1]}).")
+                conn.execute(f"PRAGMA user_version = {version}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            current_version = version
+    finally:
+        conn.execute(f"PRAGMA foreign_keys = {'ON' if foreign_keys else 'OFF'}")
+    return current_version
+
+
+# Hot-path queries that must stay index-backed, with sample parameters for EXPLAIN QUERY PLAN
+PLAN_CHECKS = [
+    ("login: tbl_Accounts", "SELECT UserType, Name, Surname, Account_ID, Password FROM tbl_Accounts WHERE Email = ? ORDER BY Priority", ('',)),
+    ("teacher: groups", "SELECT Group_ID, GroupName FROM tbl_Groups WHERE Teacher_ID_FK = ? AND RetiredAt IS NULL", (0,)),
+    ("teacher: upcoming bookings", '''
+        SELECT tbl_Meal.Meal, tbl_Orders.MealDate, tbl_Groups.GroupName
+        FROM tbl_Orders
+        JOIN tbl_Meal ON tbl_Orders.Meal_ID_FK = tbl_Meal.Meal_ID
+        JOIN tbl_Orders_Group ON tbl_Orders.Order_ID = tbl_Orders_Group.Order_ID_FK
+        JOIN tbl_Groups ON tbl_Orders_Group.Group_ID_FK = tbl_Groups.Group_ID
+        WHERE tbl_Orders.Teacher_ID_FK = ? AND tbl_Orders.MealDate >= ?
+        ORDER BY tbl_Orders.MealDate ASC
+    ''', (0, '')),
+    ("teacher: student picker", "SELECT Student_ID FROM tbl_Students WHERE (Grade, Surname, Student_ID) > (?, ?, ?) ORDER BY Grade, Surname, Student_ID LIMIT 25", (0, '', 0)),
+    ("student: groups", '''
+        SELECT tbl_Groups.GroupName
+        FROM tbl_Groups_Students
+        JOIN tbl_Groups ON tbl_Groups_Students.Group_ID_FK = tbl_Groups.Group_ID
+        WHERE tbl_Groups_Students.Student_ID_FK = ?
+    ''', (0,)),
+    ("student: upcoming bookings", "SELECT Meal_ID_FK, MealDate, Booked_By FROM tbl_Student_Bookings WHERE Student_ID_FK = ? AND MealDate >= ? ORDER BY MealDate", (0, '')),
+    ("student: changed bookings", '''
+        SELECT Meal_ID_FK, MealDate, Booked_By FROM tbl_Student_Bookings
+        WHERE Student_ID_FK = ? AND (MealDate, Meal_ID_FK) IN (SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]') FROM json_each(?))
+    ''', (0, '[]')),
+    ("changes: log tail", "SELECT Seq, TableName FROM tbl_Change_Log WHERE Seq > ? ORDER BY Seq LIMIT 100", (0,)),
+    ("check-in: booked students", "SELECT DISTINCT Student_ID_FK FROM tbl_Student_Bookings WHERE MealDate = ? AND Meal_ID_FK = ?", ('', 0)),
+    ("check-in: changed students", '''
+        SELECT DISTINCT Student_ID_FK FROM tbl_Student_Bookings
+        WHERE MealDate = ? AND Meal_ID_FK = ? AND Student_ID_FK IN (SELECT value FROM json_each(?))
+    ''', ('', 0, '[]')),
+    ("booking: new orders", "SELECT o.MealDate FROM tbl_Orders o WHERE o.Order_ID IN (SELECT value FROM json_each(?))", ('[]',)),
+    ("booking: skipped students", "SELECT 1 FROM tbl_Student_Bookings WHERE Student_ID_FK = ? AND MealDate = ? AND Meal_ID_FK = ? AND Order_ID_FK = ?", (0, '', 0, 0)),
+    ("admin: bookings page", "SELECT Order_ID FROM tbl_Orders WHERE (MealDate, Order_ID) >= (?, ?) ORDER BY MealDate, Order_ID LIMIT 50", ('', 0)),
+    ("kitchen: daily counts", "SELECT Meal_ID_FK, Dietary_ID_FK, Quantity FROM tbl_Meal_Counts WHERE MealDate = ?", ('',)),
+    ("kitchen: meals on a date", "SELECT Order_ID FROM tbl_Orders WHERE MealDate = ? AND Meal_ID_FK = ?", ('', 0)),
+]
+
+# Small lookup tables, and the JSON lists passed as parameters, where a full scan is expected and cheap
+SCAN_ALLOWED_TABLES = {"tbl_Meal", "tbl_Gender", "tbl_DietaryOption", "json_each"}
+
+
+# Run EXPLAIN QUERY PLAN for every hot-path query and return the ones that fall back to a table scan
+def check_query_plans(conn):
+    problems = []
+    for name, query, params in PLAN_CHECKS:
+        for row in conn.execute("EXPLAIN QUERY PLAN " + query, params):
+            detail = row[-1]
+            if not detail.startswith("SCAN "):
+                continue
+            table = detail.split()[1]
+            if "USING" in detail or table in SCAN_ALLOWED_TABLES:
+                continue
+            problems.append((name, detail))
+    return problems
+
+
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+
+# Create and migrate the schema once per process before the first page is served
+def ensure_schema():
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _schema_lock:
+        if not _schema_ready:
+            with db.connection() as conn:
+                create_tables(conn)
+                migrate(conn)
+            _schema_ready = True
+
+
+if __name__ == "__main__":
+    # Create a connection to SQLite database
+    conn = sqlite3.connect(db.DB_PATH)
+    create_tables(conn)
+    version = migrate(conn)
+
+    if "--check-plans" in sys.argv:
+        problems = check_query_plans(conn)
+        for name, detail in problems:
+            print(f"{name}: {detail}")
+        conn.close()
+        if problems:
+            sys.exit(1)
+        print("All hot-path queries are index-backed.")
+        sys.exit(0)
+
+    conn.close()
+    print(f"Database setup complete! (schema version {version})")
@@ -0,0 +1,91 @@
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+# Every date column is stored as ISO-8601 text so string order matches date order
+DATE_FORMAT = "%Y-%m-%d"
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Older rows were written as day/month/year by the student page
+LEGACY_FORMATS = ("%d/%m/%Y %H:%M:%S", "%d/%m/%Y")
+
+# How meal dates are shown on the booking pages
+DISPLAY_FORMAT = "%a %d/%m/%Y"
+
+# The same format in moment.js tokens, for Streamlit date columns
+COLUMN_DISPLAY_FORMAT = "ddd DD/MM/YYYY"
+
+# Weekday names in date.weekday() order, for recurrence rules and week grids
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def _parse(value):
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    text = str(value).strip()
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        pass
+    for legacy_format in LEGACY_FORMATS:
+        try:
+            return datetime.strptime(text, legacy_format)
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised date: {value!r}")
+
+
+# Encode a date, datetime or date string for a DATE column ('YYYY-MM-DD')
+def to_db_date(value):
+    if value is None:
+        return None
+    return _parse(value).strftime(DATE_FORMAT)
+
+
+# Encode a datetime for a DATETIME column ('YYYY-MM-DD HH:MM:SS')
+def to_db_datetime(value):
+    if value is None:
+        return None
+    return _parse(value).strftime(DATETIME_FORMAT)
+
+
+def today_db():
+    return date.today().strftime(DATE_FORMAT)
+
+
+def now_db():
+    return datetime.now().strftime(DATETIME_FORMAT)
+
+
+# Decode a stored DATE value
+def from_db_date(value):
+    return date.fromisoformat(value)
+
+
+# Format a stored DATE value for display; a page only ever shows a handful of distinct dates
+@lru_cache(maxsize=1024)
+def display_date(value):
+    return from_db_date(value).strftime(DISPLAY_FORMAT)
+
+
+# Monday of the week containing value
+def week_start(value):
+    day = _parse(value).date()
+    return day - timedelta(days=day.weekday())
+
+
+# Dates from start to end (inclusive) falling on the given weekdays (0 = Monday), every
+# interval_weeks weeks counting from the week containing start
+def recurring_dates(start, end, weekdays, interval_weeks=1):
+    start = _parse(start).date()
+    end = _parse(end).date()
+    weekdays = set(weekdays)
+    first_week = week_start(start)
+    result = []
+    day = start
+    while day <= end:
+        if day.weekday() in weekdays and ((day - first_week).days // 7) % interval_weeks == 0:
+            result.append(day)
+        day += timedelta(days=1)
+    return result
@@ -0,0 +1,304 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+import instrumentation
+
+# Path to the SQLite database shared by every interface
+DB_PATH = os.environ.get('ORDERING_DB', 'ordering.db')
+
+# Streamlit runs every session in its own script thread, so the pool is sized to its worker threads
+POOL_SIZE = int(os.environ.get('ORDERING_DB_POOL_SIZE', '8'))
+
+# Number of compiled statements each connection keeps around for reuse
+STATEMENT_CACHE_SIZE = 256
+
+# How long a connection waits on a locked database before raising "database is locked"
+BUSY_TIMEOUT_SECONDS = 10
+
+# Maximum number of queued writes folded into a single group commit
+WRITE_BATCH_SIZE = 64
+
+# PRAGMAs applied once when a pooled connection is opened.
+# WAL lets readers keep going while a write is in progress, and synchronous=NORMAL
+# only syncs at checkpoints, which is safe in WAL mode. foreign_keys is per connection
+# in SQLite and off by default; it enforces the schema's ON DELETE rules.
+CONNECTION_PRAGMAS = (
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -32000",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA mmap_size = 268435456",
+)
+
+
+# Thread-safe pool of long-lived SQLite connections
+class ConnectionPool:
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._opened = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=BUSY_TIMEOUT_SECONDS,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    # Hand out an idle connection, opening a new one while the pool is below its size
+    def acquire(self):
+        if self._closed:
+            raise sqlite3.ProgrammingError("Connection pool is closed.")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_open = self._opened < self.size
+            if can_open:
+                self._opened += 1
+        if can_open:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._opened -= 1
+                raise
+        return self._idle.get()
+
+    # Return a connection to the pool, discarding any unfinished transaction
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        if self._closed:
+            conn.close()
+            return
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        with instrumentation.waiting():
+            conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+# Single writer thread that batches concurrent write jobs into group commits
+class WriteQueue:
+    def __init__(self, batch_size=WRITE_BATCH_SIZE):
+        self.batch_size = batch_size
+        self._jobs = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    # Queue a job (a callable taking a connection) and return a Future for its result
+    def submit(self, job):
+        future = Future()
+        self._jobs.put((job, future))
+        self._ensure_started()
+        return future
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="ordering-db-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._jobs.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._jobs.get_nowait())
+                except queue.Empty:
+                    break
+            self._commit_batch(batch)
+
+    # Run every job in its own savepoint inside one transaction, so a failing job
+    # only rolls back its own changes and the rest of the batch still commits
+    def _commit_batch(self, batch):
+        outcomes = []
+        try:
+            with connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    for job, future in batch:
+                        if not future.set_running_or_notify_cancel():
+                            continue
+                        conn.execute("SAVEPOINT queued_write")
+                        try:
+                            result = job(conn)
+                        except Exception as exc:
+                            conn.execute("ROLLBACK TO queued_write")
+                            conn.execute("RELEASE queued_write")
+                            outcomes.append((future, None, exc))
+                            continue
+                        conn.execute("RELEASE queued_write")
+                        outcomes.append((future, result, None))
+                    conn.commit()
+                except BaseException:
+                    conn.rollback()
+                    raise
+        except Exception as exc:
+            for _, future in batch:
+                if future.done():
+                    continue
+                if future.running() or future.set_running_or_notify_cancel():
+                    future.set_exception(exc)
+            return
+        for future, result, exc in outcomes:
+            if exc is None:
+                future.set_result(result)
+            else:
+                future.set_exception(exc)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_write_queue = WriteQueue()
+
+
+# Return the process-wide pool, creating it on first use
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_PATH, POOL_SIZE)
+    return _pool
+
+
+# Point the data-access layer at another database (used by scripts and tooling)
+def configure(path=None, pool_size=None):
+    global DB_PATH, POOL_SIZE, _pool
+    with _pool_lock:
+        if path is not None:
+            DB_PATH = path
+        if pool_size is not None:
+            POOL_SIZE = pool_size
+        if _pool is not None:
+            _pool.close()
+        _pool = None
+
+
+# Borrow a pooled connection for the duration of a with-block
+@contextmanager
+def connection():
+    with get_pool().connection() as conn:
+        yield conn
+
+
+# Run several statements in one transaction, committing on success and rolling back on error.
+# The write lock is taken up front so concurrent writers queue on the busy timeout instead of deadlocking.
+@contextmanager
+def transaction():
+    with connection() as conn:
+        with instrumentation.waiting():
+            conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+
+# (inode, size, mtime) of the database file and its WAL. Every commit writes to the WAL, and
+# checkpoints to the database file, so an unchanged stamp means nothing was committed since.
+def data_stamp():
+    stamp = []
+    for path in (DB_PATH, DB_PATH + '-wal'):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            stamp.append(None)
+            continue
+        stamp.append((stat.st_ino, stat.st_size, stat.st_mtime_ns))
+    return tuple(stamp)
+
+
+# Utility function to fetch data
+def fetch_data(query, params=()):
+    with instrumentation.probe(query) as probe:
+        with connection() as conn:
+            rows = conn.execute(query, params).fetchall()
+        probe.rows = len(rows)
+    return rows
+
+
+# Utility function to fetch a single row (or None)
+def fetch_one(query, params=()):
+    with instrumentation.probe(query) as probe:
+        with connection() as conn:
+            row = conn.execute(query, params).fetchone()
+        probe.rows = 0 if row is None else 1
+    return row
+
+
+# Utility function to insert, update or delete data
+def execute_query(query, params=()):
+    with instrumentation.probe(query) as probe:
+        with transaction() as conn:
+            probe.rows = conn.execute(query, params).rowcount
+    return probe.rows
+
+
+# Utility function to insert data and return the new row ID
+def execute_query_and_return_id(query, params=()):
+    with instrumentation.probe(query) as probe:
+        with transaction() as conn:
+            cursor = conn.execute(query, params)
+        probe.rows = cursor.rowcount
+    return cursor.lastrowid
+
+
+# Utility function to run one statement for many parameter sets in a single transaction
+def execute_many(query, seq_of_params):
+    with instrumentation.probe(query) as probe:
+        with transaction() as conn:
+            probe.rows = conn.executemany(query, seq_of_params).rowcount
+    return probe.rows
+
+
+# Run a write job through the single-writer queue and wait for its group commit.
+# The job is recorded under its function name; time spent queued behind other writers counts as lock wait.
+def queued_write(job):
+    label = "queued write: " + getattr(job, '__qualname__', repr(job)).replace('.<locals>', '')
+    submitted = time.perf_counter()
+    started = []
+
+    def timed_job(conn):
+        started.append(time.perf_counter())
+        return job(conn)
+
+    with instrumentation.probe(label, fingerprinted=True) as probe:
+        try:
+            result = _write_queue.submit(timed_job).result()
+        finally:
+            if started:
+                probe.add_lock_wait((started[0] - submitted) * 1000)
+    return result
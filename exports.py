@@ -0,0 +1,136 @@
+import csv
+import io
+import tempfile
+from openpyxl import Workbook
+import archive
+import dates
+import instrumentation
+from bookings import BOOKINGS_PAGE_QUERY, HISTORY_PAGE_QUERY, booking_filter_clauses
+from db import connection
+
+# Rows pulled from the cursor and written per step, so memory use does not grow with the export
+EXPORT_CHUNK_SIZE = 5000
+
+# Exports larger than this spill from memory to a temporary file on disk
+SPOOL_BYTES = 8 * 1024 * 1024
+
+# Streamlit holds a download's whole file in memory while serving it, so downloads from the
+# admin page stop at this many rows (about 20MB of CSV)
+DOWNLOAD_MAX_ROWS = 250000
+
+EXPORT_COLUMNS = ["Order ID", "Student ID", "Meal Date", "Meal", "Student Name", "Grade", "Border", "Group"]
+
+# File extension and MIME type per export format
+EXPORT_FORMATS = {
+    'CSV': ('csv', 'text/csv'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'XLSX': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+# Yield the filtered bookings join in chunks straight from one cursor. It is the Bookings page
+# query itself, so the export has the same rows in the same order; max_rows=None lifts its
+# LIMIT (-1 is no limit in SQLite).
+def iter_booking_chunks(filters, chunk_size=EXPORT_CHUNK_SIZE, max_rows=None):
+    history = archive.covers(filters.get('date_from'))
+    clauses, params = booking_filter_clauses(filters, history)
+    where = "WHERE " + " AND ".join(clauses) if clauses else ""
+    query = (HISTORY_PAGE_QUERY if history else BOOKINGS_PAGE_QUERY).format(where=where)
+    with instrumentation.probe(query) as probe:
+        with archive.history_connection() if history else connection() as conn:
+            cursor = conn.execute(query, params + [-1 if max_rows is None else max_rows])
+            try:
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    probe.rows += len(rows)
+                    yield rows
+            finally:
+                cursor.close()
+
+
+def _write_csv(chunks, output):
+    text = io.TextIOWrapper(output, encoding='utf-8', newline='')
+    try:
+        writer = csv.writer(text)
+        writer.writerow(EXPORT_COLUMNS)
+        for rows in chunks:
+            writer.writerows(rows)
+        text.flush()
+    finally:
+        text.detach()
+
+
+def _write_parquet(chunks, output):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("Order ID", pa.int64()),
+        ("Student ID", pa.int64()),
+        ("Meal Date", pa.date32()),
+        ("Meal", pa.string()),
+        ("Student Name", pa.string()),
+        ("Grade", pa.int32()),
+        ("Border", pa.bool_()),
+        ("Group", pa.string()),
+    ])
+    # Each chunk becomes its own row group, so only one chunk is ever held as Arrow arrays
+    with pq.ParquetWriter(output, schema) as writer:
+        for rows in chunks:
+            columns = list(zip(*rows))
+            arrays = [
+                pa.array(columns[0], pa.int64()),
+                pa.array(columns[1], pa.int64()),
+                pa.array(columns[2], pa.string()).cast(pa.date32()),
+                pa.array(columns[3], pa.string()),
+                pa.array(columns[4], pa.string()),
+                pa.array(columns[5], pa.int32()),
+                pa.array([None if border is None else bool(border) for border in columns[6]], pa.bool_()),
+                pa.array(columns[7], pa.string()),
+            ]
+            writer.write_batch(pa.record_batch(arrays, schema=schema))
+
+
+def _write_xlsx(chunks, output):
+    # Write-only workbooks stream rows to disk instead of keeping every cell object in memory
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Bookings")
+    sheet.append(EXPORT_COLUMNS)
+    for rows in chunks:
+        for order_id, student_id, meal_date, meal, student_name, grade, border, group_name in rows:
+            sheet.append([order_id, student_id, dates.from_db_date(meal_date), meal, student_name, grade,
+                          None if border is None else bool(border), group_name])
+    workbook.save(output)
+
+
+_WRITERS = {
+    'CSV': _write_csv,
+    'Parquet': _write_parquet,
+    'XLSX': _write_xlsx,
+}
+
+
+# Stream the filtered bookings into a file-like object in the given format (see EXPORT_FORMATS),
+# stopping after max_rows rows if given
+def export_bookings(filters, export_format, output, chunk_size=EXPORT_CHUNK_SIZE, max_rows=None):
+    _WRITERS[export_format](iter_booking_chunks(filters, chunk_size, max_rows), output)
+
+
+# Export to a spooled temporary file (in memory while small, on disk once large), rewound for reading
+def export_bookings_file(filters, export_format, chunk_size=EXPORT_CHUNK_SIZE, max_rows=None):
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+    try:
+        export_bookings(filters, export_format, output, chunk_size, max_rows)
+    except Exception:
+        output.close()
+        raise
+    output.seek(0)
+    return output
+
+
+def export_filename(filters, export_format):
+    extension = EXPORT_FORMATS[export_format][0]
+    date_from = dates.to_db_date(filters.get('date_from')) or "start"
+    date_to = dates.to_db_date(filters.get('date_to')) or "end"
+    return f"bookings_{date_from}_to_{date_to}.{extension}"
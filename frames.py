@@ -0,0 +1,79 @@
+from itertools import islice
+import pyarrow as pa
+import instrumentation
+from db import connection
+
+# Typed, columnar results for the page tables. Rows are converted to Arrow arrays chunk by chunk
+# as they come off the cursor, with dictionary-encoded categories, real dates and flags. Streamlit
+# takes Arrow tables directly (st.dataframe and st.data_editor), so no pandas frame of Python
+# objects is built on the way and Streamlit does not copy the result again to serialise it.
+
+# Rows turned into Arrow arrays at a time, so only one chunk of row tuples is alive at once
+FRAME_CHUNK_ROWS = 2000
+
+# Column kinds for a frame schema, a list of (column name, kind)
+INT = 'int'
+FLOAT = 'float'
+BOOL = 'bool'
+TEXT = 'text'
+CATEGORY = 'category'   # low-cardinality text (meals, genders, groups, dietary options)
+DATE = 'date'           # ISO-8601 'YYYY-MM-DD' text
+DATETIME = 'datetime'   # ISO-8601 'YYYY-MM-DD HH:MM:SS' text
+
+# Arrow type each kind is read as, then the type it is cast to. SQLite has no boolean or date
+# storage class, so those arrive as ISO text and integers (or Python bools, from page code).
+READ_TYPES = {
+    INT: pa.int64(), FLOAT: pa.float64(), BOOL: None, TEXT: pa.string(),
+    CATEGORY: pa.string(), DATE: pa.string(), DATETIME: pa.string(),
+}
+CAST_TYPES = {BOOL: pa.bool_(), DATE: pa.date32(), DATETIME: pa.timestamp('s')}
+
+
+def _column_array(values, kind):
+    try:
+        array = pa.array(values, type=READ_TYPES[kind])
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # A column declared as text can hold a stray number (e.g. an unknown meal's ID)
+        array = pa.array([None if value is None else str(value) for value in values], type=READ_TYPES[kind])
+    if kind in CAST_TYPES:
+        array = array.cast(CAST_TYPES[kind])
+    elif kind == CATEGORY:
+        array = array.dictionary_encode()
+    return array
+
+
+def _empty_type(kind):
+    if kind == CATEGORY:
+        return pa.dictionary(pa.int32(), pa.string())
+    return CAST_TYPES.get(kind) or READ_TYPES[kind]
+
+
+# Build an Arrow table from chunks of row tuples, converting each chunk to column arrays
+# before the next is read
+def _table_from_chunks(chunks, schema):
+    names = [name for name, _ in schema]
+    kinds = [kind for _, kind in schema]
+    arrays = [[] for _ in schema]
+    for chunk in chunks:
+        for position, values in enumerate(zip(*chunk)):
+            arrays[position].append(_column_array(values, kinds[position]))
+    return pa.table({
+        name: pa.chunked_array(column, type=None if column else _empty_type(kind))
+        for name, kind, column in zip(names, kinds, arrays)
+    }).unify_dictionaries()
+
+
+# Typed Arrow table from rows already in memory (e.g. a cached view)
+def rows_to_table(rows, schema):
+    rows = iter(rows)
+    return _table_from_chunks(iter(lambda: list(islice(rows, FRAME_CHUNK_ROWS)), []), schema)
+
+
+# Run a query and build a typed Arrow table straight from the cursor, FRAME_CHUNK_ROWS at a time
+def fetch_table(query, params, schema):
+    with instrumentation.probe(query) as probe:
+        with connection() as conn:
+            cursor = conn.execute(query, params)
+            table = _table_from_chunks(iter(lambda: cursor.fetchmany(FRAME_CHUNK_ROWS), []), schema)
+        probe.rows = table.num_rows
+    return table
@@ -0,0 +1,62 @@
+import dates
+from db import execute_many, queued_write
+
+ADD_MEMBER_QUERY = "INSERT OR IGNORE INTO tbl_Groups_Students (Group_ID_FK, Student_ID_FK) VALUES (?, ?)"
+REMOVE_MEMBER_QUERY = "DELETE FROM tbl_Groups_Students WHERE Group_ID_FK = ? AND Student_ID_FK = ?"
+
+# A group's orders for meals from a date on (idx_Orders_Group_Group range)
+GROUP_ORDERS_FROM_QUERY = '''
+    SELECT og.Order_ID_FK
+    FROM tbl_Orders_Group og
+    JOIN tbl_Orders o ON o.Order_ID = og.Order_ID_FK
+    WHERE og.Group_ID_FK = ? AND o.MealDate >= ?
+'''
+
+DELETE_GROUP_LINK_QUERY = "DELETE FROM tbl_Orders_Group WHERE Order_ID_FK = ? AND Group_ID_FK = ?"
+
+# An order left with no link at all once its group link has gone
+DELETE_UNLINKED_ORDER_QUERY = '''
+    DELETE FROM tbl_Orders
+    WHERE Order_ID = ? AND NOT EXISTS (SELECT 1 FROM tbl_Orders_Group og WHERE og.Order_ID_FK = ?)
+'''
+
+
+# Add students to a group with one executemany in a single transaction.
+# Students already in the group are skipped; returns how many were added.
+def add_group_members(group_id, student_ids):
+    student_ids = list(student_ids)
+    if not student_ids:
+        return 0
+    return execute_many(ADD_MEMBER_QUERY, [(group_id, student_id) for student_id in student_ids])
+
+
+# Remove students from a group in a single transaction; returns how many were removed
+def remove_group_members(group_id, student_ids):
+    student_ids = list(student_ids)
+    if not student_ids:
+        return 0
+    return execute_many(REMOVE_MEMBER_QUERY, [(group_id, student_id) for student_id in student_ids])
+
+
+# Delete a group in one transaction. The group's upcoming orders (today on) are cancelled:
+# their links first, whose triggers drop the bookings and counts, then the orders left with no
+# link. Past orders are history the kitchen has already served, so a group that still has
+# some is only retired (hidden from teachers and students) and keeps its memberships, which
+# those orders expand through (removing a membership drops its bookings); the scheduled
+# archive run (archive.start_scheduler) clears the memberships once those orders have been
+# archived. A group with no past orders is deleted outright, its memberships cascading.
+# Returns False if the group did not exist.
+def delete_group(group_id):
+    def job(conn):
+        if conn.execute("SELECT 1 FROM tbl_Groups WHERE Group_ID = ?", (group_id,)).fetchone() is None:
+            return False
+        order_ids = [order_id for (order_id,) in conn.execute(GROUP_ORDERS_FROM_QUERY, (group_id, dates.today_db()))]
+        conn.executemany(DELETE_GROUP_LINK_QUERY, [(order_id, group_id) for order_id in order_ids])
+        conn.executemany(DELETE_UNLINKED_ORDER_QUERY, [(order_id, order_id) for order_id in order_ids])
+        if conn.execute("SELECT 1 FROM tbl_Orders_Group WHERE Group_ID_FK = ? LIMIT 1", (group_id,)).fetchone():
+            conn.execute("UPDATE tbl_Groups SET RetiredAt = ? WHERE Group_ID = ?", (dates.now_db(), group_id))
+        else:
+            conn.execute("DELETE FROM tbl_Groups WHERE Group_ID = ?", (group_id,))
+        return True
+
+    return queued_write(job)
@@ -0,0 +1,217 @@
+import contextvars
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import deque, namedtuple
+from contextlib import contextmanager
+from functools import lru_cache
+from logging.handlers import RotatingFileHandler
+
+# Queries slower than this (wall time, in milliseconds) are written to the slow-query log
+SLOW_QUERY_MS = float(os.environ.get('ORDERING_SLOW_QUERY_MS', '250'))
+
+# The slow-query log rotates at SLOW_QUERY_LOG_BYTES, keeping SLOW_QUERY_LOG_BACKUPS old files
+SLOW_QUERY_LOG = os.environ.get('ORDERING_SLOW_QUERY_LOG', 'slow_queries.log')
+SLOW_QUERY_LOG_BYTES = 5 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUPS = 5
+
+# Most recent timings kept per (page, query) for the percentiles, so memory stays bounded
+SAMPLES_PER_QUERY = 1000
+
+# Slow queries kept in memory for the Performance page
+RECENT_SLOW_QUERIES = 100
+
+# One database call: normalised query text, page it was issued from, rows returned or
+# affected, wall time and the part of it spent waiting for a pooled connection or the write lock
+QueryEvent = namedtuple('QueryEvent', ['fingerprint', 'page', 'rows', 'wall_ms', 'lock_wait_ms'])
+
+_page = contextvars.ContextVar('ordering_page', default=None)
+_active_probe = contextvars.ContextVar('ordering_probe', default=None)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+# Record which page (or menu entry) the current Streamlit script run is serving
+def set_page(page):
+    _page.set(page)
+
+
+def current_page():
+    return _page.get() or "-"
+
+
+# Reduce a query to its shape: literals become ?, IN lists of any length collapse to one ?,
+# and whitespace is normalised, so every call of the same statement is grouped together
+@lru_cache(maxsize=1024)
+def fingerprint(query):
+    text = _STRING_LITERAL.sub("?", query)
+    text = _NUMBER_LITERAL.sub("?", text)
+    text = _PLACEHOLDER_LIST.sub("?", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+# Nearest-rank percentile over already sorted values
+def percentile(sorted_values, pct):
+    rank = math.ceil(pct / 100 * len(sorted_values))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+
+# Thread-safe rolling timings per (page, query)
+class QueryStats:
+    def __init__(self, samples=SAMPLES_PER_QUERY):
+        self.samples = samples
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._recent_slow = deque(maxlen=RECENT_SLOW_QUERIES)
+
+    def record(self, event):
+        key = (event.page, event.fingerprint)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = {
+                    'calls': 0,
+                    'rows': 0,
+                    'wall_ms': deque(maxlen=self.samples),
+                    'lock_wait_ms': deque(maxlen=self.samples),
+                }
+            entry['calls'] += 1
+            entry['rows'] += event.rows
+            entry['wall_ms'].append(event.wall_ms)
+            entry['lock_wait_ms'].append(event.lock_wait_ms)
+            if event.wall_ms >= SLOW_QUERY_MS:
+                self._recent_slow.append((time.time(), event))
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+            self._recent_slow.clear()
+
+    def _snapshot(self):
+        with self._lock:
+            return [(key, entry['calls'], entry['rows'], list(entry['wall_ms']), list(entry['lock_wait_ms']))
+                    for key, entry in self._entries.items()]
+
+    # One row per (page, query), or per page when by_page is set, slowest p95 first
+    def summary(self, by_page=False):
+        groups = {}
+        for (page, query), calls, rows, wall_ms, lock_wait_ms in self._snapshot():
+            key = (page,) if by_page else (page, query)
+            group = groups.setdefault(key, [0, 0, [], []])
+            group[0] += calls
+            group[1] += rows
+            group[2].extend(wall_ms)
+            group[3].extend(lock_wait_ms)
+
+        rows = []
+        for key, (calls, row_count, wall_ms, lock_wait_ms) in groups.items():
+            wall_ms.sort()
+            lock_wait_ms.sort()
+            rows.append(key + (
+                calls,
+                row_count / calls,
+                percentile(wall_ms, 50),
+                percentile(wall_ms, 95),
+                percentile(wall_ms, 99),
+                wall_ms[-1],
+                percentile(lock_wait_ms, 95),
+            ))
+        return sorted(rows, key=lambda row: row[-4], reverse=True)
+
+    # (unix time, QueryEvent) for the latest slow queries, newest first
+    def recent_slow(self):
+        with self._lock:
+            return list(reversed(self._recent_slow))
+
+
+stats = QueryStats()
+_listeners = []
+_slow_log = None
+_slow_log_lock = threading.Lock()
+
+
+# Register a callable that receives every QueryEvent (e.g. to forward metrics elsewhere)
+def add_listener(listener):
+    _listeners.append(listener)
+
+
+def remove_listener(listener):
+    _listeners.remove(listener)
+
+
+# The slow-query logger is set up on first use, so importing this module creates no files
+def _slow_query_logger():
+    global _slow_log
+    if _slow_log is None:
+        with _slow_log_lock:
+            if _slow_log is None:
+                logger = logging.getLogger('ordering.slow_queries')
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+                handler = RotatingFileHandler(SLOW_QUERY_LOG, maxBytes=SLOW_QUERY_LOG_BYTES,
+                                              backupCount=SLOW_QUERY_LOG_BACKUPS, encoding='utf-8')
+                handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+                logger.addHandler(handler)
+                _slow_log = logger
+    return _slow_log
+
+
+def record(event):
+    stats.record(event)
+    if event.wall_ms >= SLOW_QUERY_MS:
+        _slow_query_logger().info(
+            "page=%s wall_ms=%.1f lock_wait_ms=%.1f rows=%d query=%s",
+            event.page, event.wall_ms, event.lock_wait_ms, event.rows, event.fingerprint
+        )
+    for listener in list(_listeners):
+        try:
+            listener(event)
+        except Exception:
+            logging.getLogger(__name__).exception("Query listener failed")
+
+
+# Timing for one database call. Waits reported through add_lock_wait() while the probe is
+# active (pool checkout, BEGIN IMMEDIATE) are counted as lock wait.
+class Probe:
+    def __init__(self, label, page=None):
+        self.label = label
+        self.page = page or current_page()
+        self.rows = 0
+        self.lock_wait_ms = 0.0
+        self.started = time.perf_counter()
+
+    def add_lock_wait(self, ms):
+        self.lock_wait_ms += ms
+
+
+# Time the enclosed database call and record it when the block exits, even if it raised
+@contextmanager
+def probe(query, fingerprinted=False):
+    active = Probe(query if fingerprinted else fingerprint(query))
+    token = _active_probe.set(active)
+    try:
+        yield active
+    finally:
+        _active_probe.reset(token)
+        wall_ms = (time.perf_counter() - active.started) * 1000
+        record(QueryEvent(active.label, active.page, max(active.rows, 0), wall_ms, active.lock_wait_ms))
+
+
+# Time a wait (pool checkout, write lock) and charge it to the active probe, if any
+@contextmanager
+def waiting():
+    active = _active_probe.get()
+    if active is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        active.add_lock_wait((time.perf_counter() - started) * 1000)
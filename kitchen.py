@@ -0,0 +1,34 @@
+import pandas as pd
+import archive
+import dates
+import reference_data
+from db import fetch_data
+
+
+# Meal counts for one day from the pre-aggregated tbl_Meal_Counts (a primary-key range read).
+# Days before the archive horizon are read from the archived counts as well.
+def fetch_daily_counts(meal_date):
+    meal_date = dates.to_db_date(meal_date)
+    if archive.covers(meal_date):
+        rows = archive.fetch_history(
+            "SELECT Meal_ID_FK, Dietary_ID_FK, Quantity FROM v_Meal_Counts WHERE MealDate = ? AND Quantity > 0",
+            (meal_date,)
+        )
+    else:
+        rows = fetch_data(
+            "SELECT Meal_ID_FK, Dietary_ID_FK, Quantity FROM tbl_Meal_Counts WHERE MealDate = ? AND Quantity > 0",
+            (meal_date,)
+        )
+    meals = dict(reference_data.get_meals())
+    dietary_options = dict(reference_data.get_dietary_options())
+    return [(meals.get(meal_id, meal_id), dietary_options.get(dietary_id, dietary_id), quantity) for meal_id, dietary_id, quantity in rows]
+
+
+# Production sheet for one day: one row per meal, one column per dietary requirement, plus a total
+def daily_production_sheet(meal_date):
+    counts = pd.DataFrame(fetch_daily_counts(meal_date), columns=["Meal", "Dietary", "Quantity"])
+    if counts.empty:
+        return counts
+    sheet = counts.pivot_table(index="Meal", columns="Dietary", values="Quantity", aggfunc="sum", fill_value=0)
+    sheet["Total"] = sheet.sum(axis=1)
+    return sheet.reset_index()
@@ -0,0 +1,69 @@
+import changes
+from db import fetch_data, execute_query
+
+# Small lookup tables that almost never change, cached for the whole process
+REFERENCE_QUERIES = {
+    'meals': "SELECT Meal_ID, Meal FROM tbl_Meal ORDER BY Meal_ID",
+    'dietary_options': "SELECT Dietary_ID, Dietary FROM tbl_DietaryOption ORDER BY Dietary_ID",
+    'genders': "SELECT Gender_ID, Gender FROM tbl_Gender ORDER BY Gender_ID",
+}
+
+# Table behind each reference, as named in tbl_Change_Log
+REFERENCE_TABLES = {
+    'meals': 'tbl_Meal',
+    'dietary_options': 'tbl_DietaryOption',
+    'genders': 'tbl_Gender',
+}
+
+
+def _update_reference(name, rows, new_changes):
+    return None if any(change.table == REFERENCE_TABLES[name] for change in new_changes) else rows
+
+
+# Return the cached rows for a reference table, loading them on first use. The cache follows
+# the change log like the booking views (see changes.py), so an edit made in any process (the
+# admin pages, the API, another server) is picked up by every other one on its next read.
+def get_reference(name):
+    return changes.cached_view(
+        ('reference', name),
+        lambda: tuple(fetch_data(REFERENCE_QUERIES[name])),
+        lambda rows, new_changes: _update_reference(name, rows, new_changes),
+    )
+
+
+# Drop one cached table (or all of them), so the next read loads it again
+def invalidate(name=None):
+    if name is None:
+        for cached in REFERENCE_QUERIES:
+            changes.invalidate(('reference', cached))
+    else:
+        changes.invalidate(('reference', name))
+
+
+def get_meals():
+    return get_reference('meals')
+
+
+def get_dietary_options():
+    return get_reference('dietary_options')
+
+
+def get_genders():
+    return get_reference('genders')
+
+
+# Write helpers used by the admin pages; the change log triggers invalidate the caches
+def add_meal(meal):
+    execute_query("INSERT INTO tbl_Meal (Meal) VALUES (?)", (meal,))
+
+
+def rename_meal(meal_id, meal):
+    execute_query("UPDATE tbl_Meal SET Meal = ? WHERE Meal_ID = ?", (meal, meal_id))
+
+
+def add_dietary_option(dietary):
+    execute_query("INSERT INTO tbl_DietaryOption (Dietary) VALUES (?)", (dietary,))
+
+
+def rename_dietary_option(dietary_id, dietary):
+    execute_query("UPDATE tbl_DietaryOption SET Dietary = ? WHERE Dietary_ID = ?", (dietary, dietary_id))
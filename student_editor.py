@@ -0,0 +1,253 @@
+import json
+import re
+import pandas as pd
+import archive
+import auth
+import dates
+import frames
+import reference_data
+from db import connection, fetch_data, queued_write
+from frames import INT, TEXT, BOOL
+from student_import import BORDER_VALUES, EMAIL_LOOKUP_CHUNK, EMAIL_PATTERN, INSERT_STUDENT_QUERY
+
+# Students per page of the Import Students editor
+PAGE_SIZE = 100
+
+# Columns of the editor grid. New Password is blank on load: filling it in resets the
+# student's password, and it is required for added rows. Gender and Dietary are plain text
+# picked from every option by the page's select boxes, not just the options on the page.
+EDITOR_FRAME = [('Student_ID', INT), ('Name', TEXT), ('Surname', TEXT), ('Gender', TEXT), ('Grade', INT),
+                ('Border', BOOL), ('Dietary', TEXT), ('Email', TEXT), ('New Password', TEXT)]
+EDITOR_COLUMNS = [name for name, _ in EDITOR_FRAME]
+
+# Editor column -> tbl_Students column
+COLUMN_MAP = {
+    'Name': 'Name',
+    'Surname': 'Surname',
+    'Gender': 'Gender_ID_FK',
+    'Grade': 'Grade',
+    'Border': 'Border',
+    'Dietary': 'Dietary_ID_FK',
+    'Email': 'Email',
+    'New Password': 'Password',
+}
+
+# One page of students in (Grade, Surname, Student_ID) order, walking idx_Students_Grade_Surname
+PAGE_QUERY = '''
+    SELECT Student_ID, Name, Surname, Gender_ID_FK, Grade, Border, Dietary_ID_FK, Email
+    FROM tbl_Students
+    {where}
+    ORDER BY Grade, Surname, Student_ID
+    LIMIT ?
+'''
+
+# Everything that refers to a student, deleted before the student in this order: memberships
+# and individual order links first (their triggers drop the student's bookings and counts),
+# then the individual orders left without links and any booking row the refill trigger put
+# back in between. Only students without history get here (STUDENT_HISTORY_QUERY), so all of
+# it is upcoming. Order, served-meal and student foreign keys are NO ACTION, so anything
+# missed fails the delete instead of being purged.
+DELETE_STUDENT_STATEMENTS = [
+    "DELETE FROM tbl_Groups_Students WHERE Student_ID_FK = ?",
+    "DELETE FROM tbl_Orders_Group WHERE Student_ID_FK = ?",
+    "DELETE FROM tbl_Orders WHERE Student_ID_FK = ?",
+    "DELETE FROM tbl_Student_Bookings WHERE Student_ID_FK = ?",
+    "DELETE FROM tbl_Students WHERE Student_ID = ?",
+]
+
+# Students (from a JSON list) with a booking before today or any meal served: deleting them
+# would rewrite past orders and meal counts, so the editor refuses
+STUDENT_HISTORY_QUERY = '''
+    SELECT Student_ID_FK FROM main.tbl_Student_Bookings
+    WHERE Student_ID_FK IN (SELECT value FROM json_each(?)) AND MealDate < ?
+    UNION
+    SELECT Student_ID_FK FROM main.tbl_Meals_Served
+    WHERE Student_ID_FK IN (SELECT value FROM json_each(?))
+'''
+
+# The same for bookings already moved to the archive
+ARCHIVED_STUDENT_HISTORY_QUERY = "SELECT Student_ID_FK FROM archive.tbl_Student_Bookings WHERE Student_ID_FK IN (SELECT value FROM json_each(?))"
+
+# Emails can move between students in one save, so the students whose email changes are first
+# parked on a placeholder and the unique email index never sees two rows with one email. The
+# placeholder has a space and no '@', which EMAIL_PATTERN rejects on every path that stores an
+# email (this editor and the import), so it cannot match a real address, here or in tbl_Accounts.
+PARK_EMAIL_QUERY = "UPDATE tbl_Students SET Email = 'moving student ' || Student_ID WHERE Student_ID = ?"
+
+
+# Return (page as a typed Arrow table for st.data_editor, cursor for the next page or None);
+# pass the cursor back as `after`
+def fetch_student_page(after=None, page_size=PAGE_SIZE):
+    where = "WHERE (Grade, Surname, Student_ID) > (?, ?, ?)" if after is not None else ""
+    params = list(after) if after is not None else []
+    rows = fetch_data(PAGE_QUERY.format(where=where), params + [page_size + 1])
+    genders = dict(reference_data.get_genders())
+    dietary_options = dict(reference_data.get_dietary_options())
+    page = frames.rows_to_table(
+        [(student_id, name, surname, genders.get(gender_id), grade, border, dietary_options.get(dietary_id), email, None)
+         for student_id, name, surname, gender_id, grade, border, dietary_id, email in rows[:page_size]],
+        EDITOR_FRAME,
+    )
+    if len(rows) <= page_size:
+        return page, None
+    last = rows[page_size - 1]
+    return page, (last[4], last[2], last[0])
+
+
+# Map emails to the Student_ID that holds them
+def student_ids_by_email(emails):
+    emails = list(emails)
+    owners = {}
+    for start in range(0, len(emails), EMAIL_LOOKUP_CHUNK):
+        chunk = emails[start:start + EMAIL_LOOKUP_CHUNK]
+        placeholders = ", ".join("?" for _ in chunk)
+        owners.update(fetch_data(f"SELECT Email, Student_ID FROM tbl_Students WHERE Email IN ({placeholders})", chunk))
+    return owners
+
+
+# The Student_IDs among student_ids that have booking history, live or archived
+def students_with_history(student_ids):
+    if not student_ids:
+        return set()
+    ids = json.dumps(list(student_ids))
+    with connection() as conn:
+        rows = conn.execute(STUDENT_HISTORY_QUERY, (ids, dates.today_db(), ids)).fetchall()
+        if archive.attach(conn):
+            rows += conn.execute(ARCHIVED_STUDENT_HISTORY_QUERY, (ids,)).fetchall()
+    return {student_id for (student_id,) in rows}
+
+
+def _lookup_key(value):
+    return '' if value is None or pd.isna(value) else str(value).strip().lower()
+
+
+def _lookup_ids(rows):
+    return {_lookup_key(name): row_id for row_id, name in rows}
+
+
+def _border_flag(value):
+    if value is None or pd.isna(value):
+        return None
+    if isinstance(value, bool):
+        return int(value)
+    return BORDER_VALUES.get(str(value).strip().lower())
+
+
+# Turn the editor state (st.data_editor's {"edited_rows", "added_rows", "deleted_rows"}, with row
+# positions into the page) into validated changes. Returns (updates, inserts, deletes, errors):
+# updates are (Student_ID, {tbl_Students column: value}) with only the edited columns, inserts
+# are dicts of every column, deletes are Student_IDs and errors a report DataFrame.
+def prepare_edits(page, editor_state):
+    genders = _lookup_ids(reference_data.get_genders())
+    dietary_options = _lookup_ids(reference_data.get_dietary_options())
+    page_rows = page.to_pylist()
+    deleted_positions = set(editor_state.get('deleted_rows', []))
+    deletes = [page_rows[position]['Student_ID'] for position in sorted(deleted_positions)]
+
+    # (label, Student_ID or None, edited columns, every column after the edit)
+    candidates = []
+    for position, values in editor_state.get('edited_rows', {}).items():
+        position = int(position)
+        if position in deleted_positions or not values:
+            continue
+        row = dict(page_rows[position])
+        row.update(values)
+        candidates.append((f"Student {row['Student_ID']}", int(row['Student_ID']), set(values), row))
+    for number, values in enumerate(editor_state.get('added_rows', []), start=1):
+        if not any(value not in (None, '') for value in values.values()):
+            continue
+        row = dict.fromkeys(EDITOR_COLUMNS)
+        row.update(values)
+        row['Border'] = False if row['Border'] is None else row['Border']
+        candidates.append((f"New row {number}", None, set(COLUMN_MAP), row))
+
+    updates, inserts, errors = [], [], []
+    with_history = students_with_history(deletes)
+    for position in sorted(deleted_positions):
+        row = page_rows[position]
+        if row['Student_ID'] in with_history:
+            errors.append((f"Student {row['Student_ID']}", row['Name'], row['Surname'], row['Email'],
+                           "Students with past bookings or served meals cannot be deleted."))
+    changed_emails = {}
+    for label, student_id, edited, row in candidates:
+        values = {}
+        for column in ('Name', 'Surname', 'Email', 'New Password'):
+            text = row.get(column)
+            values[column] = None if text is None or pd.isna(text) else str(text).strip()
+        values['Gender'] = genders.get(_lookup_key(row.get('Gender')))
+        values['Dietary'] = dietary_options.get(_lookup_key(row.get('Dietary')))
+        grade = pd.to_numeric(row.get('Grade'), errors='coerce')
+        values['Grade'] = None if pd.isna(grade) or grade % 1 != 0 else int(grade)
+        values['Border'] = _border_flag(row.get('Border'))
+
+        checks = [
+            (not values['Name'] or not values['Surname'] or not values['Email'], "Name, Surname and Email are required."),
+            (student_id is None and not values['New Password'], "New students need a password."),
+            (values['Gender'] is None, f"Gender '{row.get('Gender')}' does not exist in the database."),
+            (values['Dietary'] is None, f"Dietary option '{row.get('Dietary')}' does not exist in the database."),
+            ('Email' in edited and not re.fullmatch(EMAIL_PATTERN, values['Email'] or ''), "Email must be an address like name@example.com, without spaces."),
+            (values['Grade'] is None, "Grade must be a whole number."),
+            (values['Border'] is None, "Border must be Yes/No, True/False or 1/0."),
+            ('Email' in edited and values['Email'] in changed_emails, "Email appears more than once in the changes."),
+        ]
+        message = next((message for failed, message in checks if failed), None)
+        if message:
+            errors.append((label, values['Name'], values['Surname'], values['Email'], message))
+            continue
+        if 'Email' in edited:
+            changed_emails[values['Email']] = (label, student_id, values)
+
+        if not values['New Password']:
+            edited.discard('New Password')
+        changes = {COLUMN_MAP[column]: values[column] for column in edited if column in COLUMN_MAP}
+        if student_id is None:
+            inserts.append(changes)
+        elif changes:
+            updates.append((student_id, changes))
+
+    # An email may move to another row only if the student holding it is deleted or renamed in the same save
+    released = set(deletes) | {student_id for _, student_id, _ in changed_emails.values() if student_id is not None}
+    for email, owner in student_ids_by_email(changed_emails).items():
+        label, student_id, values = changed_emails[email]
+        if owner != student_id and owner not in released:
+            errors.append((label, values['Name'], values['Surname'], email, "A student with this email already exists."))
+
+    errors = pd.DataFrame(errors, columns=['Row', 'Name', 'Surname', 'Email', 'Error'])
+    return updates, inserts, deletes, errors
+
+
+# Apply prepared changes in one transaction through the write queue: deletes, then updates
+# (one executemany per set of edited columns, so untouched columns fire no triggers), then inserts.
+def apply_edits(updates, inserts, deletes):
+    password_rows = [changes for _, changes in updates if 'Password' in changes] + inserts
+    for changes, password_hash in zip(password_rows, auth.hash_passwords([changes['Password'] for changes in password_rows])):
+        changes['Password'] = password_hash
+
+    update_batches = {}
+    for student_id, changes in updates:
+        columns = tuple(sorted(changes))
+        update_batches.setdefault(columns, []).append([changes[column] for column in columns] + [student_id])
+    insert_rows = [(changes['Name'], changes['Surname'], changes['Gender_ID_FK'], changes['Grade'], changes['Border'],
+                    changes['Dietary_ID_FK'], changes['Email'], changes['Password']) for changes in inserts]
+
+    def job(conn):
+        for statement in DELETE_STUDENT_STATEMENTS:
+            conn.executemany(statement, [(student_id,) for student_id in deletes])
+        conn.executemany(PARK_EMAIL_QUERY, [(batch[-1],) for columns, rows in update_batches.items()
+                                            if 'Email' in columns for batch in rows])
+        for columns, rows in update_batches.items():
+            assignments = ", ".join(f"{column} = ?" for column in columns)
+            conn.executemany(f"UPDATE tbl_Students SET {assignments} WHERE Student_ID = ?", rows)
+        conn.executemany(INSERT_STUDENT_QUERY, insert_rows)
+
+    queued_write(job)
+    return {'updated': len(updates), 'added': len(inserts), 'deleted': len(deletes)}
+
+
+# Validate and save the editor's changes for one page. Nothing is written when any row fails.
+# Returns (counts of updated/added/deleted students, error report).
+def save_edits(page, editor_state):
+    updates, inserts, deletes, errors = prepare_edits(page, editor_state)
+    if not errors.empty:
+        return {'updated': 0, 'added': 0, 'deleted': 0}, errors
+    return apply_edits(updates, inserts, deletes), errors
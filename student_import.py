@@ -0,0 +1,259 @@
+import io
+import sqlite3
+import pandas as pd
+from openpyxl import load_workbook
+import auth
+import reference_data
+from db import fetch_data, execute_many
+
+# Columns an import file must provide
+REQUIRED_COLUMNS = ['Name', 'Surname', 'Gender', 'Grade', 'Border', 'Dietary', 'Email', 'Password']
+
+# Spreadsheet spellings accepted for the Border flag
+BORDER_VALUES = {
+    'true': 1, 'yes': 1, 'y': 1, '1': 1, '1.0': 1,
+    'false': 0, 'no': 0, 'n': 0, '0': 0, '0.0': 0,
+}
+
+# Rows read, validated and committed together by the streaming import
+CHUNK_SIZE = 1000
+
+# Rows shown in the upload preview
+PREVIEW_ROWS = 20
+
+# Cap on error rows kept for the report, so a completely broken file still uses bounded memory
+MAX_REPORTED_ERRORS = 1000
+
+# What a student email must look like: one '@' with something either side and no whitespace.
+# student_editor relies on this: it parks emails on values that fail it while they move.
+EMAIL_PATTERN = r"[^@\s]+@[^@\s]+"
+
+# SQLite limits the number of bound parameters per statement, so IN lists are chunked
+EMAIL_LOOKUP_CHUNK = 500
+
+INSERT_STUDENT_QUERY = '''
+    INSERT INTO tbl_Students (Name, Surname, Gender_ID_FK, Grade, Border, Dietary_ID_FK, Email, Password)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+# Build a lookup DataFrame keyed by lower-cased name from cached reference rows
+def load_lookup(rows, id_column, value_column):
+    lookup = pd.DataFrame(list(rows), columns=[id_column, value_column])
+    lookup['_key'] = lookup[value_column].astype(str).str.strip().str.lower()
+    return lookup.drop_duplicates('_key')[['_key', id_column]]
+
+
+# Return the subset of emails that already belong to a student
+def existing_student_emails(emails):
+    emails = list(emails)
+    found = set()
+    for start in range(0, len(emails), EMAIL_LOOKUP_CHUNK):
+        chunk = emails[start:start + EMAIL_LOOKUP_CHUNK]
+        placeholders = ", ".join("?" for _ in chunk)
+        rows = fetch_data(f"SELECT Email FROM tbl_Students WHERE Email IN ({placeholders})", chunk)
+        found.update(email for (email,) in rows)
+    return found
+
+
+# Resolve lookups and validate every row at once.
+# Returns (rows ready to insert, per-row error report). Row numbers in the report
+# match the spreadsheet, counting the header as row 1: chunks from iter_chunks carry
+# their source row numbers as the index, other frames are numbered from first_row.
+def prepare_students(students_df, genders=None, dietary_options=None, first_row=2):
+    genders = load_lookup(reference_data.get_genders(), 'Gender_ID', 'Gender') if genders is None else genders
+    dietary_options = load_lookup(reference_data.get_dietary_options(), 'Dietary_ID', 'Dietary') if dietary_options is None else dietary_options
+
+    df = students_df[REQUIRED_COLUMNS].copy()
+    df['Row'] = df.index if df.index.name == 'Row' else range(first_row, first_row + len(df))
+    for column in ['Name', 'Surname', 'Gender', 'Dietary', 'Email', 'Password']:
+        df[column] = df[column].astype('string').str.strip()
+
+    # Resolve Gender/Dietary names to IDs with one merge per lookup table
+    df['_gender_key'] = df['Gender'].str.lower()
+    df['_dietary_key'] = df['Dietary'].str.lower()
+    df = df.merge(genders.rename(columns={'_key': '_gender_key'}), on='_gender_key', how='left')
+    df = df.merge(dietary_options.rename(columns={'_key': '_dietary_key'}), on='_dietary_key', how='left')
+
+    df['Grade'] = pd.to_numeric(df['Grade'], errors='coerce')
+    df['Border'] = df['Border'].astype('string').str.strip().str.lower().map(BORDER_VALUES)
+
+    existing = existing_student_emails(df['Email'].dropna().unique())
+
+    # Each check is a boolean mask over the whole frame; a row reports its first failure
+    checks = [
+        (df[['Name', 'Surname', 'Email', 'Password']].isna().any(axis=1) | (df['Name'] == '') | (df['Surname'] == '') | (df['Email'] == '') | (df['Password'] == ''),
+         "Name, Surname, Email and Password are required."),
+        (~df['Email'].str.fullmatch(EMAIL_PATTERN), "Email must be an address like name@example.com, without spaces."),
+        (df['Gender_ID'].isna(), "Gender '" + df['Gender'].fillna('').astype(str) + "' does not exist in the database."),
+        (df['Dietary_ID'].isna(), "Dietary option '" + df['Dietary'].fillna('').astype(str) + "' does not exist in the database."),
+        (df['Grade'].isna() | (df['Grade'] % 1 != 0), "Grade must be a whole number."),
+        (df['Border'].isna(), "Border must be Yes/No, True/False or 1/0."),
+        (df['Email'].duplicated(keep='first') & df['Email'].notna(), "Email appears more than once in the file."),
+        (df['Email'].isin(existing), "A student with this email already exists."),
+    ]
+    df['Error'] = pd.Series(pd.NA, index=df.index, dtype='string')
+    for mask, message in reversed(checks):
+        mask = mask.fillna(True).astype(bool)
+        df.loc[mask, 'Error'] = message[mask] if isinstance(message, pd.Series) else message
+
+    errors = df.loc[df['Error'].notna(), ['Row', 'Name', 'Surname', 'Email', 'Error']].reset_index(drop=True)
+    valid = df.loc[df['Error'].isna()].copy()
+    valid['Gender_ID'] = valid['Gender_ID'].astype(int)
+    valid['Dietary_ID'] = valid['Dietary_ID'].astype(int)
+    valid['Grade'] = valid['Grade'].astype(int)
+    valid['Border'] = valid['Border'].astype(int)
+    return valid, errors
+
+
+# Insert already-validated rows with a single executemany in one transaction.
+# A student added elsewhere between validation and the insert can take one of the emails: the
+# transaction then rolls back, the rows whose email is now taken are reported and the rest
+# are inserted again. Returns (number of students inserted, error report for those rows).
+def insert_students(valid):
+    valid = valid.assign(Password=auth.hash_passwords(valid['Password'].tolist())) if not valid.empty else valid
+    clashes = valid.iloc[0:0]
+    while not valid.empty:
+        rows = zip(
+            valid['Name'].tolist(), valid['Surname'].tolist(), valid['Gender_ID'].tolist(), valid['Grade'].tolist(),
+            valid['Border'].tolist(), valid['Dietary_ID'].tolist(), valid['Email'].tolist(), valid['Password'].tolist(),
+        )
+        try:
+            execute_many(INSERT_STUDENT_QUERY, rows)
+            break
+        except sqlite3.IntegrityError:
+            taken = valid['Email'].isin(existing_student_emails(valid['Email'].unique()))
+            if not taken.any():
+                raise
+            clashes = pd.concat([clashes, valid[taken]])
+            valid = valid[~taken]
+    errors = clashes[['Row', 'Name', 'Surname', 'Email']].assign(Error="A student with this email was added during the import.")
+    return len(valid), errors.reset_index(drop=True)
+
+
+# Validate and import a roster; returns (number of students inserted, per-row error report)
+def import_students(students_df):
+    valid, errors = prepare_students(students_df)
+    imported_count, clashes = insert_students(valid)
+    return imported_count, pd.concat([errors, clashes], ignore_index=True).sort_values('Row', ignore_index=True)
+
+
+def _is_csv(uploaded_file):
+    return getattr(uploaded_file, 'name', '').lower().endswith('.csv')
+
+
+# A chunk of rows indexed by their row number in the source file, so error reports still
+# point at the right spreadsheet row after blank rows are dropped
+def _numbered_chunk(rows, row_numbers, columns):
+    return pd.DataFrame(rows, columns=columns, index=pd.Index(row_numbers, name='Row'))
+
+
+# Yield an Excel sheet as DataFrames of up to chunk_size rows using openpyxl's read-only mode.
+# Read-only sheets yield empty rows in place, so rows are numbered as they come.
+def _iter_excel_chunks(uploaded_file, chunk_size):
+    workbook = load_workbook(uploaded_file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(column).strip() if column is not None else '' for column in header]
+        chunk, row_numbers = [], []
+        for row_number, row in enumerate(rows, start=2):
+            if all(value is None for value in row):
+                continue
+            chunk.append(row)
+            row_numbers.append(row_number)
+            if len(chunk) == chunk_size:
+                yield _numbered_chunk(chunk, row_numbers, columns)
+                chunk, row_numbers = [], []
+        if chunk:
+            yield _numbered_chunk(chunk, row_numbers, columns)
+    finally:
+        workbook.close()
+
+
+# Yield an uploaded CSV or XLSX roster in chunks of at most chunk_size rows without loading
+# the whole file. Blank rows are skipped; each chunk is indexed by source row number.
+def iter_chunks(uploaded_file, chunk_size=CHUNK_SIZE):
+    uploaded_file.seek(0)
+    if _is_csv(uploaded_file):
+        # Our own text wrapper is detached afterwards, so the upload stays open for later reads
+        text = io.TextIOWrapper(uploaded_file, encoding='utf-8-sig', newline='')
+        try:
+            # Blank lines are read as empty rows and dropped only once every row is numbered
+            next_row = 2
+            for chunk in pd.read_csv(text, chunksize=chunk_size, dtype=str, skip_blank_lines=False):
+                chunk.columns = [str(column).strip() for column in chunk.columns]
+                chunk.index = pd.RangeIndex(next_row, next_row + len(chunk), name='Row')
+                next_row += len(chunk)
+                chunk = chunk.dropna(how='all')
+                if not chunk.empty:
+                    yield chunk
+        finally:
+            text.detach()
+    else:
+        yield from _iter_excel_chunks(uploaded_file, chunk_size)
+
+
+# Read only the first few rows of an upload, for the preview and the column check
+def read_preview(uploaded_file, rows=PREVIEW_ROWS):
+    preview = next(iter_chunks(uploaded_file, rows), pd.DataFrame())
+    uploaded_file.seek(0)
+    return preview
+
+
+# Count data rows without parsing them, so progress can be reported as a fraction
+def count_rows(uploaded_file):
+    uploaded_file.seek(0)
+    if _is_csv(uploaded_file):
+        line_count = 0
+        last_block = b''
+        for block in iter(lambda: uploaded_file.read(1 << 20), b''):
+            line_count += block.count(b'\n')
+            last_block = block
+        if last_block and not last_block.endswith(b'\n'):
+            line_count += 1
+        total = max(line_count - 1, 0)
+    else:
+        workbook = load_workbook(uploaded_file, read_only=True)
+        try:
+            total = max((workbook.active.max_row or 1) - 1, 0)
+        finally:
+            workbook.close()
+    uploaded_file.seek(0)
+    return total
+
+
+# Import a roster chunk by chunk: each chunk is validated and committed in its own
+# transaction, so memory stays bounded regardless of file size.
+# on_progress(rows_processed, total_rows) is called after every chunk.
+# Returns (students inserted, error report, total number of errors).
+def import_students_streaming(uploaded_file, chunk_size=CHUNK_SIZE, on_progress=None):
+    genders = load_lookup(reference_data.get_genders(), 'Gender_ID', 'Gender')
+    dietary_options = load_lookup(reference_data.get_dietary_options(), 'Dietary_ID', 'Dietary')
+    total_rows = count_rows(uploaded_file) if on_progress else None
+
+    imported_count = 0
+    error_count = 0
+    error_reports = []
+    rows_processed = 0
+    for chunk in iter_chunks(uploaded_file, chunk_size):
+        valid, errors = prepare_students(chunk, genders, dietary_options)
+        chunk_count, clashes = insert_students(valid)
+        imported_count += chunk_count
+        if not clashes.empty:
+            errors = pd.concat([errors, clashes], ignore_index=True).sort_values('Row', ignore_index=True)
+
+        error_count += len(errors)
+        kept_errors = sum(len(report) for report in error_reports)
+        if kept_errors < MAX_REPORTED_ERRORS:
+            error_reports.append(errors.head(MAX_REPORTED_ERRORS - kept_errors))
+
+        # Source rows read so far, blank ones included, as count_rows counts them
+        rows_processed = int(chunk.index[-1]) - 1
+        if on_progress:
+            on_progress(rows_processed, total_rows)
+
+    report = pd.concat(error_reports, ignore_index=True) if error_reports else pd.DataFrame(columns=['Row', 'Name', 'Surname', 'Email', 'Error'])
+    return imported_count, report, error_count
@@ -0,0 +1,64 @@
+import re
+import reference_data
+from db import fetch_data
+
+# Students shown per page in the picker
+PAGE_SIZE = 25
+
+GRADES_QUERY = "SELECT DISTINCT Grade FROM tbl_Students ORDER BY Grade"
+
+# One page of students in (Grade, Surname, Student_ID) order, walking idx_Students_Grade_Surname
+SEARCH_QUERY = '''
+    SELECT s.Student_ID, s.Name || ' ' || s.Surname AS StudentName, s.Grade, s.Gender_ID_FK, s.Surname
+    FROM tbl_Students s
+    {where}
+    ORDER BY s.Grade, s.Surname, s.Student_ID
+    LIMIT ?
+'''
+
+_SEARCH_TERM = re.compile(r"\w+")
+
+
+# Turn free text into an FTS5 query: every word must match the start of a name, surname or email word
+def match_expression(text):
+    terms = _SEARCH_TERM.findall(text or '')
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def fetch_grades():
+    return [grade for (grade,) in fetch_data(GRADES_QUERY)]
+
+
+# Search students by text (through tbl_Students_Search), grade and gender, skipping members of
+# exclude_group_id. Returns (rows of (Student_ID, StudentName, Grade, Gender), cursor for the
+# next page or None); pass the cursor back as `after`.
+def search_students(text=None, grade=None, gender_id=None, exclude_group_id=None, after=None, page_size=PAGE_SIZE):
+    clauses = []
+    params = []
+    match = match_expression(text)
+    if match:
+        clauses.append("s.Student_ID IN (SELECT rowid FROM tbl_Students_Search WHERE tbl_Students_Search MATCH ?)")
+        params.append(match)
+    if grade is not None:
+        clauses.append("s.Grade = ?")
+        params.append(grade)
+    if gender_id is not None:
+        clauses.append("s.Gender_ID_FK = ?")
+        params.append(gender_id)
+    if exclude_group_id is not None:
+        clauses.append("NOT EXISTS (SELECT 1 FROM tbl_Groups_Students gs WHERE gs.Group_ID_FK = ? AND gs.Student_ID_FK = s.Student_ID)")
+        params.append(exclude_group_id)
+    if after is not None:
+        clauses.append("(s.Grade, s.Surname, s.Student_ID) > (?, ?, ?)")
+        params += list(after)
+    where = "WHERE " + " AND ".join(clauses) if clauses else ""
+
+    rows = fetch_data(SEARCH_QUERY.format(where=where), params + [page_size + 1])
+    genders = dict(reference_data.get_genders())
+    page = [(student_id, name, grade, genders.get(gender, gender)) for student_id, name, grade, gender, _ in rows[:page_size]]
+    if len(rows) <= page_size:
+        return page, None
+    last = rows[page_size - 1]
+    return page, (last[2], last[4], last[0])
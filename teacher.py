@@ -1,32 +1,109 @@
-import sqlite3
 import streamlit as st
 import pandas as pd
-from datetime import datetime
-
-# Utility function to fetch data
-def fetch_data(query, params=()):
-    conn = sqlite3.connect('ordering.db', check_same_thread=False)
-    c = conn.cursor()
-    c.execute(query, params)
-    data = c.fetchall()
-    conn.close()
-    return data
-
-# Utility function to insert or update data
-def execute_query(query, params):
-    conn = sqlite3.connect('ordering.db', check_same_thread=False)
-    c = conn.cursor()
-    c.execute(query, params)
-    conn.commit()
-    conn.close()
-
-# Utility function to delete data
-def delete_query(query, params):
-    conn = sqlite3.connect('ordering.db', check_same_thread=False)
-    c = conn.cursor()
-    c.execute(query, params)
-    conn.commit()
-    conn.close()
+import instrumentation
+import dates
+import reference_data
+import frames
+from frames import INT, TEXT, CATEGORY, DATE, BOOL
+from db import fetch_data, execute_query_and_return_id
+from bookings import create_group_booking, create_group_bookings, teacher_upcoming_view
+import groups as groups_data
+import student_search
+
+# Queries issued by the teacher pages, kept at module level so the benchmark suite times the same SQL
+
+# A teacher's own groups, leaving out deleted groups kept for their past orders
+TEACHER_GROUPS_QUERY = "SELECT Group_ID, GroupName FROM tbl_Groups WHERE Teacher_ID_FK = ? AND RetiredAt IS NULL"
+
+# Members of a group, as listed on Manage Groups and Add Bookings
+GROUP_MEMBERS_QUERY = '''
+    SELECT tbl_Students.Student_ID, tbl_Students.Name || ' ' || tbl_Students.Surname AS StudentName,
+           tbl_Students.Grade, tbl_Gender.Gender
+    FROM tbl_Groups_Students
+    JOIN tbl_Students ON tbl_Groups_Students.Student_ID_FK = tbl_Students.Student_ID
+    JOIN tbl_Gender ON tbl_Students.Gender_ID_FK = tbl_Gender.Gender_ID
+    WHERE tbl_Groups_Students.Group_ID_FK = ?
+    ORDER BY tbl_Students.Grade ASC, tbl_Students.Surname ASC
+'''
+
+# Column types of the student lists (group members and the picker) and the upcoming bookings
+STUDENT_LIST_FRAME = [("Student ID", INT), ("Student Name", TEXT), ("Grade", INT), ("Gender", CATEGORY)]
+UPCOMING_BOOKINGS_FRAME = [("Meal", CATEGORY), ("Meal Date", DATE), ("Group", CATEGORY)]
+
+# Searchable student picker for adding group members. Only one page of students not already
+# in the group is read per rerun; ticked students are kept in session state across pages and
+# searches. Returns {Student_ID: name} for the current selection.
+def student_picker(key, group_id):
+    selected = st.session_state.setdefault(f"{key}_selected", {})
+    generation = st.session_state.setdefault(f"{key}_generation", 0)
+
+    genders = reference_data.get_genders()
+    gender_dict = {gender: gender_id for gender_id, gender in genders}
+    col1, col2, col3 = st.columns([3, 1, 1])
+    with col1:
+        search_text = st.text_input("Search by name, surname or email", key=f"{key}_search")
+    with col2:
+        selected_grade = st.selectbox("Grade", ["All"] + student_search.fetch_grades(), key=f"{key}_grade")
+    with col3:
+        selected_gender = st.selectbox("Gender", ["All"] + list(gender_dict.keys()), key=f"{key}_gender")
+
+    # Keep a stack of page cursors; changing the search starts again from the first page
+    filters = (group_id, search_text.strip(), selected_grade, selected_gender)
+    if st.session_state.get(f"{key}_filters") != filters:
+        st.session_state[f"{key}_filters"] = filters
+        st.session_state[f"{key}_cursors"] = [None]
+    cursors = st.session_state[f"{key}_cursors"]
+
+    students, next_cursor = student_search.search_students(
+        search_text,
+        grade=None if selected_grade == "All" else selected_grade,
+        gender_id=gender_dict.get(selected_gender),
+        exclude_group_id=group_id,
+        after=cursors[-1],
+    )
+    page_table = frames.rows_to_table([(row[0] in selected,) + tuple(row) for row in students],
+                                      [("Select", BOOL)] + STUDENT_LIST_FRAME)
+
+    # The editor is keyed by page and filters so its edits never carry over to different rows
+    edited_table = st.data_editor(
+        page_table,
+        hide_index=True,
+        use_container_width=True,
+        disabled=["Student ID", "Student Name", "Grade", "Gender"],
+        key=f"{key}_page_{generation}_{filters}_{cursors[-1]}",
+    )
+    edited_columns = [edited_table.column(name).to_pylist() for name in ("Student ID", "Student Name", "Select")]
+    for student_id, student_name, is_selected in zip(*edited_columns):
+        if is_selected:
+            selected[int(student_id)] = student_name
+        else:
+            selected.pop(int(student_id), None)
+
+    prev_col, page_col, next_col = st.columns([1, 2, 1])
+    with prev_col:
+        if st.button("Previous", key=f"{key}_previous", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+    with page_col:
+        st.write(f"Page {len(cursors)} · {len(selected)} students selected")
+    with next_col:
+        if st.button("Next", key=f"{key}_next", disabled=next_cursor is None):
+            cursors.append(next_cursor)
+            st.rerun()
+
+    if selected:
+        st.dataframe(pd.DataFrame(list(selected.values()), columns=["Selected Students"]), hide_index=True)
+        if st.button("Clear Selection", key=f"{key}_clear"):
+            clear_student_picker(key)
+            st.rerun()
+    return selected
+
+
+# Forget a picker's selection and start its editor afresh
+def clear_student_picker(key):
+    st.session_state[f"{key}_selected"] = {}
+    st.session_state[f"{key}_generation"] = st.session_state.get(f"{key}_generation", 0) + 1
+
 
 # Function to display the teacher's user interface
 def show_teacher_interface(teacher_id):
@@ -36,6 +113,9 @@ def show_teacher_interface(teacher_id):
         ["Manage Groups", "Add New Group", "Add Bookings"]
     )
 
+    # Tag every query issued while rendering this page
+    instrumentation.set_page(f"Teacher: {menu}")
+
     # Check if the teacher_id is valid (not None)
     if not teacher_id:
         st.error("Teacher ID is not available. Please log in again.")
@@ -46,8 +126,7 @@ def show_teacher_interface(teacher_id):
         st.title("Manage Existing Groups")
 
         # Fetch the teacher's groups
-        groups_query = "SELECT Group_ID, GroupName FROM tbl_Groups WHERE Teacher_ID_FK = ?"
-        groups = fetch_data(groups_query, (teacher_id,))
+        groups = fetch_data(TEACHER_GROUPS_QUERY, (teacher_id,))
         if groups:
             group_dict = {group_name: group_id for group_id, group_name in groups}
             selected_group = st.selectbox("Select a Group to Manage", list(group_dict.keys()))
@@ -62,20 +141,20 @@ def show_teacher_interface(teacher_id):
                 with col1:
                     st.subheader(f"Students in {selected_group}")
 
-                    query_students_in_group = '''
-                        SELECT tbl_Students.Name || ' ' || tbl_Students.Surname AS StudentName, 
-                               tbl_Students.Grade, tbl_Gender.Gender
-                        FROM tbl_Groups_Students
-                        JOIN tbl_Students ON tbl_Groups_Students.Student_ID_FK = tbl_Students.Student_ID
-                        JOIN tbl_Gender ON tbl_Students.Gender_ID_FK = tbl_Gender.Gender_ID
-                        WHERE tbl_Groups_Students.Group_ID_FK = ?
-                        ORDER BY tbl_Students.Grade ASC, tbl_Students.Surname ASC
-                    '''
-                    students_in_group = fetch_data(query_students_in_group, (group_id,))
-                    students_in_group_df = pd.DataFrame(students_in_group, columns=["Student Name", "Grade", "Gender"])
-
-                    # Display DataFrame
-                    st.dataframe(students_in_group_df, hide_index=True)
+                    students_in_group_table = frames.fetch_table(GROUP_MEMBERS_QUERY, (group_id,), STUDENT_LIST_FRAME)
+
+                    # Display DataFrame; selected members can be removed together
+                    selected_members = st.dataframe(
+                        students_in_group_table,
+                        hide_index=True,
+                        on_select="rerun",
+                        selection_mode='multi-row'
+                    ).selection.rows
+
+                    if st.button("Remove Selected Students", disabled=not selected_members):
+                        removed_count = groups_data.remove_group_members(group_id, students_in_group_table.column('Student ID').take(selected_members).to_pylist())
+                        st.success(f"Removed {removed_count} students from {selected_group}")
+                        st.rerun()
 
                 # Add a delete group option (in the right column)
                 with col2:
@@ -92,58 +171,23 @@ def show_teacher_interface(teacher_id):
                     # If confirmation is triggered, show the confirm button
                     if st.session_state.confirm_delete:
                         if st.button(f"Confirm Deletion of {selected_group}"):
-                            # Delete the group and associated students
-                            delete_group_query = '''
-                                DELETE FROM tbl_Groups WHERE Group_ID = ?
-                            '''
-                            delete_query(delete_group_query, (group_id,))
-                            # Optionally, delete associated students in the group
-                            delete_students_in_group_query = '''
-                                DELETE FROM tbl_Groups_Students WHERE Group_ID_FK = ?
-                            '''
-                            delete_query(delete_students_in_group_query, (group_id,))
-                            st.success(f"Group '{selected_group}' and its associated students have been deleted.")
+                            # Upcoming bookings go in the same transaction; past ones stay for the kitchen's history
+                            groups_data.delete_group(group_id)
+                            st.success(f"Group '{selected_group}' and its upcoming bookings have been deleted.")
                             st.session_state.confirm_delete = False  # Reset the confirmation state
                             st.rerun()  # Rerun the app to refresh the state
 
                 ### Add New Students to the Group (similar to your original logic) ###
                 st.subheader(f"Add Students to {selected_group}")
 
-                query_all_students = '''
-                    SELECT tbl_Students.Student_ID, tbl_Students.Name || ' ' || tbl_Students.Surname AS StudentName,
-                           tbl_Students.Grade, tbl_Gender.Gender
-                    FROM tbl_Students
-                    JOIN tbl_Gender ON tbl_Students.Gender_ID_FK = tbl_Gender.Gender_ID
-                    WHERE tbl_Students.Student_ID NOT IN (
-                        SELECT Student_ID_FK FROM tbl_Groups_Students WHERE Group_ID_FK = ?
-                    )
-                    ORDER BY tbl_Students.Grade ASC, tbl_Students.Surname ASC
-                '''
-                available_students = fetch_data(query_all_students, (group_id,))
-                available_students_df = pd.DataFrame(available_students, columns=["Student ID", "Student Name", "Grade", "Gender"])
-
-                # Collect the rows the user wants to add to the group
-                selected_rows = st.dataframe(
-                                available_students_df,
-                                use_container_width=True,
-                                hide_index=True,
-                                on_select="rerun",
-                                selection_mode='multi-row',
-                                height=600
-                            ).selection.rows
-                
-                selected_student_ids = available_students_df.loc[selected_rows, 'Student ID'].tolist()
-                selected_student_names = available_students_df['Student Name'][selected_rows]
-                
-                st.dataframe(selected_student_names)
+                # Search one page of students at a time; the selection survives paging
+                selected_students = student_picker("add_members", group_id)
 
                 # Button to add selected students to the group
-                if st.button("Add Selected Students to Group"):
-                    for student_id in selected_student_ids:
-                        add_student_query = '''
-                            INSERT INTO tbl_Groups_Students (Group_ID_FK, Student_ID_FK) VALUES (?, ?)
-                        '''
-                        execute_query(add_student_query, (group_id, student_id))
+                if st.button("Add Selected Students to Group", disabled=not selected_students):
+                    # One executemany and one commit however many students are selected
+                    groups_data.add_group_members(group_id, list(selected_students))
+                    clear_student_picker("add_members")
                     st.success(f"Added selected students to {selected_group}")
                     st.rerun()
 
@@ -158,86 +202,47 @@ def show_teacher_interface(teacher_id):
             if new_group_name:
                 # Create the group by inserting it into the tbl_Groups table with Teacher_ID_FK
                 create_group_query = "INSERT INTO tbl_Groups (Teacher_ID_FK, GroupName) VALUES (?, ?)"
-                execute_query(create_group_query, (teacher_id, new_group_name))
+                new_group_id = execute_query_and_return_id(create_group_query, (teacher_id, new_group_name))
                 st.success(f"Group '{new_group_name}' created successfully!")
 
-                # Get the newly created group ID
-                new_group_id_query = "SELECT Group_ID FROM tbl_Groups WHERE GroupName = ? AND Teacher_ID_FK = ?"
-                new_group_id = fetch_data(new_group_id_query, (new_group_name, teacher_id))[0][0]
+                # Remember the new group so the picker below survives its own reruns
+                st.session_state.new_group = (new_group_id, new_group_name)
+                clear_student_picker("new_group_members")
 
-                st.subheader(f"Assign Students to '{new_group_name}'")
+        if st.session_state.get("new_group"):
+            new_group_id, created_group_name = st.session_state.new_group
+            st.subheader(f"Assign Students to '{created_group_name}'")
 
-                # Fetch all available students (not yet in the group)
-                query_all_students = '''
-                    SELECT tbl_Students.Student_ID, tbl_Students.Name || ' ' || tbl_Students.Surname AS StudentName,
-                           tbl_Students.Grade, tbl_Gender.Gender
-                    FROM tbl_Students
-                    JOIN tbl_Gender ON tbl_Students.Gender_ID_FK = tbl_Gender.Gender_ID
-                    WHERE tbl_Students.Student_ID NOT IN (
-                        SELECT Student_ID_FK FROM tbl_Groups_Students WHERE Group_ID_FK = ?
-                    )
-                    ORDER BY tbl_Students.Grade ASC, tbl_Students.Surname ASC
-                '''
-                available_students = fetch_data(query_all_students, (new_group_id,))
-                available_students_df = pd.DataFrame(available_students, columns=["Student ID", "Student Name", "Grade", "Gender"])
-
-                # Collect the rows the user wants to add to the group
-                selected_rows = st.dataframe(
-                                available_students_df,
-                                use_container_width=True,
-                                hide_index=True,
-                                selection_mode='multi-row',
-                                height=600
-                            ).selection.rows
-                
-                selected_student_ids = available_students_df.loc[selected_rows, 'Student ID'].tolist()
-                selected_student_names = available_students_df.loc[selected_rows, 'Student Name']
-                
-                st.write(selected_student_names)
+            selected_students = student_picker("new_group_members", new_group_id)
 
-                # Button to add selected students to the group
-                if st.button("Add Selected Students to Group"):
-                    for student_id in selected_student_ids:
-                        add_student_query = '''
-                            INSERT INTO tbl_Groups_Students (Group_ID_FK, Student_ID_FK) VALUES (?, ?)
-                        '''
-                        execute_query(add_student_query, (new_group_id, student_id))
-                    st.success(f"Added selected students to '{new_group_name}'")
-                    st.rerun()
+            # Button to add selected students to the group
+            if st.button("Add Selected Students to Group", disabled=not selected_students):
+                groups_data.add_group_members(new_group_id, list(selected_students))
+                clear_student_picker("new_group_members")
+                st.success(f"Added selected students to '{created_group_name}'")
+                st.rerun()
 
     ### 3. Add Bookings Page ###
     if menu == "Add Bookings":
         st.title("Add New Booking")
 
         # Fetch the teacher's groups for the dropdown (Group_ID_FK)
-        query_groups = "SELECT Group_ID, GroupName FROM tbl_Groups WHERE Teacher_ID_FK = ?"
-        groups = fetch_data(query_groups, (teacher_id,))
+        groups = fetch_data(TEACHER_GROUPS_QUERY, (teacher_id,))
+        if not groups:
+            st.info("Create a group before adding bookings.")
+            return
         group_dict = {group_name: group_id for group_id, group_name in groups}
         selected_group = st.selectbox("Select Group", list(group_dict.keys()))
 
         # Show the students from the selected group
         group_id_fk = group_dict[selected_group]  # Selected group ID
-        query_students_in_group = '''
-            SELECT tbl_Students.Student_ID, tbl_Students.Name || ' ' || tbl_Students.Surname AS StudentName, 
-                   tbl_Students.Grade, tbl_Gender.Gender
-            FROM tbl_Groups_Students
-            JOIN tbl_Students ON tbl_Groups_Students.Student_ID_FK = tbl_Students.Student_ID
-            JOIN tbl_Gender ON tbl_Students.Gender_ID_FK = tbl_Gender.Gender_ID
-            WHERE tbl_Groups_Students.Group_ID_FK = ?
-            ORDER BY tbl_Students.Grade ASC, tbl_Students.Surname ASC
-        '''
 
         # Fetch the meals for the dropdown (Meal_ID_FK)
-        query_meals = "SELECT Meal_ID, Meal FROM tbl_Meal"
-        meals = fetch_data(query_meals)
+        meals = reference_data.get_meals()
         meal_dict = {meal_name: meal_id for meal_id, meal_name in meals}
         selected_meal = st.selectbox("Select Meal", list(meal_dict.keys()))
 
-        students_in_group = fetch_data(query_students_in_group, (group_id_fk,))
-        students_in_group_df = pd.DataFrame(students_in_group, columns=["Student ID", "Student Name", "Grade", "Gender"])
-
-        # Current date and time for orderDate (automatically set)
-        order_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        students_in_group_table = frames.fetch_table(GROUP_MEMBERS_QUERY, (group_id_fk,), STUDENT_LIST_FRAME)
 
         # User selects the meal date
         meal_date = st.date_input("Select Meal Date")
@@ -247,71 +252,73 @@ def show_teacher_interface(teacher_id):
 
         # Display the students in the selected group
         st.subheader(f"Students in {selected_group}")
-        st.dataframe(students_in_group_df, hide_index=True)
+        st.dataframe(students_in_group_table, hide_index=True)
 
         # Button to add booking
         if st.button("Add Booking"):
-    # Step 1: Check for existing bookings for this meal and date for both individual and group bookings
-            query_check_existing = '''
-                SELECT COUNT(*)
-                FROM tbl_Orders
-                WHERE tbl_Orders.Student_ID_FK = ? AND tbl_Orders.Meal_ID_FK = ? AND tbl_Orders.MealDate = ?
-
-                UNION
-
-                SELECT COUNT(*)
-                FROM tbl_Orders
-                JOIN tbl_Orders_Group ON tbl_Orders.Order_ID = tbl_Orders_Group.Order_ID_FK
-                JOIN tbl_Groups_Students ON tbl_Orders_Group.Group_ID_FK = tbl_Groups_Students.Group_ID_FK
-                WHERE tbl_Groups_Students.Student_ID_FK = ? AND tbl_Orders.Meal_ID_FK = ? AND tbl_Orders.MealDate = ?
-            '''
-            
-            # Execute the query and pass the parameters twice (for both queries in the UNION)
-            existing_booking_count = fetch_data(query_check_existing, (student_id, meal_id_fk, meal_date, student_id, meal_id_fk, meal_date))
-            
-            # Sum the results to get the total count of bookings
-            total_existing_bookings = sum([row[0] for row in existing_booking_count])
-
-            # If there are existing bookings, notify the user
-            if total_existing_bookings > 0:
-                st.error(f"You or some students in {selected_group} already have this meal booked for {meal_date}.")
+            # Check the whole group for existing bookings and insert the order in one transaction
+            new_order_id, conflicts = create_group_booking(teacher_id, group_id_fk, meal_id_fk, meal_date)
+
+            # If any members already have this meal, nothing is booked and the clashes are listed
+            if conflicts:
+                st.error(f"{len(conflicts)} students in {selected_group} already have this meal booked for {meal_date}:")
+                conflicts_df = pd.DataFrame(conflicts, columns=["Student ID", "Student Name"])
+                st.dataframe(conflicts_df, hide_index=True)
             else:
-                # Step 2: Insert into tbl_Orders first
-                add_order_query = '''
-                    INSERT INTO tbl_Orders (OrderDate, Meal_ID_FK, Teacher_ID_FK, MealDate, Student_ID_FK)
-                    VALUES (?, ?, ?, ?, NULL)
-                '''
-                execute_query(add_order_query, (order_date, meal_id_fk, teacher_id, meal_date))
-
-                # Step 3: Insert into tbl_Orders_Group (associate group with the order)
-                add_booking_query = '''
-                    INSERT INTO tbl_Orders_Group (Order_ID_FK, Group_ID_FK, Student_ID_FK)
-                    SELECT MAX(Order_ID), ?, NULL FROM tbl_Orders
-                '''
-                execute_query(add_booking_query, (group_id_fk,))
-
                 st.success("Booking added successfully!")
                 st.rerun()
 
+        ### Recurring Bookings ###
+        st.subheader("Recurring Bookings")
+        st.write(f"Book {selected_group} for several meals on a weekly pattern in one go.")
+
+        recurring_meals = st.multiselect("Meals", list(meal_dict.keys()), default=[selected_meal], key="recurring_meals")
+        start_col, end_col = st.columns(2)
+        with start_col:
+            recurring_start = st.date_input("First Date", key="recurring_start")
+        with end_col:
+            recurring_end = st.date_input("Last Date", value=recurring_start, key="recurring_end")
+        day_col, interval_col = st.columns([3, 1])
+        with day_col:
+            recurring_days = st.multiselect("On", dates.WEEKDAYS, default=[dates.WEEKDAYS[recurring_start.weekday()]], key="recurring_days")
+        with interval_col:
+            interval_weeks = st.number_input("Every N Weeks", min_value=1, max_value=8, value=1, key="recurring_interval")
+
+        recurring_dates = dates.recurring_dates(
+            recurring_start, recurring_end, [dates.WEEKDAYS.index(day) for day in recurring_days], interval_weeks
+        )
+        slots = [(meal_dict[meal], meal_date) for meal_date in recurring_dates for meal in recurring_meals]
+        st.write(f"{len(recurring_dates)} dates, {len(slots)} meals.")
+
+        if st.button("Add Recurring Bookings", disabled=not slots):
+            # Every date is checked with one query and booked in one transaction
+            try:
+                new_order_ids, conflicts = create_group_bookings(teacher_id, group_id_fk, slots)
+            except ValueError as error:
+                st.error(str(error))
+            else:
+                if new_order_ids:
+                    st.success(f"Booked {len(new_order_ids)} of {len(slots)} meals for {selected_group}.")
+                if conflicts:
+                    meal_names = dict(meals)
+                    st.warning("Some meals were skipped because students already have them booked:")
+                    conflicts_df = pd.DataFrame(
+                        [(dates.display_date(meal_date), meal_names.get(meal_id, meal_id), student_name)
+                         for meal_date, meal_id, _, student_name in conflicts],
+                        columns=["Meal Date", "Meal", "Student Name"]
+                    )
+                    st.dataframe(conflicts_df, hide_index=True)
+
         # Show all bookings for the teacher with MealDate >= today
         st.subheader("Upcoming Bookings")
-        today_date = datetime.now().strftime("%Y-%m-%d")
-        query_bookings = '''
-            SELECT tbl_Meal.Meal, tbl_Orders.MealDate, tbl_Groups.GroupName
-            FROM tbl_Orders
-            JOIN tbl_Meal ON tbl_Orders.Meal_ID_FK = tbl_Meal.Meal_ID
-            JOIN tbl_Orders_Group ON tbl_Orders.Order_ID = tbl_Orders_Group.Order_ID_FK
-            JOIN tbl_Groups ON tbl_Orders_Group.Group_ID_FK = tbl_Groups.Group_ID
-            WHERE tbl_Orders.Teacher_ID_FK = ? AND tbl_Orders.MealDate >= ?
-            ORDER BY tbl_Orders.MealDate ASC
-        '''
-        bookings = fetch_data(query_bookings, (teacher_id, today_date))
+        today_date = dates.today_db()
+        bookings = teacher_upcoming_view(teacher_id, today_date)
 
         # Display the bookings in a DataFrame
         if bookings:
-            bookings_df = pd.DataFrame(bookings, columns=["Meal", "Meal Date", "Group"])
-            bookings_df['Meal Date'] = pd.to_datetime(bookings_df['Meal Date'])
-            bookings_df['Meal Date'] = bookings_df["Meal Date"].dt.strftime('%a %d/%m/%Y')
-            st.dataframe(bookings_df, hide_index=True)
+            bookings_table = frames.rows_to_table(bookings, UPCOMING_BOOKINGS_FRAME)
+            st.dataframe(bookings_table, hide_index=True, column_config={
+                "Meal Date": st.column_config.DateColumn(format=dates.COLUMN_DISPLAY_FORMAT),
+            })
         else:
             st.write("No upcoming bookings.")
@@ -0,0 +1,63 @@
+import os
+import sys
+import pytest
+
+# The modules live at the repository root, next to app.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import auth
+import changes
+import database
+import db
+
+TEST_PASSWORD = "correct horse"
+
+
+# A freshly migrated database in a temporary directory, with the data-access layer pointed at it
+# and a change feed and view cache of its own
+@pytest.fixture
+def ordering_db(tmp_path, monkeypatch):
+    previous = db.DB_PATH
+    path = str(tmp_path / "ordering.db")
+    db.configure(path)
+    monkeypatch.setattr(changes, 'feed', changes.ChangeFeed())
+    changes.invalidate()
+    with db.connection() as conn:
+        database.create_tables(conn)
+        database.migrate(conn)
+    yield path
+    changes.invalidate()
+    db.configure(previous)
+
+
+# A small school: one admin, one teacher with a three-student group, two meals.
+# Returns the IDs by name; every account uses TEST_PASSWORD.
+@pytest.fixture
+def school(ordering_db):
+    password = auth.hash_password(TEST_PASSWORD)
+    with db.transaction() as conn:
+        ids = {
+            'gender': conn.execute("INSERT INTO tbl_Gender (Gender) VALUES ('Female')").lastrowid,
+            'dietary': conn.execute("INSERT INTO tbl_DietaryOption (Dietary) VALUES ('None')").lastrowid,
+            'lunch': conn.execute("INSERT INTO tbl_Meal (Meal) VALUES ('Lunch')").lastrowid,
+            'supper': conn.execute("INSERT INTO tbl_Meal (Meal) VALUES ('Supper')").lastrowid,
+            'admin': conn.execute(
+                "INSERT INTO tbl_User (Name, Surname, Email, Password) VALUES ('Ada', 'Admin', 'admin@school.test', ?)",
+                (password,)).lastrowid,
+            'teacher': conn.execute(
+                "INSERT INTO tbl_Teachers (Name, Surname, Email, Password) VALUES ('Tom', 'Teacher', 'teacher@school.test', ?)",
+                (password,)).lastrowid,
+        }
+        ids['students'] = [
+            conn.execute('''
+                INSERT INTO tbl_Students (Name, Surname, Gender_ID_FK, Grade, Border, Dietary_ID_FK, Email, Password)
+                VALUES (?, ?, ?, 8, 1, ?, ?, ?)
+            ''', (f"Student{number}", f"Surname{number}", ids['gender'], ids['dietary'],
+                  f"student{number}@school.test", password)).lastrowid
+            for number in range(1, 4)
+        ]
+        ids['group'] = conn.execute(
+            "INSERT INTO tbl_Groups (Teacher_ID_FK, GroupName) VALUES (?, 'Hockey')", (ids['teacher'],)).lastrowid
+        conn.executemany("INSERT INTO tbl_Groups_Students (Group_ID_FK, Student_ID_FK) VALUES (?, ?)",
+                         [(ids['group'], student_id) for student_id in ids['students']])
+    return ids
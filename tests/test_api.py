@@ -0,0 +1,221 @@
+import asyncio
+import json
+import urllib.parse
+import pytest
+
+pytest.importorskip('starlette')
+pytest.importorskip('itsdangerous')
+
+import api
+import checkin
+import dates
+from conftest import TEST_PASSWORD
+
+MEAL_DATE = '2030-03-04'
+
+
+# Send one HTTP request straight to the ASGI app and return (status, decoded JSON body)
+def call(method, path, token=None, params=None, body=None):
+    headers = [(b'host', b'testserver')]
+    if token is not None:
+        headers.append((b'authorization', f"Bearer {token}".encode()))
+    payload = b''
+    if body is not None:
+        payload = json.dumps(body).encode()
+        headers.append((b'content-type', b'application/json'))
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': urllib.parse.urlencode(params or {}).encode(),
+        'root_path': '',
+        'headers': headers,
+        'server': ('testserver', 80),
+        'client': ('127.0.0.1', 50000),
+    }
+    sent = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': payload, 'more_body': False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(api.app(scope, receive, send))
+    status = next(message['status'] for message in sent if message['type'] == 'http.response.start')
+    content = b''.join(message.get('body', b'') for message in sent if message['type'] == 'http.response.body')
+    return status, json.loads(content)
+
+
+def login(email):
+    status, body = call('POST', '/api/login', body={'email': email, 'password': TEST_PASSWORD})
+    assert status == 200, body
+    return body['token']
+
+
+def test_login_returns_token_and_account(school):
+    status, body = call('POST', '/api/login', body={'email': 'teacher@school.test', 'password': TEST_PASSWORD})
+    assert status == 200
+    assert body['user_type'] == 'Teacher'
+    assert body['account_id'] == school['teacher']
+    assert body['token']
+
+
+@pytest.mark.parametrize('email, password', [
+    ('teacher@school.test', 'wrong password'),
+    ('nobody@school.test', TEST_PASSWORD),
+])
+def test_login_rejects_bad_credentials(school, email, password):
+    status, body = call('POST', '/api/login', body={'email': email, 'password': password})
+    assert status == 401
+    assert body == {'error': "Invalid email or password."}
+
+
+def test_login_requires_json_object(school):
+    assert call('POST', '/api/login', body=['admin@school.test'])[0] == 400
+
+
+def test_missing_token_is_refused(school):
+    status, body = call('GET', '/api/bookings')
+    assert status == 401
+    assert body == {'error': "Missing bearer token."}
+
+
+def test_tampered_token_is_refused(school):
+    token = login('student1@school.test')
+    status, body = call('GET', '/api/bookings', token=token[:-2] + ('AA' if token[-2:] != 'AA' else 'BB'))
+    assert status == 401
+    assert body == {'error': "Invalid token."}
+
+
+def test_expired_token_is_refused(school, monkeypatch):
+    token = login('student1@school.test')
+    monkeypatch.setattr(api, 'API_TOKEN_SECONDS', -1)
+    status, body = call('GET', '/api/bookings', token=token)
+    assert status == 401
+    assert body == {'error': "Token expired; log in again."}
+
+
+def test_student_books_a_meal_once(school):
+    token = login('student1@school.test')
+    booking = {'meal_id': school['lunch'], 'meal_date': MEAL_DATE}
+
+    status, body = call('POST', '/api/bookings', token=token, body=booking)
+    assert status == 201
+    assert body['order_id']
+
+    status, body = call('POST', '/api/bookings', token=token, body=booking)
+    assert status == 409
+    assert body == {'error': "The student already has this meal on that date."}
+
+    status, body = call('GET', '/api/bookings', token=token, params={'from': MEAL_DATE})
+    assert status == 200
+    assert [row['meal_date'] for row in body['bookings']] == [MEAL_DATE]
+
+
+def test_booking_requires_meal_fields(school):
+    token = login('student1@school.test')
+    status, body = call('POST', '/api/bookings', token=token, body={'meal_id': school['lunch']})
+    assert status == 400
+    assert body == {'error': "Missing field: meal_date."}
+
+
+def test_group_booking_reports_conflicts(school):
+    student_token = login('student2@school.test')
+    call('POST', '/api/bookings', token=student_token, body={'meal_id': school['supper'], 'meal_date': MEAL_DATE})
+
+    teacher_token = login('teacher@school.test')
+    status, body = call('POST', '/api/bookings', token=teacher_token,
+                        body={'meal_id': school['supper'], 'meal_date': MEAL_DATE, 'group_id': school['group']})
+    assert status == 409
+    assert [conflict['student_id'] for conflict in body['conflicts']] == [school['students'][1]]
+
+    status, body = call('POST', '/api/bookings', token=teacher_token,
+                        body={'meal_id': school['lunch'], 'meal_date': MEAL_DATE, 'group_id': school['group']})
+    assert status == 201
+
+    status, body = call('GET', '/api/bookings', token=teacher_token, params={'from': MEAL_DATE})
+    assert status == 200
+    assert body['bookings'] == [{'meal': 'Lunch', 'meal_date': MEAL_DATE, 'group': 'Hockey'}]
+
+
+def test_teacher_cannot_book_another_teachers_group(school):
+    token = login('teacher@school.test')
+    status, _ = call('POST', '/api/bookings', token=token,
+                     body={'meal_id': school['lunch'], 'meal_date': MEAL_DATE, 'group_id': school['group'] + 1})
+    assert status == 404
+
+
+def test_admin_pages_through_bookings_with_cursor(school):
+    admin_token = login('admin@school.test')
+    booked = set()
+    for student_id in school['students']:
+        for meal_id in (school['lunch'], school['supper']):
+            status, body = call('POST', '/api/bookings', token=admin_token,
+                                body={'meal_id': meal_id, 'meal_date': MEAL_DATE, 'student_id': student_id})
+            assert status == 201
+            booked.add(body['order_id'])
+
+    seen = []
+    params = {'date_from': MEAL_DATE, 'date_to': MEAL_DATE, 'page_size': 4}
+    while True:
+        status, body = call('GET', '/api/bookings', token=admin_token, params=params)
+        assert status == 200
+        assert len(body['bookings']) <= 4
+        seen.extend(row['order_id'] for row in body['bookings'])
+        if body['next'] is None:
+            break
+        params['after'] = body['next']
+    assert len(seen) == len(booked)
+    assert set(seen) == booked
+
+
+@pytest.mark.parametrize('page_size', ['0', '-1', 'ten'])
+def test_admin_bookings_reject_bad_page_size(school, page_size):
+    token = login('admin@school.test')
+    status, body = call('GET', '/api/bookings', token=token, params={'page_size': page_size})
+    assert status == 400
+    assert 'page_size' in body['error']
+
+
+def test_counts_for_admin_only(school):
+    student_token = login('student1@school.test')
+    call('POST', '/api/bookings', token=student_token, body={'meal_id': school['lunch'], 'meal_date': MEAL_DATE})
+
+    status, body = call('GET', '/api/counts', token=login('admin@school.test'), params={'date': MEAL_DATE})
+    assert status == 200
+    assert body['date'] == dates.to_db_date(MEAL_DATE)
+    assert body['counts'] == [{'meal': 'Lunch', 'dietary': 'None', 'quantity': 1}]
+
+    status, body = call('GET', '/api/counts', token=student_token)
+    assert status == 403
+    assert body == {'error': "Not available to Student accounts."}
+
+
+def test_checkin_serves_a_booked_student(school):
+    student_token = login('student1@school.test')
+    call('POST', '/api/bookings', token=student_token, body={'meal_id': school['lunch'], 'meal_date': dates.today_db()})
+    admin_token = login('admin@school.test')
+    try:
+        status, body = call('POST', '/api/checkin', token=admin_token,
+                            body={'meal_id': school['lunch'], 'student_id': school['students'][0]})
+        assert status == 200
+        assert body == {'status': checkin.SERVED, 'student_id': school['students'][0], 'student': "Student1 Surname1"}
+
+        status, body = call('POST', '/api/checkin', token=admin_token,
+                            body={'meal_id': school['lunch'], 'student_id': school['students'][1]})
+        assert body['status'] == checkin.NOT_BOOKED
+    finally:
+        checkin.close_all()
+
+
+def test_checkin_refuses_an_unknown_meal(school):
+    status, body = call('POST', '/api/checkin', token=login('admin@school.test'),
+                        body={'meal_id': school['supper'] + 100, 'student_id': school['students'][0]})
+    assert status == 404
+    assert body == {'error': f"Meal {school['supper'] + 100} not found."}
+    assert checkin.get_service(school['supper'] + 100) is None
@@ -0,0 +1,90 @@
+import os
+import sqlite3
+import pytest
+
+import archive
+import bookings
+import db
+import kitchen
+
+CUTOFF = '2025-01-01'
+PAST_DATES = ['2020-01-06', '2020-01-07']
+FUTURE_DATE = '2030-03-04'
+
+
+@pytest.fixture
+def history(school, monkeypatch):
+    monkeypatch.delenv('ORDERING_ARCHIVE_DB', raising=False)
+    bookings.create_student_booking(school['students'][0], school['lunch'], PAST_DATES[0])
+    bookings.create_group_booking(school['teacher'], school['group'], school['supper'], PAST_DATES[1])
+    bookings.create_group_booking(school['teacher'], school['group'], school['lunch'], FUTURE_DATE)
+    return school
+
+
+def order_dates():
+    return [meal_date for (meal_date,) in db.fetch_data("SELECT MealDate FROM tbl_Orders ORDER BY MealDate")]
+
+
+def daily_counts():
+    return {meal_date: kitchen.fetch_daily_counts(meal_date) for meal_date in PAST_DATES + [FUTURE_DATE]}
+
+
+def test_reading_history_does_not_create_the_archive(history):
+    summary = archive.archive_summary()
+    rows = archive.fetch_history("SELECT COUNT(*) FROM v_Orders")
+
+    assert not os.path.exists(archive.archive_path())
+    assert summary['live_orders'] == 3
+    assert summary['archived_orders'] == 0
+    assert rows == [(3,)]
+
+
+def test_run_archive_moves_orders_before_the_cutoff(history):
+    counts_before = daily_counts()
+
+    moved = archive.run_archive(before=CUTOFF)
+
+    assert moved == 2
+    assert order_dates() == [FUTURE_DATE]
+    assert archive.archive_summary()['archived_orders'] == 2
+    assert archive.fetch_history("SELECT MealDate FROM v_Orders ORDER BY MealDate") == [
+        (PAST_DATES[0],), (PAST_DATES[1],), (FUTURE_DATE,)]
+    # One individual booking and the three members of each group order
+    assert archive.fetch_history("SELECT MealDate, COUNT(*) FROM v_Booking_History GROUP BY 1 ORDER BY 1") == [
+        (PAST_DATES[0], 1), (PAST_DATES[1], 3), (FUTURE_DATE, 3)]
+    assert daily_counts() == counts_before
+    assert db.fetch_data("SELECT COUNT(*) FROM tbl_Meal_Counts WHERE MealDate < ? AND Quantity > 0", (CUTOFF,)) == [(0,)]
+
+
+def test_history_views_switch_to_the_archive_once_it_exists(history):
+    assert archive.fetch_history("SELECT COUNT(*) FROM v_Orders") == [(3,)]
+    archive.run_archive(before=CUTOFF)
+    assert archive.fetch_history("SELECT COUNT(*) FROM v_Orders") == [(3,)]
+
+
+def test_run_archive_again_is_a_no_op(history):
+    archive.run_archive(before=CUTOFF)
+    counts = daily_counts()
+    summary = archive.archive_summary()
+
+    assert archive.run_archive(before=CUTOFF) == 0
+    assert daily_counts() == counts
+    assert archive.archive_summary() == summary
+    assert archive.fetch_history("SELECT COUNT(*) FROM v_Booking_History") == [(7,)]
+
+
+def test_failed_batch_rolls_back(history, monkeypatch):
+    counts_before = daily_counts()
+    steps = archive.ARCHIVE_BATCH_STEPS
+    monkeypatch.setattr(archive, 'ARCHIVE_BATCH_STEPS', steps + ["INSERT INTO no_such_table VALUES (1)"])
+
+    with pytest.raises(sqlite3.OperationalError):
+        archive.run_archive(before=CUTOFF)
+
+    assert order_dates() == PAST_DATES + [FUTURE_DATE]
+    assert archive.archive_summary()['archived_orders'] == 0
+    assert daily_counts() == counts_before
+
+    monkeypatch.setattr(archive, 'ARCHIVE_BATCH_STEPS', steps)
+    assert archive.run_archive(before=CUTOFF) == 2
+    assert daily_counts() == counts_before
@@ -0,0 +1,144 @@
+import sqlite3
+import pytest
+
+import bookings
+import db
+import groups
+import kitchen
+
+MEAL_DATE = '2030-03-04'
+
+
+# Give the first student a different dietary requirement, so counts split by dietary option
+@pytest.fixture
+def vegan(school):
+    with db.transaction() as conn:
+        dietary_id = conn.execute("INSERT INTO tbl_DietaryOption (Dietary) VALUES ('Vegan')").lastrowid
+        conn.execute("UPDATE tbl_Students SET Dietary_ID_FK = ? WHERE Student_ID = ?", (dietary_id, school['students'][0]))
+    return dietary_id
+
+
+def counts():
+    return sorted(kitchen.fetch_daily_counts(MEAL_DATE))
+
+
+def student_bookings():
+    return db.fetch_data('''
+        SELECT Student_ID_FK, Meal_ID_FK, Order_ID_FK, Booked_By FROM tbl_Student_Bookings
+        WHERE MealDate = ? ORDER BY Student_ID_FK, Meal_ID_FK
+    ''', (MEAL_DATE,))
+
+
+def cancel_order(order_id):
+    with db.transaction() as conn:
+        conn.execute("DELETE FROM tbl_Orders_Group WHERE Order_ID_FK = ?", (order_id,))
+        conn.execute("DELETE FROM tbl_Orders WHERE Order_ID = ?", (order_id,))
+
+
+def test_duplicate_individual_booking_is_refused(school, vegan):
+    first = school['students'][0]
+    order_id = bookings.create_student_booking(first, school['lunch'], MEAL_DATE)
+
+    assert bookings.create_student_booking(first, school['lunch'], MEAL_DATE) is None
+    assert db.fetch_data("SELECT Order_ID FROM tbl_Orders") == [(order_id,)]
+    assert student_bookings() == [(first, school['lunch'], order_id, first)]
+    assert counts() == [('Lunch', 'Vegan', 1)]
+
+
+def test_batch_booking_reports_slots_already_booked(school, vegan):
+    first = school['students'][0]
+    bookings.create_student_booking(first, school['lunch'], MEAL_DATE)
+
+    order_ids, conflicts = bookings.create_student_bookings(
+        first, [(school['lunch'], MEAL_DATE), (school['supper'], MEAL_DATE)])
+
+    assert len(order_ids) == 1
+    assert conflicts == [(MEAL_DATE, school['lunch'])]
+    assert counts() == [('Lunch', 'Vegan', 1), ('Supper', 'Vegan', 1)]
+
+
+def test_unique_slot_index_rejects_a_second_booking_row(school):
+    first = school['students'][0]
+    order_id = bookings.create_student_booking(first, school['lunch'], MEAL_DATE)
+    with pytest.raises(sqlite3.IntegrityError):
+        db.execute_query('''
+            INSERT INTO tbl_Student_Bookings (Student_ID_FK, MealDate, Meal_ID_FK, Order_ID_FK, Booked_By)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (first, MEAL_DATE, school['lunch'], order_id + 1, first))
+
+
+def test_group_booking_is_refused_when_a_member_already_has_the_meal(school, vegan):
+    first, second, _ = school['students']
+    bookings.create_student_booking(second, school['lunch'], MEAL_DATE)
+
+    order_id, conflicts = bookings.create_group_booking(school['teacher'], school['group'], school['lunch'], MEAL_DATE)
+
+    assert order_id is None
+    assert conflicts == [(second, "Student2 Surname2")]
+    assert [row[0] for row in student_bookings()] == [second]
+    assert counts() == [('Lunch', 'None', 1)]
+
+    # The free meal is booked for every member, counted by dietary option
+    order_id, conflicts = bookings.create_group_booking(school['teacher'], school['group'], school['supper'], MEAL_DATE)
+    assert order_id is not None and conflicts == []
+    assert counts() == [('Lunch', 'None', 1), ('Supper', 'None', 2), ('Supper', 'Vegan', 1)]
+
+
+def test_group_batch_skips_slots_with_booked_members(school, vegan):
+    second = school['students'][1]
+    bookings.create_student_booking(second, school['supper'], MEAL_DATE)
+
+    order_ids, conflicts = bookings.create_group_bookings(
+        school['teacher'], school['group'], [(school['lunch'], MEAL_DATE), (school['supper'], MEAL_DATE)])
+
+    assert len(order_ids) == 1
+    assert conflicts == [(MEAL_DATE, school['supper'], second, "Student2 Surname2")]
+    assert counts() == [('Lunch', 'None', 2), ('Lunch', 'Vegan', 1), ('Supper', 'None', 1)]
+
+
+def test_joining_member_keeps_their_own_booking(school, vegan):
+    first = school['students'][0]
+    groups.remove_group_members(school['group'], [first])
+    own_order = bookings.create_student_booking(first, school['lunch'], MEAL_DATE)
+    group_order, _ = bookings.create_group_booking(school['teacher'], school['group'], school['lunch'], MEAL_DATE)
+
+    groups.add_group_members(school['group'], [first])
+
+    assert [(student, order) for student, _, order, _ in student_bookings()] == [
+        (first, own_order), (school['students'][1], group_order), (school['students'][2], group_order)]
+    assert counts() == [('Lunch', 'None', 2), ('Lunch', 'Vegan', 1)]
+
+
+def test_cancelled_order_is_refilled_from_another_covering_order(school, vegan):
+    first = school['students'][0]
+    groups.remove_group_members(school['group'], [first])
+    own_order = bookings.create_student_booking(first, school['lunch'], MEAL_DATE)
+    group_order, _ = bookings.create_group_booking(school['teacher'], school['group'], school['lunch'], MEAL_DATE)
+    groups.add_group_members(school['group'], [first])
+
+    cancel_order(own_order)
+
+    assert student_bookings()[0] == (first, school['lunch'], group_order, school['teacher'])
+    assert counts() == [('Lunch', 'None', 2), ('Lunch', 'Vegan', 1)]
+    assert bookings.fetch_student_upcoming(first, MEAL_DATE) == [('Lunch', MEAL_DATE, school['teacher'])]
+
+
+def test_cancelled_order_without_cover_removes_the_booking(school, vegan):
+    first = school['students'][0]
+    own_order = bookings.create_student_booking(first, school['lunch'], MEAL_DATE)
+
+    cancel_order(own_order)
+
+    assert student_bookings() == []
+    assert counts() == []
+    assert bookings.fetch_student_upcoming(first, MEAL_DATE) == []
+
+
+def test_leaving_a_group_drops_its_bookings(school, vegan):
+    first = school['students'][0]
+    bookings.create_group_booking(school['teacher'], school['group'], school['lunch'], MEAL_DATE)
+
+    groups.remove_group_members(school['group'], [first])
+
+    assert first not in [row[0] for row in student_bookings()]
+    assert counts() == [('Lunch', 'None', 2)]
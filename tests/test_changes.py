@@ -0,0 +1,103 @@
+import sqlite3
+import pytest
+
+import bookings
+import changes
+import reference_data
+
+MEAL_DATE = '2030-03-04'
+
+
+# Trust file stamps straight away: the tests commit and read back within the same second
+@pytest.fixture
+def feed(school, monkeypatch):
+    monkeypatch.setattr(changes, 'RACY_STAMP_NS', 0)
+    return school
+
+
+# A cached view that records its loads and the changes it was asked to apply
+class CountingView:
+    def __init__(self):
+        self.loads = 0
+        self.updates = []
+
+    def load(self):
+        self.loads += 1
+        return self.loads
+
+    def update(self, state, new):
+        self.updates.append([(change.table, change.operation) for change in new])
+        return state
+
+    def read(self):
+        return changes.cached_view('counting', self.load, self.update)
+
+
+def forbid_queries(monkeypatch):
+    def fail(*args):
+        pytest.fail("the change feed queried the database")
+    monkeypatch.setattr(changes, 'fetch_one', fail)
+    monkeypatch.setattr(changes, 'fetch_data', fail)
+
+
+def test_unchanged_view_is_served_without_a_query(feed, monkeypatch):
+    view = CountingView()
+    assert view.read() == 1
+
+    forbid_queries(monkeypatch)
+    assert view.read() == 1
+    assert view.read() == 1
+    assert view.loads == 1
+    assert view.updates == []
+
+
+def test_write_to_a_tracked_table_reaches_the_view(feed):
+    view = CountingView()
+    view.read()
+
+    bookings.create_student_booking(feed['students'][0], feed['lunch'], MEAL_DATE)
+    view.read()
+
+    assert view.loads == 1
+    assert view.updates == [[('tbl_Orders', 'I'), ('tbl_Orders_Group', 'I')]]
+
+
+def test_write_to_an_untracked_table_leaves_the_view_alone(feed, ordering_db):
+    view = CountingView()
+    view.read()
+
+    with sqlite3.connect(ordering_db) as conn:
+        conn.execute("UPDATE tbl_User SET Name = 'Renamed'")
+    view.read()
+
+    assert view.loads == 1
+    assert view.updates == []
+
+
+def test_write_on_another_connection_updates_cached_views(feed, ordering_db):
+    student_id = feed['students'][0]
+    assert bookings.student_upcoming_view(student_id, MEAL_DATE) == []
+    assert dict(reference_data.get_meals())[feed['lunch']] == 'Lunch'
+
+    # Another process: its own connection, none of this process's write paths
+    with sqlite3.connect(ordering_db) as conn:
+        order_id = conn.execute('''
+            INSERT INTO tbl_Orders (OrderDate, Meal_ID_FK, Student_ID_FK, MealDate) VALUES ('2030-03-01 08:00:00', ?, ?, ?)
+        ''', (feed['lunch'], student_id, MEAL_DATE)).lastrowid
+        conn.execute("INSERT INTO tbl_Orders_Group (Order_ID_FK, Student_ID_FK) VALUES (?, ?)", (order_id, student_id))
+        conn.execute("UPDATE tbl_Meal SET Meal = 'Dinner' WHERE Meal_ID = ?", (feed['lunch'],))
+
+    assert dict(reference_data.get_meals())[feed['lunch']] == 'Dinner'
+    assert bookings.student_upcoming_view(student_id, MEAL_DATE) == [('Dinner', MEAL_DATE, student_id)]
+
+
+def test_view_reloads_when_the_feed_no_longer_holds_its_changes(feed, monkeypatch):
+    view = CountingView()
+    view.read()
+    monkeypatch.setattr(changes, 'FEED_SIZE', 1)
+
+    bookings.create_student_booking(feed['students'][0], feed['lunch'], MEAL_DATE)
+    view.read()
+
+    assert view.loads == 2
+    assert view.updates == []
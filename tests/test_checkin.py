@@ -0,0 +1,67 @@
+import pytest
+
+import bookings
+import checkin
+import db
+
+MEAL_DATE = '2030-03-04'
+
+
+@pytest.fixture
+def service(school):
+    bookings.create_student_booking(school['students'][0], school['lunch'], MEAL_DATE)
+    service = checkin.MealService(MEAL_DATE, school['lunch'])
+    yield service
+    service.close()
+
+
+def test_swipes_are_answered_from_the_index(school, service):
+    first, second, _ = school['students']
+    assert service.check_in(first).status == checkin.SERVED
+    assert service.check_in(first).status == checkin.ALREADY_SERVED
+    assert service.check_in(second, recheck=False).status == checkin.NOT_BOOKED
+    service.flush()
+    assert db.fetch_data(checkin.SERVED_STUDENTS_QUERY, (MEAL_DATE, school['lunch'])) == [(first,)]
+
+
+def test_miss_is_rechecked_against_the_database(school, service):
+    second = school['students'][1]
+    bookings.create_student_booking(second, school['lunch'], MEAL_DATE)
+    result = service.check_in(second)
+    assert result.status == checkin.SERVED
+    assert result.name == "Student2 Surname2"
+
+
+def test_refresh_applies_bookings_for_this_meal_only(school, service, monkeypatch):
+    first, second, third = school['students']
+    monkeypatch.setattr(service, 'reload', lambda: pytest.fail("refresh reloaded the whole meal"))
+    order_id = bookings.create_student_booking(second, school['lunch'], MEAL_DATE)
+    bookings.create_student_booking(third, school['supper'], MEAL_DATE)
+    db.execute_query("UPDATE tbl_Students SET Name = 'Renamed' WHERE Student_ID = ?", (first,))
+    service.refresh()
+    assert service.booked == {first: "Renamed Surname1", second: "Student2 Surname2"}
+
+    # A cancellation drops the student from the index
+    with db.transaction() as conn:
+        conn.execute("DELETE FROM tbl_Orders_Group WHERE Order_ID_FK = ?", (order_id,))
+        conn.execute("DELETE FROM tbl_Orders WHERE Order_ID = ?", (order_id,))
+    service.refresh()
+    assert set(service.booked) == {first}
+
+
+def test_refresh_reloads_for_a_group_booking(school):
+    service = checkin.MealService(MEAL_DATE, school['supper'])
+    try:
+        order_id, _ = bookings.create_group_booking(school['teacher'], school['group'], school['supper'], MEAL_DATE)
+        assert order_id is not None
+        service.refresh()
+        assert set(service.booked) == set(school['students'])
+    finally:
+        service.close()
+
+
+def test_refresh_merges_meals_served_elsewhere(school, service):
+    first = school['students'][0]
+    db.execute_query(checkin.RECORD_SERVED_QUERY, (MEAL_DATE, school['lunch'], first, '2030-03-04 12:00:00'))
+    service.refresh()
+    assert service.check_in(first).status == checkin.ALREADY_SERVED
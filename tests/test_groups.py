@@ -0,0 +1,56 @@
+import archive
+import bookings
+import db
+import groups
+
+PAST_DATE = '2020-01-06'
+FUTURE_DATE = '2030-03-04'
+
+GROUP_ORDER_DATES_QUERY = '''
+    SELECT o.MealDate FROM tbl_Orders o JOIN tbl_Orders_Group og ON og.Order_ID_FK = o.Order_ID
+    WHERE og.Group_ID_FK = ? ORDER BY 1
+'''
+
+
+def group_state(group_id):
+    return {
+        'group': db.fetch_one("SELECT RetiredAt IS NOT NULL FROM tbl_Groups WHERE Group_ID = ?", (group_id,)),
+        'members': db.fetch_one("SELECT COUNT(*) FROM tbl_Groups_Students WHERE Group_ID_FK = ?", (group_id,))[0],
+        'orders': [meal_date for (meal_date,) in db.fetch_data(GROUP_ORDER_DATES_QUERY, (group_id,))],
+    }
+
+
+def meal_counts():
+    return db.fetch_data("SELECT MealDate, Meal_ID_FK, Quantity FROM tbl_Meal_Counts WHERE Quantity > 0 ORDER BY 1, 2")
+
+
+def test_delete_group_with_only_upcoming_orders(school):
+    bookings.create_group_booking(school['teacher'], school['group'], school['lunch'], FUTURE_DATE)
+
+    assert groups.delete_group(school['group'])
+
+    assert group_state(school['group']) == {'group': None, 'members': 0, 'orders': []}
+    assert db.fetch_data("SELECT COUNT(*) FROM tbl_Orders") == [(0,)]
+    assert meal_counts() == []
+
+
+def test_delete_group_with_past_orders_retires_it(school, monkeypatch):
+    monkeypatch.delenv('ORDERING_ARCHIVE_DB', raising=False)
+    bookings.create_group_booking(school['teacher'], school['group'], school['lunch'], PAST_DATE)
+    bookings.create_group_booking(school['teacher'], school['group'], school['lunch'], FUTURE_DATE)
+
+    assert groups.delete_group(school['group'])
+
+    # Upcoming orders are cancelled; the past one keeps its members and counts
+    assert group_state(school['group']) == {'group': (1,), 'members': 3, 'orders': [PAST_DATE]}
+    assert meal_counts() == [(PAST_DATE, school['lunch'], 3)]
+
+    # The scheduled archive run moves the past order and clears the memberships
+    assert archive.run_if_due() == 1
+    assert group_state(school['group']) == {'group': (1,), 'members': 0, 'orders': []}
+    assert archive.fetch_history("SELECT Quantity FROM v_Meal_Counts WHERE MealDate = ?", (PAST_DATE,)) == [(3,)]
+    assert archive.run_if_due() is None
+
+
+def test_delete_missing_group(school):
+    assert groups.delete_group(school['group'] + 1) is False
@@ -0,0 +1,89 @@
+import auth
+import bookings
+import db
+import student_editor
+from conftest import TEST_PASSWORD
+
+
+def students_by_id():
+    return {student_id: (name, email) for student_id, name, email in
+            db.fetch_data("SELECT Student_ID, Name, Email FROM tbl_Students")}
+
+
+def test_save_swaps_emails_and_reuses_a_deleted_students_email(school):
+    first, second, third = school['students']
+    bookings.create_student_booking(third, school['lunch'], '2030-03-04')
+    page, _ = student_editor.fetch_student_page()
+    positions = {student_id: position for position, student_id in enumerate(page.column('Student_ID').to_pylist())}
+    state = {
+        'edited_rows': {
+            positions[first]: {'Email': 'student2@school.test'},
+            positions[second]: {'Email': 'student1@school.test', 'Name': 'Renamed'},
+        },
+        'added_rows': [{'Name': 'New', 'Surname': 'Student', 'Gender': 'Female', 'Grade': 9, 'Border': True,
+                        'Dietary': 'None', 'Email': 'student3@school.test', 'New Password': 'new password'}],
+        'deleted_rows': [positions[third]],
+    }
+
+    counts, errors = student_editor.save_edits(page, state)
+
+    assert errors.empty, errors.to_string()
+    assert counts == {'updated': 2, 'added': 1, 'deleted': 1}
+    students = students_by_id()
+    assert students[first] == ('Student1', 'student2@school.test')
+    assert students[second] == ('Renamed', 'student1@school.test')
+    assert third not in students
+    assert auth.authenticate('student1@school.test', TEST_PASSWORD)[3] == second
+    assert auth.authenticate('student3@school.test', 'new password')[1] == 'New'
+    assert db.fetch_data("SELECT COUNT(*) FROM tbl_Student_Bookings WHERE Student_ID_FK = ?", (third,)) == [(0,)]
+
+
+def test_save_rejects_emails_that_could_clash_with_a_parked_one(school):
+    page, _ = student_editor.fetch_student_page()
+    state = {'edited_rows': {0: {'Email': 'moving student 1'}}, 'added_rows': [], 'deleted_rows': []}
+
+    counts, errors = student_editor.save_edits(page, state)
+
+    assert counts == {'updated': 0, 'added': 0, 'deleted': 0}
+    assert errors['Error'].tolist() == ["Email must be an address like name@example.com, without spaces."]
+
+
+def meal_counts():
+    return db.fetch_data("SELECT MealDate, Meal_ID_FK, Dietary_ID_FK, Quantity FROM tbl_Meal_Counts WHERE Quantity > 0 ORDER BY 1, 2, 3")
+
+
+def delete_state(page, student_id):
+    return {'edited_rows': {}, 'added_rows': [],
+            'deleted_rows': [page.column('Student_ID').to_pylist().index(student_id)]}
+
+
+def test_delete_refuses_a_student_with_past_orders(school):
+    student_id = school['students'][0]
+    past_order = bookings.create_student_booking(student_id, school['lunch'], '2020-01-06')
+    bookings.create_student_booking(student_id, school['lunch'], '2030-03-04')
+    counts_before = meal_counts()
+    page, _ = student_editor.fetch_student_page()
+
+    counts, errors = student_editor.save_edits(page, delete_state(page, student_id))
+
+    assert counts == {'updated': 0, 'added': 0, 'deleted': 0}
+    assert errors['Error'].tolist() == ["Students with past bookings or served meals cannot be deleted."]
+    assert student_id in students_by_id()
+    assert db.fetch_data("SELECT Order_ID FROM tbl_Orders WHERE Student_ID_FK = ? AND MealDate < '2030-01-01'",
+                         (student_id,)) == [(past_order,)]
+    assert meal_counts() == counts_before
+    assert ('2020-01-06', school['lunch'], school['dietary'], 1) in counts_before
+
+
+def test_delete_removes_a_student_with_only_upcoming_orders(school):
+    student_id = school['students'][0]
+    bookings.create_student_booking(student_id, school['lunch'], '2030-03-04')
+    bookings.create_group_booking(school['teacher'], school['group'], school['supper'], '2030-03-04')
+    page, _ = student_editor.fetch_student_page()
+
+    counts, errors = student_editor.save_edits(page, delete_state(page, student_id))
+
+    assert errors.empty, errors.to_string()
+    assert counts['deleted'] == 1
+    assert student_id not in students_by_id()
+    assert meal_counts() == [('2030-03-04', school['supper'], school['dietary'], 2)]
@@ -0,0 +1,138 @@
+import io
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+import db
+import student_import
+
+HEADER = ['Name', 'Surname', 'Gender', 'Grade', 'Border', 'Dietary', 'Email', 'Password']
+
+
+# Rows use a dietary option other than 'None', which read_csv would take for a missing value
+@pytest.fixture
+def roster(school):
+    db.execute_query("INSERT INTO tbl_DietaryOption (Dietary) VALUES ('Vegan')")
+    return school
+
+
+def student(number, **values):
+    row = {'Name': f"New{number}", 'Surname': f"Pupil{number}", 'Gender': 'Female', 'Grade': '9', 'Border': 'Yes',
+           'Dietary': 'Vegan', 'Email': f"new{number}@school.test", 'Password': 'secret'}
+    row.update(values)
+    return [row[column] for column in HEADER]
+
+
+def csv_upload(rows):
+    lines = [",".join(HEADER)] + ["" if row is None else ",".join(str(value) for value in row) for row in rows]
+    upload = io.BytesIO(("\n".join(lines) + "\n").encode())
+    upload.name = 'roster.csv'
+    return upload
+
+
+def xlsx_upload(rows):
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(HEADER)
+    for row_number, row in enumerate(rows, start=2):
+        for column_number, value in enumerate(row or [], start=1):
+            sheet.cell(row=row_number, column=column_number, value=value)
+    upload = io.BytesIO()
+    workbook.save(upload)
+    upload.seek(0)
+    upload.name = 'roster.xlsx'
+    return upload
+
+
+def imported_emails():
+    return [email for (email,) in db.fetch_data("SELECT Email FROM tbl_Students WHERE Email LIKE 'new%' ORDER BY Email")]
+
+
+@pytest.mark.parametrize('make_upload', [csv_upload, xlsx_upload])
+def test_errors_keep_source_row_numbers_across_blank_rows(roster, make_upload):
+    upload = make_upload([
+        student(1),
+        None,
+        student(2, Grade='nine'),
+        None,
+        None,
+        student(3),
+        student(4, Border='maybe'),
+    ])
+
+    count, report, error_count = student_import.import_students_streaming(upload, chunk_size=2)
+
+    assert count == 2
+    assert error_count == 2
+    assert report[['Row', 'Error']].values.tolist() == [
+        [4, "Grade must be a whole number."],
+        [8, "Border must be Yes/No, True/False or 1/0."],
+    ]
+    assert imported_emails() == ['new1@school.test', 'new3@school.test']
+
+
+def test_each_validation_message(roster):
+    rows = [
+        student(1),
+        student(2, Name=''),
+        student(3, Email='not an email'),
+        student(4, Gender='Unknown'),
+        student(5, Dietary='Keto'),
+        student(6, Grade='8.5'),
+        student(7, Border='perhaps'),
+        student(8, Email='new1@school.test'),
+        student(9, Email='student1@school.test'),
+    ]
+
+    valid, errors = student_import.prepare_students(pd.DataFrame(rows, columns=HEADER))
+
+    assert valid['Email'].tolist() == ['new1@school.test']
+    assert errors[['Row', 'Error']].values.tolist() == [
+        [3, "Name, Surname, Email and Password are required."],
+        [4, "Email must be an address like name@example.com, without spaces."],
+        [5, "Gender 'Unknown' does not exist in the database."],
+        [6, "Dietary option 'Keto' does not exist in the database."],
+        [7, "Grade must be a whole number."],
+        [8, "Border must be Yes/No, True/False or 1/0."],
+        [9, "Email appears more than once in the file."],
+        [10, "A student with this email already exists."],
+    ]
+
+
+def test_email_repeated_in_a_later_chunk_is_reported(roster):
+    upload = csv_upload([student(1), student(2), student(3, Email='new1@school.test'), student(4)])
+
+    count, report, _ = student_import.import_students_streaming(upload, chunk_size=2)
+
+    assert count == 3
+    assert report[['Row', 'Error']].values.tolist() == [[4, "A student with this email already exists."]]
+    assert imported_emails() == ['new1@school.test', 'new2@school.test', 'new4@school.test']
+
+
+def test_insert_reports_an_email_taken_after_validation(roster):
+    valid, errors = student_import.prepare_students(pd.DataFrame([student(1), student(2), student(3)], columns=HEADER))
+    assert errors.empty
+    # Another admin adds new2@ between validation and the insert
+    student_import.import_students(pd.DataFrame([student(9, Email='new2@school.test')], columns=HEADER))
+
+    count, clashes = student_import.insert_students(valid)
+
+    assert count == 2
+    assert clashes[['Row', 'Email', 'Error']].values.tolist() == [
+        [3, 'new2@school.test', "A student with this email was added during the import."]]
+    assert imported_emails() == ['new1@school.test', 'new2@school.test', 'new3@school.test']
+    assert db.fetch_one("SELECT Name FROM tbl_Students WHERE Email = 'new2@school.test'") == ('New9',)
+
+
+def test_error_report_is_capped(roster, monkeypatch):
+    monkeypatch.setattr(student_import, 'MAX_REPORTED_ERRORS', 3)
+    upload = csv_upload([student(number, Grade='x') for number in range(1, 6)] + [student(6)])
+    progress = []
+
+    count, report, error_count = student_import.import_students_streaming(
+        upload, chunk_size=2, on_progress=lambda done, total: progress.append((done, total)))
+
+    assert count == 1
+    assert error_count == 5
+    assert report['Row'].tolist() == [2, 3, 4]
+    assert progress == [(2, 6), (4, 6), (6, 6)]
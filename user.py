@@ -1,158 +1,295 @@
-import sqlite3
 import streamlit as st
 import pandas as pd
+import instrumentation
+import dates
+import archive
+import checkin
+from db import fetch_data
+import student_editor
+import student_import
+import reference_data
+import bookings as bookings_data
+import kitchen
+import exports
+import frames
+from frames import INT, TEXT, CATEGORY, DATE, DATETIME, BOOL
 
-# Utility function to fetch data
-def fetch_data(query, params=()):
-    conn = sqlite3.connect('ordering.db', check_same_thread=False)
-    c = conn.cursor()
-    c.execute(query, params)
-    data = c.fetchall()
-    conn.close()
-    return data
-
-# Utility function to insert data
-def insert_data(query, params):
-    conn = sqlite3.connect('ordering.db', check_same_thread=False)
-    c = conn.cursor()
-    c.execute(query, params)
-    conn.commit()
-    conn.close()
-
-# Utility function to get the foreign key (ID) for a given value from a table
-def get_foreign_key_value(table, id_column, value_column, value):
-    query = f"SELECT {id_column} FROM {table} WHERE {value_column} = ?"
-    result = fetch_data(query, (value,))
-    return result[0][0] if result else None
+# Filter choices on the Bookings page
+GRADES_QUERY = "SELECT DISTINCT Grade FROM tbl_Students ORDER BY Grade"
+ALL_GROUPS_QUERY = "SELECT Group_ID, GroupName FROM tbl_Groups ORDER BY GroupName"
+
+# Column types of the tables built from query rows (see frames.py)
+BOOKINGS_FRAME = [("Order ID", INT), ("Student ID", INT), ("Meal Date", DATE), ("Meal", CATEGORY),
+                  ("Student Name", TEXT), ("Grade", INT), ("Border", BOOL), ("Group", CATEGORY)]
+ARCHIVE_RUNS_FRAME = [("Archived Before", DATE), ("Started", DATETIME), ("Finished", DATETIME), ("Orders", INT)]
 
 # Function to display user interface
 def show_user_interface():
     # Sidebar menu for navigation
     menu = st.sidebar.selectbox(
         "Menu",
-        ["Bookings", "Import Students", "Dietary Options", "Meals"]
+        ["Bookings", "Kitchen", "Serving", "Import Students", "Dietary Options", "Meals", "Performance", "Archive"]
     )
 
+    # Tag every query issued while rendering this page
+    instrumentation.set_page(f"User: {menu}")
+
     # Bookings section
     if menu == "Bookings":
         st.title("Bookings")
 
-        # Fetch and display all orders with required fields
-        query = '''
-            SELECT 
-            tbl_Orders.Order_ID, 
-            tbl_Students.Student_ID, 
-            tbl_Orders.MealDate,
-            tbl_Meal.Meal, 
-            tbl_Students.Name || ' ' || tbl_Students.Surname AS StudentName,
-            tbl_Students.Grade, 
-            tbl_Students.Border, 
-            tbl_Groups.GroupName
-        FROM 
-            tbl_Orders
-        LEFT JOIN 
-            tbl_Orders_Group ON tbl_Orders.Order_ID = tbl_Orders_Group.Order_ID_FK
-        LEFT JOIN 
-            tbl_Meal ON tbl_Orders.Meal_ID_FK = tbl_Meal.Meal_ID
-        LEFT JOIN 
-            tbl_Groups_Students ON tbl_Orders_Group.Group_ID_FK = tbl_Groups_Students.Group_ID_FK
-        LEFT JOIN 
-            tbl_Students ON tbl_Groups_Students.Student_ID_FK = tbl_Students.Student_ID
-        LEFT JOIN 
-            tbl_Groups ON tbl_Orders_Group.Group_ID_FK = tbl_Groups.Group_ID
-
-        '''
-        bookings = fetch_data(query)
-        
-        # Convert to DataFrame for better display
-        bookings = pd.DataFrame(bookings, columns=["Oder_ID", "Order_ID", "Meal Date", "Meal", "StudentName", "Grade", "Border", "Group"])
-        st.dataframe(bookings)
+        # Filters are pushed into SQL so only the matching page is read
+        meal_dict = {meal_name: meal_id for meal_id, meal_name in reference_data.get_meals()}
+        grades = [grade for (grade,) in fetch_data(GRADES_QUERY)]
+        groups = fetch_data(ALL_GROUPS_QUERY)
+        group_dict = {group_name: group_id for group_id, group_name in groups}
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            date_from = st.date_input("From Meal Date", value=None)
+            date_to = st.date_input("To Meal Date", value=None)
+        with col2:
+            selected_meal = st.selectbox("Meal", ["All"] + list(meal_dict.keys()))
+            selected_grade = st.selectbox("Grade", ["All"] + grades)
+        with col3:
+            selected_border = st.selectbox("Border", ["All", "Yes", "No"])
+            selected_group = st.selectbox("Group", ["All"] + list(group_dict.keys()))
+        page_size = st.selectbox("Rows per page", [25, 50, 100, 250], index=1)
+
+        filters = {
+            'date_from': date_from,
+            'date_to': date_to,
+            'meal_id': meal_dict.get(selected_meal),
+            'grade': None if selected_grade == "All" else selected_grade,
+            'border': None if selected_border == "All" else selected_border == "Yes",
+            'group_id': group_dict.get(selected_group),
+        }
+
+        # Keep a stack of page cursors; changing a filter starts again from the first page
+        if st.session_state.get('bookings_filters') != (filters, page_size):
+            st.session_state.bookings_filters = (filters, page_size)
+            st.session_state.bookings_cursors = [None]
+
+        bookings, next_cursor = bookings_data.bookings_page_view(
+            filters, after=st.session_state.bookings_cursors[-1], page_size=page_size
+        )
+
+        # Typed columns: categorical meals and groups, real dates and flags
+        bookings_table = frames.rows_to_table(bookings, BOOKINGS_FRAME)
+        st.dataframe(bookings_table, hide_index=True, column_config={
+            "Meal Date": st.column_config.DateColumn(format=dates.COLUMN_DISPLAY_FORMAT),
+        })
+
+        page_number = len(st.session_state.bookings_cursors)
+        prev_col, page_col, next_col = st.columns([1, 2, 1])
+        with prev_col:
+            if st.button("Previous", disabled=page_number == 1):
+                st.session_state.bookings_cursors.pop()
+                st.rerun()
+        with page_col:
+            st.write(f"Page {page_number}")
+        with next_col:
+            if st.button("Next", disabled=next_cursor is None):
+                st.session_state.bookings_cursors.append(next_cursor)
+                st.rerun()
+
+        # Export every booking matching the filters; the file is only built when Download is clicked
+        st.subheader("Export")
+        export_format = st.radio("Format", list(exports.EXPORT_FORMATS.keys()), horizontal=True)
+        mime_type = exports.EXPORT_FORMATS[export_format][1]
+
+        def build_export(filters=dict(filters), export_format=export_format):
+            # Rows are streamed from the cursor into a spooled file chunk by chunk, but Streamlit
+            # serves a download from memory, hence the row cap
+            with exports.export_bookings_file(filters, export_format, max_rows=exports.DOWNLOAD_MAX_ROWS) as export_file:
+                return export_file.read()
+
+        st.download_button(
+            f"Download {export_format}",
+            data=build_export,
+            file_name=exports.export_filename(filters, export_format),
+            mime=mime_type,
+            on_click="ignore",
+        )
+        st.caption(f"Downloads hold at most {exports.DOWNLOAD_MAX_ROWS:,} bookings; narrow the dates or filters for more.")
+
+    # Kitchen production counts section
+    elif menu == "Kitchen":
+        st.title("Kitchen Production")
+
+        # Counts are read from the pre-aggregated daily totals, not the bookings join
+        meal_date = st.date_input("Meal Date")
+        production_sheet = kitchen.daily_production_sheet(meal_date)
+
+        if production_sheet.empty:
+            st.write(f"No meals booked for {meal_date}.")
+        else:
+            st.dataframe(production_sheet, hide_index=True)
+            st.metric("Total meals", int(production_sheet["Total"].sum()))
+
+    # Serving section: card swipes at the counter are checked against the in-memory service index
+    elif menu == "Serving":
+        st.title("Meal Service")
+
+        meals = reference_data.get_meals()
+        meal_dict = {meal_name: meal_id for meal_id, meal_name in meals}
+        selected_meal = st.selectbox("Meal", list(meal_dict.keys()))
+        meal_id = meal_dict[selected_meal]
+        service = checkin.get_service(meal_id)
+
+        if service is None:
+            st.write(f"{selected_meal} service for today is not open.")
+            if st.button("Open Service"):
+                checkin.open_service(meal_id)
+                st.rerun()
+        else:
+            # Card readers type the Student ID and press Enter, which submits the form
+            with st.form("check_in", clear_on_submit=True):
+                swipe = st.text_input("Student ID")
+                submitted = st.form_submit_button("Check In")
+            if submitted and swipe.strip():
+                if not swipe.strip().isdigit():
+                    st.error(f"Not a Student ID: {swipe}")
+                else:
+                    result = service.check_in(int(swipe))
+                    if result.status == checkin.SERVED:
+                        st.success(f"{result.name}: enjoy your {selected_meal.lower()}.")
+                    elif result.status == checkin.ALREADY_SERVED:
+                        st.warning(f"{result.name} has already been served.")
+                    else:
+                        st.error(f"Student {result.student_id} is not booked for {selected_meal.lower()} today.")
+
+            booked, served, waiting = service.summary()
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Booked", booked)
+            col2.metric("Served", served)
+            col3.metric("Still to Serve", max(booked - served, 0))
+
+            if st.button("Close Service"):
+                checkin.close_service(meal_id)
+                st.rerun()
 
     # Import Students section
     elif menu == "Import Students":
         st.title("Import Students")
         st.subheader("Current Students in the System")
-        
-        # Modify the SQL query to fetch the data
-        query = '''
-            SELECT tbl_Students.Student_ID, tbl_Students.Name || ' ' || tbl_Students.Surname AS StudentName, 
-                tbl_Gender.Gender, tbl_Students.Grade, tbl_Students.Border, tbl_DietaryOption.Dietary,
-                tbl_Students.Email
-            FROM tbl_Students
-            JOIN tbl_Gender ON tbl_Students.Gender_ID_FK = tbl_Gender.Gender_ID
-            JOIN tbl_DietaryOption ON tbl_Students.Dietary_ID_FK = tbl_DietaryOption.Dietary_ID
-            ORDER BY tbl_Students.Grade ASC, tbl_Students.Surname ASC
-        '''
-        students = fetch_data(query)
-        
-        # Convert to DataFrame for better display
-        students_df = pd.DataFrame(students, columns=["Student_ID", "Student Name", "Gender", "Grade", "Is Border", "Dietary", "Email"])
-        
-        st.data_editor(students_df, num_rows='dynamic')
 
-        # File uploader for Excel file
+        # The roster is edited a page at a time; saving writes only the rows changed on the page
+        editor_page_size = st.selectbox("Students per page", [50, 100, 250], index=1)
+        if st.session_state.get('student_page_size') != editor_page_size:
+            st.session_state.student_page_size = editor_page_size
+            st.session_state.student_cursors = [None]
+        st.session_state.setdefault('student_editor_version', 0)
+
+        students_table, next_cursor = student_editor.fetch_student_page(
+            after=st.session_state.student_cursors[-1], page_size=editor_page_size
+        )
+        page_number = len(st.session_state.student_cursors)
+        editor_key = f"student_editor_{page_number}_{st.session_state.student_editor_version}"
+        st.data_editor(
+            students_table,
+            key=editor_key,
+            num_rows='dynamic',
+            hide_index=True,
+            disabled=["Student_ID"],
+            column_config={
+                "Gender": st.column_config.SelectboxColumn(options=[gender for _, gender in reference_data.get_genders()]),
+                "Dietary": st.column_config.SelectboxColumn(options=[dietary for _, dietary in reference_data.get_dietary_options()]),
+                "Grade": st.column_config.NumberColumn(step=1),
+                "Border": st.column_config.CheckboxColumn(),
+                "New Password": st.column_config.TextColumn(help="Leave blank to keep the current password. Required for new students."),
+            },
+        )
+        editor_state = st.session_state.get(editor_key, {})
+        pending = len(editor_state.get('edited_rows', {})) + len(editor_state.get('added_rows', [])) + len(editor_state.get('deleted_rows', []))
+
+        save_col, discard_col = st.columns(2)
+        with save_col:
+            if st.button("Save Changes", disabled=pending == 0):
+                counts, edit_errors = student_editor.save_edits(students_table, editor_state)
+                if edit_errors.empty:
+                    st.session_state.student_editor_version += 1
+                    st.session_state.student_save_result = counts
+                    st.rerun()
+                st.error("Nothing was saved; fix these rows and try again:")
+                st.dataframe(edit_errors, hide_index=True)
+        with discard_col:
+            if st.button("Discard Changes", disabled=pending == 0):
+                st.session_state.student_editor_version += 1
+                st.rerun()
+        saved = st.session_state.pop('student_save_result', None)
+        if saved:
+            st.success(f"Saved: {saved['updated']} updated, {saved['added']} added, {saved['deleted']} deleted.")
+
+        # Moving to another page drops unsaved edits on this one
+        prev_col, page_col, next_col = st.columns([1, 2, 1])
+        with prev_col:
+            if st.button("Previous", disabled=page_number == 1, key="students_previous"):
+                st.session_state.student_cursors.pop()
+                st.rerun()
+        with page_col:
+            st.write(f"Page {page_number}" + (f" ({pending} unsaved changes)" if pending else ""))
+        with next_col:
+            if st.button("Next", disabled=next_cursor is None, key="students_next"):
+                st.session_state.student_cursors.append(next_cursor)
+                st.rerun()
+
+        # File uploader for Excel or CSV file
         st.subheader("Import New Students")
-        uploaded_file = st.file_uploader("Choose an Excel file", type=["xlsx"])
+        uploaded_file = st.file_uploader("Choose an Excel or CSV file", type=["xlsx", "csv"])
 
         if uploaded_file:
-            # Read Excel file into a DataFrame
-            students_df = pd.read_excel(uploaded_file)
+            # Only the first rows are parsed for the preview; the import itself streams the file in chunks
+            preview_df = student_import.read_preview(uploaded_file)
 
-            st.write("Preview of uploaded file:")
-            st.dataframe(students_df)
+            st.write(f"Preview of uploaded file (first {student_import.PREVIEW_ROWS} rows):")
+            st.dataframe(preview_df)
 
             # Display required columns for student import
-            st.write("Required columns in the Excel file: Name, Surname, Gender, Grade, Border, Dietary, Email, Password")
+            st.write("Required columns in the file: Name, Surname, Gender, Grade, Border, Dietary, Email, Password")
 
-            # Check if all required columns exist in the DataFrame
-            required_columns = ['Name', 'Surname', 'Gender', 'Grade', 'Border', 'Dietary', 'Email', 'Password']
-            if not all(column in students_df.columns for column in required_columns):
-                st.error("Missing one or more required columns in the Excel file.")
+            # Check if all required columns exist in the file
+            if not all(column in preview_df.columns for column in student_import.REQUIRED_COLUMNS):
+                st.error("Missing one or more required columns in the file.")
             else:
                 if st.button("Import Students"):
-                    for _, row in students_df.iterrows():
-                        # Handle Gender_ID_FK
-                        gender = row['Gender']
-                        gender_id = get_foreign_key_value('tbl_Gender', 'Gender_ID', 'Gender', gender)
-                        if gender_id is None:
-                            st.error(f"Gender '{gender}' does not exist in the database.")
-                            continue  # Skip this row if gender is invalid
-                        
-                        # Handle Dietary_ID_FK
-                        dietary = row['Dietary']
-                        dietary_id = get_foreign_key_value('tbl_DietaryOption', 'Dietary_ID', 'Dietary', dietary)
-                        if dietary_id is None:
-                            st.error(f"Dietary option '{dietary}' does not exist in the database.")
-                            continue  # Skip this row if dietary option is invalid
-
-                        # Insert data into tbl_Students
-                        insert_data('''
-                            INSERT INTO tbl_Students (Name, Surname, Gender_ID_FK, Grade, Border, Dietary_ID_FK, Email, Password)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                        ''', (row['Name'], row['Surname'], gender_id, row['Grade'], row['Border'], dietary_id, row['Email'], row['Password']))
-
-                    st.success("Students imported successfully!")
+                    progress_bar = st.progress(0.0, text="Importing students...")
+
+                    def show_progress(rows_processed, total_rows):
+                        fraction = min(rows_processed / total_rows, 1.0) if total_rows else 1.0
+                        progress_bar.progress(fraction, text=f"Processed {rows_processed} of {total_rows} rows")
+
+                    # Validate and insert the file chunk by chunk, one transaction per chunk
+                    imported_count, import_errors, error_count = student_import.import_students_streaming(
+                        uploaded_file, on_progress=show_progress
+                    )
+
+                    if imported_count:
+                        st.success(f"{imported_count} students imported successfully!")
+                    if error_count:
+                        st.warning(f"{error_count} rows were not imported:")
+                        st.dataframe(import_errors, hide_index=True)
 
     # Dietary Options section
     elif menu == "Dietary Options":
         st.title("Dietary Options")
 
         # Fetch and display existing dietary options
-        dietary_options = fetch_data("SELECT Dietary_ID, Dietary FROM tbl_DietaryOption")
+        dietary_options = reference_data.get_dietary_options()
         dietary_df = pd.DataFrame(dietary_options, columns=["Dietary ID", "Dietary"])
         st.table(dietary_df)
 
         # Add new dietary option
         new_dietary = st.text_input("Add New Dietary Option")
         if st.button("Add Dietary Option"):
-            insert_data("INSERT INTO tbl_DietaryOption (Dietary) VALUES (?)", (new_dietary,))
+            reference_data.add_dietary_option(new_dietary)
             st.success(f"Dietary option '{new_dietary}' added successfully!")
         
         # Edit existing dietary option
         edit_dietary_id = st.number_input("Enter Dietary ID to Edit", min_value=1)
         edit_dietary_name = st.text_input("New Dietary Option Name")
         if st.button("Edit Dietary Option"):
-            insert_data("UPDATE tbl_DietaryOption SET Dietary = ? WHERE Dietary_ID = ?", (edit_dietary_name, edit_dietary_id))
+            reference_data.rename_dietary_option(edit_dietary_id, edit_dietary_name)
             st.success(f"Dietary option '{edit_dietary_id}' updated to '{edit_dietary_name}'.")
 
     # Meals section
@@ -160,19 +297,75 @@ def show_user_interface():
         st.title("Meals")
 
         # Fetch and display existing meal options
-        meals = fetch_data("SELECT Meal_ID, Meal FROM tbl_Meal")
+        meals = reference_data.get_meals()
         meals_df = pd.DataFrame(meals, columns=["Meal ID", "Meal"])
         st.table(meals_df)
 
         # Add new meal
         new_meal = st.text_input("Add New Meal")
         if st.button("Add Meal"):
-            insert_data("INSERT INTO tbl_Meal (Meal) VALUES (?)", (new_meal,))
+            reference_data.add_meal(new_meal)
             st.success(f"Meal '{new_meal}' added successfully!")
         
         # Edit existing meal
         edit_meal_id = st.number_input("Enter Meal ID to Edit", min_value=1)
         edit_meal_name = st.text_input("New Meal Name")
         if st.button("Edit Meal"):
-            insert_data("UPDATE tbl_Meal SET Meal = ? WHERE Meal_ID = ?", (edit_meal_name, edit_meal_id))
+            reference_data.rename_meal(edit_meal_id, edit_meal_name)
             st.success(f"Meal '{edit_meal_id}' updated to '{edit_meal_name}'.")
+
+    # Performance section
+    elif menu == "Performance":
+        st.title("Performance")
+        st.write(f"Query timings since the server started (last {instrumentation.SAMPLES_PER_QUERY} calls per query). "
+                 f"Queries slower than {instrumentation.SLOW_QUERY_MS:g} ms are also written to {instrumentation.SLOW_QUERY_LOG}.")
+
+        timing_columns = ["Calls", "Avg Rows", "p50 (ms)", "p95 (ms)", "p99 (ms)", "Max (ms)", "Lock Wait p95 (ms)"]
+
+        st.subheader("By Page")
+        pages_df = pd.DataFrame(instrumentation.stats.summary(by_page=True), columns=["Page"] + timing_columns)
+        st.dataframe(pages_df.round(2), hide_index=True)
+
+        st.subheader("By Query")
+        queries_df = pd.DataFrame(instrumentation.stats.summary(), columns=["Page", "Query"] + timing_columns)
+        st.dataframe(queries_df.round(2), hide_index=True)
+
+        st.subheader("Recent Slow Queries")
+        slow_queries = [
+            (pd.Timestamp.fromtimestamp(logged_at).strftime("%Y-%m-%d %H:%M:%S"), event.page, event.fingerprint,
+             event.rows, event.wall_ms, event.lock_wait_ms)
+            for logged_at, event in instrumentation.stats.recent_slow()
+        ]
+        slow_df = pd.DataFrame(slow_queries, columns=["Time", "Page", "Query", "Rows", "Wall (ms)", "Lock Wait (ms)"])
+        st.dataframe(slow_df.round(2), hide_index=True)
+
+        if st.button("Reset Statistics"):
+            instrumentation.stats.reset()
+            st.rerun()
+
+    # Archive section
+    elif menu == "Archive":
+        st.title("Archive")
+        st.write(f"Orders for past meal dates are moved to {archive.archive_path()} so the live tables stay small. "
+                 "Reports and exports that reach back past the archive date read both databases. "
+                 + (f"The app runs the archive every {archive.ARCHIVE_INTERVAL_HOURS:g} hours; "
+                    if archive.ARCHIVE_INTERVAL_HOURS > 0 else "Background runs are off; ")
+                 + "`python archive.py [days]` runs it on demand or from a scheduler.")
+
+        summary = archive.archive_summary()
+        col1, col2 = st.columns(2)
+        col1.metric("Live Orders", summary['live_orders'])
+        col2.metric("Archived Orders", summary['archived_orders'])
+        if summary['archived_orders']:
+            st.write(f"Archived meal dates: {summary['oldest_archived_date']} to {summary['newest_archived_date']}")
+
+        horizon_days = st.number_input("Archive orders with meal dates older than (days)", min_value=1,
+                                       value=archive.ARCHIVE_HORIZON_DAYS, step=1)
+        if st.button("Archive Now"):
+            with st.spinner("Archiving orders..."):
+                moved = archive.run_archive(horizon_days=int(horizon_days))
+            st.success(f"{moved} orders archived.")
+
+        st.subheader("Recent Runs")
+        runs_table = frames.rows_to_table(archive.recent_runs(), ARCHIVE_RUNS_FRAME)
+        st.dataframe(runs_table, hide_index=True)